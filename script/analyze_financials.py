@@ -3,14 +3,11 @@ import os
 import sys
 import argparse
 
-def analyze_ticker_financials(ticker_symbol, base_dir="saham"):
-    ticker_dir = os.path.join(base_dir, ticker_symbol)
-
-    balance_sheet_file = os.path.join(ticker_dir, f"{ticker_symbol}_balance_sheet.csv")
-    financials_file = os.path.join(ticker_dir, f"{ticker_symbol}_financials.csv")
-    cashflow_file = os.path.join(ticker_dir, f"{ticker_symbol}_cashflow.csv")
+from statement_loader import load_ticker_statements, statement_row, projection
+from dependency_cache import DependencyCache, cached_stage, default_cache_db
 
-    results = {
+def empty_health_results(ticker_symbol):
+    return {
         "ticker": ticker_symbol,
         "der_ok": False,
         "profit_ok": False,
@@ -21,36 +18,40 @@ def analyze_ticker_financials(ticker_symbol, base_dir="saham"):
         "error": None
     }
 
+def analyze_ticker_financials(ticker_symbol, base_dir="saham"):
+    ticker_dir = os.path.join(base_dir, ticker_symbol)
+
+    balance_sheet_file = os.path.join(ticker_dir, f"{ticker_symbol}_balance_sheet.csv")
+    financials_file = os.path.join(ticker_dir, f"{ticker_symbol}_financials.csv")
+    cashflow_file = os.path.join(ticker_dir, f"{ticker_symbol}_cashflow.csv")
+
+    results = empty_health_results(ticker_symbol)
+
     if not all(os.path.exists(f) for f in [balance_sheet_file, financials_file, cashflow_file]):
         results["error"] = "Missing one or more required financial files."
         return results
 
     try:
-        df_balance_sheet = pd.read_csv(balance_sheet_file, index_col=0)
-        df_financials = pd.read_csv(financials_file, index_col=0)
-        df_cashflow = pd.read_csv(cashflow_file, index_col=0)
+        # Statements are parsed once per run and shared with the other screening stages
+        statements = load_ticker_statements(ticker_symbol, base_dir, projection("health"))
     except Exception as e:
         results["error"] = f"Error reading financial files: {e}"
         return results
 
+    return check_financial_health(ticker_symbol, statements["balance_sheet"], statements["financials"], statements["cashflow"])
+
+def check_financial_health(ticker_symbol, df_balance_sheet, df_financials, df_cashflow):
+    # DER, profit and FCF criteria on already-loaded statements (see statement_loader)
+    results = empty_health_results(ticker_symbol)
+
     # Criteria 1: Rasio DER < 1
     if 'Total Liabilities Net Minority Interest' in df_balance_sheet.index and 'Stockholders Equity' in df_balance_sheet.index:
-        # Identify date columns and sort them to find the latest
-        date_columns_with_names = []
-        for col in df_balance_sheet.columns:
-            try:
-                date_columns_with_names.append((pd.to_datetime(col), col))
-            except ValueError:
-                continue
-        
-        # Sort dates in descending order to get the latest first
-        date_columns_with_names.sort(key=lambda x: x[0], reverse=True)
-        
+        # Columns are parsed fiscal dates in ascending order, so the latest is the last one
         latest_year_col = None
-        if date_columns_with_names:
-            latest_year_col = date_columns_with_names[0][1] # Get the original column name
+        if len(df_balance_sheet.columns):
+            latest_year_col = df_balance_sheet.columns[-1]
 
-        if latest_year_col:
+        if latest_year_col is not None:
             latest_total_liabilities = df_balance_sheet.loc['Total Liabilities Net Minority Interest', latest_year_col]
             latest_total_equity = df_balance_sheet.loc['Stockholders Equity', latest_year_col]
             
@@ -75,9 +76,7 @@ def analyze_ticker_financials(ticker_symbol, base_dir="saham"):
 
     # Criteria 2: Laba positif dan bertumbuh
     if 'Net Income' in df_financials.index:
-        net_income_series = df_financials.loc['Net Income'].dropna()
-        net_income_series.index = pd.to_datetime(net_income_series.index)
-        net_income_series = net_income_series.sort_index()
+        net_income_series = statement_row(df_financials, 'Net Income')
         if not net_income_series.empty:
             # Debug print
             # print(f"Debug: {ticker_symbol} Net Income Series after dropna(): {net_income_series.to_string()}")
@@ -102,9 +101,7 @@ def analyze_ticker_financials(ticker_symbol, base_dir="saham"):
 
     # Criteria 3: History free cashflow tidak ada minus atau bertumbuh
     if 'Free Cash Flow' in df_cashflow.index:
-        fcf_series = df_cashflow.loc['Free Cash Flow'].dropna()
-        fcf_series.index = pd.to_datetime(fcf_series.index)
-        fcf_series = fcf_series.sort_index()
+        fcf_series = statement_row(df_cashflow, 'Free Cash Flow')
         if not fcf_series.empty:
             # Debug print
             # print(f"Debug: {ticker_symbol} FCF Series after dropna(): {fcf_series.to_string()}")
@@ -132,6 +129,7 @@ def analyze_ticker_financials(ticker_symbol, base_dir="saham"):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Analyze financials of stocks from a filtered list.")
     parser.add_argument("--dir", type=str, default="saham", help="Directory where ticker data is stored.")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every ticker instead of reusing results whose inputs have not changed.")
     args = parser.parse_args()
 
     filtered_dcf_results_file = "filtered_dcf_results.csv"
@@ -151,9 +149,15 @@ if __name__ == "__main__":
         print(f"Error reading {filtered_dcf_results_file}: {e}", file=sys.stderr)
         sys.exit(1)
 
+    # Shares the "health" results of screen.py runs over the same data
+    cache = None if args.no_cache else DependencyCache(default_cache_db(args.dir))
     all_analysis_results = []
     for ticker in tickers_to_check:
-        all_analysis_results.append(analyze_ticker_financials(ticker, base_dir=args.dir))
+        result, _ = cached_stage(cache, "health", ticker, args.dir, None,
+                                 lambda: analyze_ticker_financials(ticker, base_dir=args.dir))
+        all_analysis_results.append(result)
+    if cache is not None:
+        cache.close()
 
     good_financial_stocks_details = []
     for result in all_analysis_results:
@@ -0,0 +1,144 @@
+import asyncio
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
+
+from get_fundamental_data import save_frames
+from fetch_manifest import DATASETS
+from data_providers import FRAME_FILES, make_provider
+from fetch_scheduler import FetchScheduler
+from run_metrics import ticker_file_bytes
+from statement_loader import ALL_FIELDS
+
+def make_stand_in_server(base_dir, host="127.0.0.1", port=8765, latency=0.0, max_concurrent=None):
+    # Serves an existing saham/ tree as GET /<TICKER>/<frame> so the fetch stage can be measured offline;
+    # latency (seconds) is added to every response to mimic a remote provider, and requests beyond
+    # max_concurrent at once get HTTP 429 like a throttling provider
+    in_flight = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if in_flight is not None and not in_flight.acquire(blocking=False):
+                self.send_response(429)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            try:
+                self._serve()
+            finally:
+                if in_flight is not None:
+                    in_flight.release()
+
+        def _serve(self):
+            parts = [unquote(p) for p in self.path.strip('/').split('/')]
+            if len(parts) != 2 or parts[1] not in FRAME_FILES:
+                self.send_error(404)
+                return
+            ticker, name = parts
+            file_path = os.path.join(base_dir, ticker, f"{ticker}_{FRAME_FILES[name]}.csv")
+            if latency:
+                time.sleep(latency)
+            try:
+                with open(file_path, 'rb') as f:
+                    body = f.read()
+            except FileNotFoundError:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), StandInHandler)
+
+async def fetch_many(tickers, base_dir, provider, max_in_flight=16, datasets_by_ticker=None, store=None, on_result=None, scheduler=None, after_save=None,
+                     fields=None, stop=None):
+    # Fetches every ticker through a FetchScheduler (at most max_in_flight at once, fewer while the
+    # provider throttles) and saves each one as soon as it arrives. Returns one
+    # {"ticker", "status", "error", "seconds", "attempts"} dict per ticker, plus "bytes_written" when done.
+    # after_save(ticker) runs in the fetch thread pool once a ticker is saved; if it blocks (e.g. a put
+    # into a full bounded queue) the ticker keeps its fetch slot, which slows fetching down to match.
+    # fields, if given, is the projection save_frames() persists instead of the full frames. Once
+    # stop (a threading.Event) is set, no further ticker is requested (see FetchScheduler.run()).
+    loop = asyncio.get_running_loop()
+    if scheduler is None:
+        scheduler = FetchScheduler(max_concurrency=max_in_flight)
+    executor = ThreadPoolExecutor(max_workers=scheduler.limit.maximum)
+    datasets_by_ticker = datasets_by_ticker or {}
+
+    async def fetch_one(ticker):
+        datasets = datasets_by_ticker.get(ticker) or list(DATASETS)
+        frames = await loop.run_in_executor(executor, provider.fetch, ticker, datasets)
+        await loop.run_in_executor(executor, save_frames, ticker, base_dir, frames, store, False, fields)
+        written = [FRAME_FILES[name] for name in frames]
+        if after_save is not None:
+            await loop.run_in_executor(executor, after_save, ticker)
+        return {"ticker": ticker, "bytes_written": ticker_file_bytes(ticker, base_dir, written)}
+
+    try:
+        return await scheduler.run(tickers, fetch_one, on_result, stop)
+    finally:
+        executor.shutdown(wait=True)
+
+def fetch_tickers(tickers, base_dir, provider, max_in_flight=16, datasets_by_ticker=None, store=None, on_result=None, scheduler=None, after_save=None,
+                  fields=None, stop=None):
+    return asyncio.run(fetch_many(tickers, base_dir, provider, max_in_flight, datasets_by_ticker, store, on_result, scheduler, after_save, fields, stop))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch many tickers concurrently, or serve a data directory as a local stand-in provider.")
+    parser.add_argument("tickers", type=str, nargs='*', help="Ticker symbols to fetch (e.g., SIDO.JK).")
+    parser.add_argument("--dir", type=str, default="saham", help="The base directory to save the output files.")
+    parser.add_argument("--max-in-flight", type=int, default=16, help="Maximum number of tickers being fetched at once.")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum ticker fetches started per second (default: unlimited).")
+    parser.add_argument("--max-retries", type=int, default=3, help="Rounds of retries for throttled or transient failures at the end of the run.")
+    parser.add_argument("--provider", type=str, default="yfinance", help="Data provider: yfinance, fixture:<dir> or http://host:port of a stand-in server.")
+    parser.add_argument("--store", type=str, default=None, help="Optional: also write the fetched frames into this fundamentals store (SQLite).")
+    parser.add_argument("--projected", action="store_true", help="Only save the info fields and statement rows the screening stages read.")
+    parser.add_argument("--serve", type=str, default=None, help="Serve this data directory as a stand-in provider instead of fetching.")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --serve.")
+    parser.add_argument("--throttle-above", type=int, default=None, help="For --serve: answer HTTP 429 beyond this many concurrent requests.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Artificial per-response latency in milliseconds for --serve.")
+    args = parser.parse_args()
+
+    if args.serve:
+        server = make_stand_in_server(args.serve, port=args.port, latency=args.latency / 1000.0, max_concurrent=args.throttle_above)
+        print(f"Serving {args.serve} on http://127.0.0.1:{args.port} (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    if not args.tickers:
+        parser.error("no tickers given")
+
+    provider = make_provider(args.provider)
+    tickers = [ticker.upper() for ticker in args.tickers]
+
+    scheduler = FetchScheduler(max_concurrency=args.max_in_flight, rate=args.rate, max_retries=args.max_retries)
+
+    def print_result(result):
+        if result["status"] == "Done":
+            print(f"{result['ticker']}: Done ({result['seconds']:.2f}s)", flush=True)
+        else:
+            print(f"{result['ticker']}: Fail ({result['error']})", flush=True)
+
+    started = time.perf_counter()
+    results = fetch_tickers(tickers, args.dir, provider, store=args.store, on_result=print_result, scheduler=scheduler,
+                            fields=ALL_FIELDS if args.projected else None)
+    elapsed = time.perf_counter() - started
+    done = sum(1 for result in results if result["status"] == "Done")
+    print(f"\nFetched {done} of {len(results)} tickers in {elapsed:.2f}s ({len(results) / elapsed:.1f} tickers/s).")
+    print(f"Throttled {scheduler.stats['throttled']} times, retried {scheduler.stats['retried']} fetches; concurrency ended at {scheduler.limit.limit}.")
@@ -0,0 +1,172 @@
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import contextlib
+import subprocess
+from datetime import datetime
+
+from synthetic_universe import generate_universe
+from data_providers import FixtureProvider
+from async_fetcher import fetch_tickers
+from calculate_dcf_all import run_dcf_batch
+from dcf_results_store import save_dcf_results, default_results_db
+from filter_dcf_results import filter_dcf_results
+from analyze_financials import analyze_ticker_financials
+from filtered_roic_igr import calculate_roic_igr_for_ticker
+from screen import run_screen
+from statement_loader import clear_cache, cache_stats
+
+STAGES = ["fetch_replay", "dcf", "filter", "financial_analysis", "roic_igr", "screen"]
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+
+def code_version():
+    # Commit the benchmark ran against, so result files can be lined up with the history
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def max_rss_mb():
+    # Peak resident set size of this process so far (Linux reports KiB)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def prepare_universe(work_dir, n_tickers, seed, max_workers):
+    # Generates the synthetic source universe once per size and seed and reuses it afterwards
+    source_dir = os.path.join(work_dir, f"source_{n_tickers}_{seed}")
+    marker = os.path.join(source_dir, "universe.json")
+    if os.path.exists(marker):
+        with open(marker, 'r') as f:
+            return source_dir, json.load(f)["tickers"], None
+    shutil.rmtree(source_dir, ignore_errors=True)
+    started = time.perf_counter()
+    tickers = generate_universe(source_dir, n_tickers, max_workers, seed=seed)
+    seconds = time.perf_counter() - started
+    with open(marker, 'w') as f:
+        json.dump({"n_tickers": n_tickers, "seed": seed, "tickers": tickers}, f)
+    return source_dir, tickers, seconds
+
+def run_stage(name, tickers, source_dir, data_dir, work_dir, args):
+    # Runs one pipeline stage over the whole universe; returns the number of failed tickers
+    if name == "fetch_replay":
+        results = fetch_tickers(tickers, data_dir, FixtureProvider(source_dir), args.max_in_flight)
+        return sum(1 for result in results if result["status"] != "Done")
+
+    if name == "dcf":
+        results = list(run_dcf_batch(tickers, data_dir, 0.10, 0.025, args.workers))
+        save_dcf_results(default_results_db(data_dir), results, 0.10, 0.025)
+        return sum(1 for result in results if result["status"] != "Done")
+
+    if name == "filter":
+        # filter_dcf_results() writes ./filtered_dcf_results.csv; keep it inside the work directory
+        with contextlib.chdir(work_dir):
+            filter_dcf_results(os.path.abspath(data_dir), 0.0, 100.0, results_db=os.path.abspath(default_results_db(data_dir)))
+        return 0
+
+    if name == "financial_analysis":
+        results = [analyze_ticker_financials(ticker, data_dir) for ticker in tickers]
+        return sum(1 for result in results if result["error"] is not None)
+
+    if name == "roic_igr":
+        # None means "did not pass" as well as "could not be computed"; count neither as a failure
+        for ticker in tickers:
+            calculate_roic_igr_for_ticker(ticker, data_dir, 10.0, 2.5)
+        return 0
+
+    if name == "screen":
+        rows = [row for row, _, _ in run_screen(tickers, data_dir, max_workers=args.workers)]
+        return sum(1 for row in rows if row["error"] is not None and row["margin of safety"] is None)
+
+    raise ValueError(f"Unknown stage '{name}'")
+
+def benchmark_size(n_tickers, args):
+    source_dir, tickers, generate_seconds = prepare_universe(args.work_dir, n_tickers, args.seed, args.workers)
+    data_dir = os.path.join(args.work_dir, f"run_{n_tickers}")
+    shutil.rmtree(data_dir, ignore_errors=True)
+    if "fetch_replay" not in args.stages:
+        # Later stages read what the fetch would have written; start them from a copy of the source
+        shutil.copytree(source_dir, data_dir)
+
+    size_results = {"n_tickers": n_tickers, "generate_seconds": round(generate_seconds, 4) if generate_seconds is not None else None, "stages": {}}
+    for stage in args.stages:
+        # Every stage starts cold, as it does when the pipeline runs the scripts one after another
+        clear_cache()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            failed = run_stage(stage, tickers, source_dir, data_dir, args.work_dir, args)
+        seconds = time.perf_counter() - started
+        size_results["stages"][stage] = {
+            "seconds": round(seconds, 4),
+            "tickers_per_second": round(len(tickers) / seconds, 2) if seconds > 0 else None,
+            "failed": failed,
+            "statement_cache": cache_stats(),
+            "max_rss_mb": round(max_rss_mb(), 1),
+        }
+        print(f"{n_tickers:>6} tickers  {stage:<20} {seconds:9.2f}s  {len(tickers) / seconds:10.1f} tickers/s  ({failed} failed)", flush=True)
+
+    if not args.keep:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return size_results
+
+def compare_with_baseline(results, baseline):
+    # Prints current / baseline seconds per size and stage; above 1.0 means slower
+    print("\n--- Compared with baseline " + str(baseline.get("version")) + " ---")
+    for size, size_results in results["sizes"].items():
+        base_stages = baseline.get("sizes", {}).get(size, {}).get("stages", {})
+        for stage, stage_results in size_results["stages"].items():
+            if stage in base_stages and base_stages[stage]["seconds"]:
+                ratio = stage_results["seconds"] / base_stages[stage]["seconds"]
+                print(f"{size:>6} tickers  {stage:<20} {ratio:6.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic universes of increasing size.")
+    parser.add_argument("--sizes", type=str, default=",".join(str(n) for n in DEFAULT_SIZES), help="Comma-separated universe sizes.")
+    parser.add_argument("--stages", type=str, default=",".join(STAGES), help=f"Comma-separated stages to time (from {', '.join(STAGES)}).")
+    parser.add_argument("--work-dir", type=str, default="benchmark_data", help="Where the synthetic universes and run outputs are written.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic universes.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for generation, DCF and screen (default: CPU count).")
+    parser.add_argument("--max-in-flight", type=int, default=16, help="Concurrent tickers in the fetch-replay stage.")
+    parser.add_argument("--output", type=str, default="benchmark_results.json", help="JSON file for the results.")
+    parser.add_argument("--baseline", type=str, default=None, help="Optional: an earlier results file to compare against.")
+    parser.add_argument("--keep", action="store_true", help="Keep each size's run outputs instead of deleting them.")
+    args = parser.parse_args()
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    except ValueError:
+        print(f"Error: invalid --sizes '{args.sizes}'.", file=sys.stderr)
+        sys.exit(1)
+    args.stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in args.stages if stage not in STAGES]
+    if unknown:
+        print(f"Error: unknown stage(s) {', '.join(unknown)}.", file=sys.stderr)
+        sys.exit(1)
+    os.makedirs(args.work_dir, exist_ok=True)
+
+    results = {
+        "version": code_version(),
+        "started": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        "seed": args.seed,
+        "sizes": {},
+    }
+    for n_tickers in sizes:
+        results["sizes"][str(n_tickers)] = benchmark_size(n_tickers, args)
+        # Written after every size so a long run that is cut short still leaves its numbers behind
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    print(f"\nBenchmark results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            compare_with_baseline(results, json.load(f))
@@ -1,10 +1,16 @@
-import pandas as pd
 import argparse
 import os
+import sys
 from datetime import datetime
 
+from dcf_results_store import save_dcf_results, default_results_db
+from price_index import load_price_index, year_end_closes
+from statement_loader import load_ticker_statements, statement_row, projection
 
-def calculate_dcf(ticker_symbol, base_output_dir='saham', discount_rate=0.10, terminal_growth_rate=0.0225):
+
+def calculate_dcf(ticker_symbol, base_output_dir='saham', discount_rate=0.10, terminal_growth_rate=0.0225, verbose=True, results_db=None, write_report=True, fields=None):
+    # fields: the statement projection to read (default: only what the DCF uses); callers that
+    # share the parse with other stages pass their common projection
 
     # Define the output directory for the ticker
     output_dir = os.path.join(base_output_dir, ticker_symbol)
@@ -12,9 +18,38 @@ def calculate_dcf(ticker_symbol, base_output_dir='saham', discount_rate=0.10, te
 
     output_messages = [] # List to store all messages
 
+    # Numbers behind the report, returned to callers such as the batch runner
+    results = {
+        "ticker": ticker_symbol,
+        "intrinsic_value_total": None,
+        "intrinsic_value_per_share": None,
+        "market_price": None,
+        "margin_of_safety": None,
+        "error": None
+    }
+
     def append_message(message):
         output_messages.append(message)
 
+    def write_output():
+        # The text report is optional for callers that only need the numbers (e.g. screen.py)
+        if not write_report:
+            return
+        with open(output_filename, 'w') as f:
+            f.write('\n'.join(output_messages))
+
+    def save_results():
+        # Single-ticker callers record the numbers here; batch callers save all results at once
+        if results_db is not None:
+            save_dcf_results(results_db, [results], discount_rate, terminal_growth_rate, record_run=False)
+
+    def fail(message):
+        append_message(message)
+        write_output()
+        results["error"] = message
+        save_results()
+        return results
+
     append_message(f"\n--- DCF Calculation for {ticker_symbol} ---")
     append_message(f"Discount Rate: {discount_rate*100}%")
     append_message(f"Terminal Growth Rate: {terminal_growth_rate*100}%")
@@ -26,67 +61,40 @@ def calculate_dcf(ticker_symbol, base_output_dir='saham', discount_rate=0.10, te
     company_info_file = os.path.join(output_dir, f"{ticker_symbol}_company_info.csv")
 
     if not os.path.exists(cashflow_file):
-        append_message(f"Error: Cash flow data not found for {ticker_symbol} at {cashflow_file}")
-        with open(output_filename, 'w') as f:
-            f.write('\n'.join(output_messages))
-        return
+        return fail(f"Error: Cash flow data not found for {ticker_symbol} at {cashflow_file}")
     if not os.path.exists(historical_prices_file):
-        append_message(f"Error: Historical prices data not found for {ticker_symbol} at {historical_prices_file}")
-        with open(output_filename, 'w') as f:
-            f.write('\n'.join(output_messages))
-        return
+        return fail(f"Error: Historical prices data not found for {ticker_symbol} at {historical_prices_file}")
     if not os.path.exists(balance_sheet_file):
-        append_message(f"Error: Balance sheet data not found for {ticker_symbol} at {balance_sheet_file}")
-        with open(output_filename, 'w') as f:
-            f.write('\n'.join(output_messages))
-        return
+        return fail(f"Error: Balance sheet data not found for {ticker_symbol} at {balance_sheet_file}")
     if not os.path.exists(company_info_file):
-        append_message(f"Error: Company info data not found for {ticker_symbol} at {company_info_file}")
-        with open(output_filename, 'w') as f:
-            f.write('\n'.join(output_messages))
-        return
+        return fail(f"Error: Company info data not found for {ticker_symbol} at {company_info_file}")
 
     try:
-        df_cashflow = pd.read_csv(cashflow_file, index_col=0)
-        df_historical_prices = pd.read_csv(historical_prices_file, index_col=0)
-        df_historical_prices.index = pd.to_datetime(df_historical_prices.index, utc=True)
-        df_balance_sheet = pd.read_csv(balance_sheet_file, index_col=0)
-        df_company_info = pd.read_csv(company_info_file, index_col=0)
+        # Statements are parsed once per run and shared with the other screening stages
+        statements = load_ticker_statements(ticker_symbol, base_output_dir, fields or projection("dcf"))
+        df_cashflow = statements["cashflow"]
+        # Year-end closes come from the precomputed price index instead of the daily bars
+        year_end_prices = year_end_closes(load_price_index(ticker_symbol, base_output_dir))
+        df_balance_sheet = statements["balance_sheet"]
+        df_company_info = statements["info"]
     except Exception as e:
-        append_message(f"Error reading data files: {e}")
-        with open(output_filename, 'w') as f:
-            f.write('\n'.join(output_messages))
-        return
+        return fail(f"Error reading data files: {e}")
 
     if 'Free Cash Flow' not in df_cashflow.index:
-        append_message(f"Error: 'Free Cash Flow' row not found in {cashflow_file}")
-        with open(output_filename, 'w') as f:
-            f.write('\n'.join(output_messages))
-        return
+        return fail(f"Error: 'Free Cash Flow' row not found in {cashflow_file}")
 
-    fcf_series = df_cashflow.loc['Free Cash Flow'].dropna()
+    # Sorted by fiscal date, with date-parsed index, for the year calculations below
+    fcf_series = statement_row(df_cashflow, 'Free Cash Flow')
 
     if fcf_series.empty:
-        append_message("No Free Cash Flow data available.")
-        with open(output_filename, 'w') as f:
-            f.write('\n'.join(output_messages))
-        return
-
-    # Convert index to datetime for proper sorting and year calculation
-    fcf_series.index = pd.to_datetime(fcf_series.index)
-    fcf_series = fcf_series.sort_index()
+        return fail("No Free Cash Flow data available.")
 
     # Get shares outstanding data
     shares_outstanding_map = {}
     if 'Ordinary Shares Number' in df_balance_sheet.index:
-        shares_data = df_balance_sheet.loc['Ordinary Shares Number'].dropna()
+        shares_data = statement_row(df_balance_sheet, 'Ordinary Shares Number')
         for col_date, shares_num in shares_data.items():
-            try:
-                year = pd.to_datetime(col_date).year
-                shares_outstanding_map[year] = shares_num
-            except ValueError:
-                # Handle cases where column name might not be a valid date
-                pass
+            shares_outstanding_map[col_date.year] = shares_num
     
     # Fallback: if no historical shares data, try to get from company info or use a default
     if not shares_outstanding_map:
@@ -99,18 +107,12 @@ def calculate_dcf(ticker_symbol, base_output_dir='saham', discount_rate=0.10, te
                 append_message(f"Warning: Using latest sharesOutstanding ({latest_shares:,.0f}) for all historical DCF calculations due to lack of historical data.")
         except Exception as e:
             append_message(f"Warning: Could not retrieve sharesOutstanding from company info: {e}")
-            append_message("Cannot calculate historical intrinsic value per share without shares outstanding data.")
-            with open(output_filename, 'w') as f:
-                f.write('\n'.join(output_messages))
-            return # Exit if no shares data at all
+            return fail("Cannot calculate historical intrinsic value per share without shares outstanding data.") # Exit if no shares data at all
 
 
     # Get the last available Free Cash Flow for the simple Gordon Growth Model
     if fcf_series.empty:
-        append_message("No Free Cash Flow data available for Gordon Growth Model calculation.")
-        with open(output_filename, 'w') as f:
-            f.write('\n'.join(output_messages))
-        return
+        return fail("No Free Cash Flow data available for Gordon Growth Model calculation.")
 
     last_fcf = fcf_series.iloc[-1]
     append_message(f"\nLatest Free Cash Flow (FCF) used for Gordon Growth Model: {last_fcf:,.0f} IDR")
@@ -124,6 +126,7 @@ def calculate_dcf(ticker_symbol, base_output_dir='saham', discount_rate=0.10, te
         # FCF_next_year = Last_FCF * (1 + Growth_Rate)
         intrinsic_value_total = last_fcf * (1 + terminal_growth_rate) / (discount_rate - terminal_growth_rate)
         append_message(f"\nEstimated Intrinsic Value (using Simple Gordon Growth Model): {intrinsic_value_total:,.0f} IDR")
+    results["intrinsic_value_total"] = intrinsic_value_total
     
     # Get latest shares outstanding for current intrinsic value per share
     latest_year_fcf = fcf_series.index.year[-1]
@@ -143,14 +146,17 @@ def calculate_dcf(ticker_symbol, base_output_dir='saham', discount_rate=0.10, te
         except ValueError:
             append_message("Warning: Could not convert currentPrice to float.")
             current_market_price = None
+    results["market_price"] = current_market_price
 
     if current_shares_outstanding is not None and current_shares_outstanding > 0:
         intrinsic_value_per_share = intrinsic_value_total / current_shares_outstanding
+        results["intrinsic_value_per_share"] = intrinsic_value_per_share
         append_message(f"\nTotal Estimated Intrinsic Value (Current): {intrinsic_value_total:,.0f} IDR")
         append_message(f"Estimated Intrinsic Value Per Share (Current): {intrinsic_value_per_share:,.2f} IDR")
         
         if current_market_price is not None:
             current_margin_of_safety = ((intrinsic_value_per_share - current_market_price) / current_market_price) * 100
+            results["margin_of_safety"] = current_margin_of_safety
             append_message(f"Current Market Price: {current_market_price:,.2f} IDR")
             append_message(f"Current Margin of Safety: {current_margin_of_safety:,.2f}%")
         else:
@@ -176,16 +182,8 @@ def calculate_dcf(ticker_symbol, base_output_dir='saham', discount_rate=0.10, te
         if historical_shares_outstanding is not None and historical_shares_outstanding > 0:
             historical_intrinsic_value_per_share = historical_intrinsic_value_total / historical_shares_outstanding
         
-        # Get historical market price for the year
-        # Assuming historical_prices has a 'Close' column and is indexed by date
-        market_price_for_year = None
-        # Find the closest market price for the year
-        if not df_historical_prices.empty:
-            # Filter prices for the current year
-            prices_in_year = df_historical_prices[df_historical_prices.index.year == year]
-            if not prices_in_year.empty:
-                # Get the last closing price of the year
-                market_price_for_year = prices_in_year['Close'].iloc[-1]
+        # Get historical market price for the year: the last closing price of the year
+        market_price_for_year = year_end_prices.get(year)
 
         historical_margin_of_safety = "N/A"
         if market_price_for_year is not None and historical_intrinsic_value_per_share > 0:
@@ -195,10 +193,12 @@ def calculate_dcf(ticker_symbol, base_output_dir='saham', discount_rate=0.10, te
         append_message(f'{year:<6} {historical_intrinsic_value_total:<25,.0f} {historical_intrinsic_value_per_share:<30,.2f} {(f"{market_price_for_year:,.2f}" if market_price_for_year is not None else "N/A"):<15} {historical_margin_of_safety:<18}')
 
     # Write all collected messages to the file at once
-    with open(output_filename, 'w') as f:
-        f.write('\n'.join(output_messages))
+    write_output()
+    save_results()
 
-    print(f"DCF analysis saved to {output_filename}")
+    if verbose and write_report:
+        print(f"DCF analysis saved to {output_filename}")
+    return results
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Calculate DCF for a stock ticker based on previously fetched data.')
@@ -206,8 +206,13 @@ if __name__ == "__main__":
     parser.add_argument('--dir', type=str, default='saham', help='The base directory where the ticker data is stored.')
     parser.add_argument('--r', type=float, default=10.0, help='The discount rate percentage (e.g., 10 for 10%).')
     parser.add_argument('--g', type=float, default=2.5, help='The terminal growth rate percentage (e.g., 2.5 for 2.5%).')
+    parser.add_argument('--db', type=str, default=None, help='SQLite results table to record the numbers in (default: <dir>/dcf_results.db).')
     args = parser.parse_args()
     ticker = args.ticker_symbol.upper()
     discount_rate = args.r / 100.0
     terminal_growth_rate = args.g / 100.0
-    calculate_dcf(ticker, args.dir, discount_rate, terminal_growth_rate)
+    results_db = args.db if args.db else default_results_db(args.dir)
+    result = calculate_dcf(ticker, args.dir, discount_rate, terminal_growth_rate, results_db=results_db)
+    if result["error"] is not None:
+        print(result["error"], file=sys.stderr)
+        sys.exit(1)
@@ -1,26 +1,80 @@
 import os
-import subprocess
 import sys
 import argparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def run_command(command, description):
-    try:
-        subprocess.run(command, capture_output=True, text=True, check=True)
-        return True
-    except (subprocess.CalledProcessError, Exception) as e:
-        # print(f"Error running command for {description}: {e}", file=sys.stderr)
-        return False
+from calculate_dcf import calculate_dcf
+from dcf_results_store import save_dcf_results, default_results_db
+from run_metrics import ticker_file_bytes
+from dependency_cache import DependencyCache, cached_stage, default_cache_db
 
-def calculate_dcf_for_ticker(ticker_folder, base_dir, r_val, g_val):
-    script_dir = "script"
-    calculate_dcf_script = os.path.join(script_dir, "calculate_dcf.py")
+# Files calculate_dcf() reads and writes, for the bytes counters in the run metrics
+DCF_INPUT_FILES = ["cashflow", "balance_sheet", "company_info", "year_end_prices"]
+DCF_OUTPUT_FILES = ["dcf_analysis"]
 
-    ticker_with_suffix = ticker_folder # The folder name already includes .JK
+def calculate_dcf_chunk(tickers, base_dir, discount_rate, terminal_growth_rate, cache_db=None):
+    # Runs inside a pool worker: calculate_dcf and pandas are imported once per worker,
+    # not once per ticker as with a subprocess per ticker. With cache_db, a ticker whose inputs and
+    # report are unchanged since the last run at these rates reuses that run's result ("reused").
+    cache = DependencyCache(cache_db) if cache_db else None
+    params = {"discount_rate": discount_rate, "terminal_growth_rate": terminal_growth_rate}
+    chunk_results = []
+    for ticker in tickers:
+        started = time.perf_counter()
+        report = os.path.join(base_dir, ticker, f"{ticker}_dcf_analysis.txt")
+        try:
+            result, reused = cached_stage(cache, "dcf", ticker, base_dir, params,
+                                          lambda: calculate_dcf(ticker, base_dir, discount_rate, terminal_growth_rate, verbose=False),
+                                          outputs=[report])
+        except Exception as e:
+            result, reused = {"ticker": ticker, "error": f"Exception: {e}"}, False
+        result["reused"] = reused
+        result["status"] = "Done" if result["error"] is None else "Fail"
+        # Measurements for run_metrics: time in the worker and the files read / the report written
+        result["seconds"] = time.perf_counter() - started
+        result["bytes_read"] = ticker_file_bytes(ticker, base_dir, DCF_INPUT_FILES)
+        result["bytes_written"] = ticker_file_bytes(ticker, base_dir, DCF_OUTPUT_FILES, extension=".txt")
+        chunk_results.append(result)
+    if cache is not None:
+        cache.close()
+    return chunk_results
 
-    command = ["python", calculate_dcf_script, ticker_with_suffix, "--dir", base_dir, "--r", str(r_val), "--g", str(g_val)]
-    success_dcf = run_command(command, f"calculate_dcf for {ticker_with_suffix}")
-    return ticker_with_suffix, success_dcf
+def split_into_chunks(tickers, max_workers, chunk_size=None):
+    if chunk_size is None or chunk_size <= 0:
+        # A few chunks per worker keeps the pool balanced without per-ticker IPC overhead
+        chunk_size = max(1, min(64, len(tickers) // (max_workers * 4)))
+    return [tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+
+def run_dcf_batch(tickers, base_dir, discount_rate, terminal_growth_rate, max_workers=None, chunk_size=None, cache_db=None):
+    # Yields one result dict per ticker (with "status" and "error") as chunks complete
+    if not tickers:
+        return
+    if max_workers is None or max_workers <= 0:
+        max_workers = os.cpu_count() or 1
+    chunks = split_into_chunks(list(tickers), max_workers, chunk_size)
+    max_workers = min(max_workers, len(chunks))
+
+    if max_workers == 1:
+        for chunk in chunks:
+            yield from calculate_dcf_chunk(chunk, base_dir, discount_rate, terminal_growth_rate, cache_db)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        future_to_chunk = {executor.submit(calculate_dcf_chunk, chunk, base_dir, discount_rate, terminal_growth_rate, cache_db): chunk for chunk in chunks}
+        for future in as_completed(future_to_chunk):
+            chunk = future_to_chunk[future]
+            try:
+                yield from future.result()
+            except Exception as exc:
+                # The worker itself died (e.g. killed by the OS); report every ticker in the chunk
+                for ticker in chunk:
+                    yield {"ticker": ticker, "status": "Fail", "error": f"Worker failed: {exc}"}
+
+def format_status(result):
+    if result["status"] == "Done":
+        return f"{result['ticker']}: Done"
+    return f"{result['ticker']}: Fail ({result['error']})"
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run DCF calculation for all tickers in a directory.")
@@ -28,6 +82,10 @@ if __name__ == "__main__":
     parser.add_argument("num_to_process", type=int, nargs='?', default=None, help="Optional: Number of tickers to process.")
     parser.add_argument("--r", type=float, default=10.0, help="The discount rate percentage (e.g., 10 for 10%).")
     parser.add_argument("--g", type=float, default=2.5, help="The terminal growth rate percentage (e.g., 2.5 for 2.5%).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Tickers per work unit (default: sized from the number of tickers and workers).")
+    parser.add_argument("--db", type=str, default=None, help="SQLite results table to record the numbers in (default: <dir>/dcf_results.db).")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every ticker instead of reusing results whose inputs have not changed.")
     args = parser.parse_args()
 
     saham_dir = args.dir
@@ -49,13 +107,20 @@ if __name__ == "__main__":
     else:
         tickers_to_process = all_ticker_folders
 
-    with ThreadPoolExecutor(max_workers=os.cpu_count() * 2) as executor:
-        future_to_ticker = {executor.submit(calculate_dcf_for_ticker, ticker, saham_dir, args.r, args.g): ticker for ticker in tickers_to_process}
-        for future in as_completed(future_to_ticker):
-            ticker = future_to_ticker[future]
-            try:
-                ticker_result, success = future.result()
-                status = "Done" if success else "Fail"
-                print(f"{ticker_result}: {status}")
-            except Exception as exc:
-                print(f"{ticker}: Fail (Exception: {exc})", file=sys.stderr)
\ No newline at end of file
+    discount_rate = args.r / 100.0
+    terminal_growth_rate = args.g / 100.0
+    cache_db = None if args.no_cache else default_cache_db(saham_dir)
+    results = []
+    failed = 0
+    reused = 0
+    for result in run_dcf_batch(tickers_to_process, saham_dir, discount_rate, terminal_growth_rate, args.workers, args.chunk_size, cache_db):
+        if result["status"] != "Done":
+            failed += 1
+        reused += result.get("reused", False)
+        print(format_status(result), flush=True)
+        results.append(result)
+
+    results_db = args.db if args.db else default_results_db(saham_dir)
+    save_dcf_results(results_db, results, discount_rate, terminal_growth_rate)
+
+    print(f"\n{len(tickers_to_process) - failed} of {len(tickers_to_process)} tickers valued, {failed} failed ({reused} unchanged and reused). Results saved to {results_db}")
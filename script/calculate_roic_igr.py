@@ -1,30 +1,11 @@
-import csv
 import os
 import argparse
 
-def parse_csv(file_path):
-    data = {}
-    with open(file_path, 'r') as f:
-        reader = csv.reader(f)
-        headers = next(reader)
-        years = [h for h in headers if h.startswith('20')] # Extract year columns
-        
-        for row in reader:
-            metric_name = row[0]
-            for i, year_str in enumerate(years):
-                year = year_str.split('-')[0] # Get just the year
-                if year not in data:
-                    data[year] = {}
-                try:
-                    # Handle empty strings or non-numeric values
-                    value = float(row[i + 1]) if row[i + 1] else 0.0
-                except ValueError:
-                    value = 0.0 # Default to 0.0 if conversion fails
-                data[year][metric_name] = value
-    return data, years
-
-def calculate_roic_igr(ticker, financials_data, balance_sheet_data, cashflow_data, r_expected, g_expected):
-    years = sorted(financials_data.keys())
+from compact_statement import CompactStatement
+
+def calculate_roic_igr(ticker, financials, balance_sheet, cashflow, r_expected, g_expected):
+    # Statements are CompactStatements; a missing or blank value counts as missing, not as zero
+    years = [str(year) for year in financials.years]
     
     print(f"Calculating ROIC and IGR for {ticker} with r_expected={r_expected*100:.2f}% and g_expected={g_expected*100:.2f}%")
     print("-" * 60)
@@ -38,15 +19,9 @@ def calculate_roic_igr(ticker, financials_data, balance_sheet_data, cashflow_dat
 
         print(f"Year: {current_year}")
 
-        # Extract data for current and previous year
-        current_fin = financials_data.get(current_year, {})
-        prev_bal = balance_sheet_data.get(previous_year, {})
-        current_bal = balance_sheet_data.get(current_year, {})
-        current_cf = cashflow_data.get(current_year, {})
-
         # NOPAT Calculation
-        ebit = current_fin.get('EBIT')
-        tax_rate = current_fin.get('Tax Rate For Calcs')
+        ebit = financials.value('EBIT', current_year)
+        tax_rate = financials.value('Tax Rate For Calcs', current_year)
 
         if ebit is None or tax_rate is None:
             print(f"  Skipping {current_year}: Missing EBIT or Tax Rate.")
@@ -56,7 +31,7 @@ def calculate_roic_igr(ticker, financials_data, balance_sheet_data, cashflow_dat
         print(f"  NOPAT: {nopat:,.2f}")
 
         # Invested Capital (Beginning of Period)
-        invested_capital_beginning = prev_bal.get('Invested Capital')
+        invested_capital_beginning = balance_sheet.value('Invested Capital', previous_year)
         if invested_capital_beginning is None:
             print(f"  Skipping {current_year}: Missing Invested Capital for previous year ({previous_year}).")
             continue
@@ -71,7 +46,7 @@ def calculate_roic_igr(ticker, financials_data, balance_sheet_data, cashflow_dat
             print(f"  ROIC: Cannot calculate (Invested Capital is zero).")
 
         # Reinvestment Rate Calculation
-        invested_capital_current = current_bal.get('Invested Capital')
+        invested_capital_current = balance_sheet.value('Invested Capital', current_year)
         if invested_capital_current is None:
             print(f"  Skipping {current_year}: Missing Invested Capital for current year ({current_year}).")
             continue
@@ -117,12 +92,12 @@ if __name__ == "__main__":
     balance_sheet_file = os.path.join(base_path, f"{ticker}_balance_sheet.csv")
     cashflow_file = os.path.join(base_path, f"{ticker}_cashflow.csv")
 
-    financials_data, _ = parse_csv(financials_file)
-    balance_sheet_data, _ = parse_csv(balance_sheet_file)
-    cashflow_data, _ = parse_csv(cashflow_file)
+    financials = CompactStatement.from_csv(financials_file)
+    balance_sheet = CompactStatement.from_csv(balance_sheet_file)
+    cashflow = CompactStatement.from_csv(cashflow_file)
 
     # Expected values for GGM
     r_expected = 0.10 # 10%
     g_expected = 0.0225 # 2.25%
 
-    calculate_roic_igr(ticker, financials_data, balance_sheet_data, cashflow_data, r_expected, g_expected)
+    calculate_roic_igr(ticker, financials, balance_sheet, cashflow, r_expected, g_expected)
@@ -0,0 +1,142 @@
+import csv
+import sys
+
+import numpy as np
+
+# Metric name -> id, shared by every statement in the process, so each line item name is stored once
+# however many tickers carry it
+METRIC_IDS = {}
+METRIC_NAMES = []
+
+def metric_id(name, create=True):
+    # Interned id of a line item name; None for a name never seen when create is False
+    found = METRIC_IDS.get(name)
+    if found is None and create:
+        found = len(METRIC_NAMES)
+        name = sys.intern(str(name))
+        METRIC_IDS[name] = found
+        METRIC_NAMES.append(name)
+    return found
+
+def _to_float(text):
+    # Blank or unparseable cells are missing, not zero
+    try:
+        return float(text) if text else np.nan
+    except ValueError:
+        return np.nan
+
+class CompactStatement:
+    # One statement as line items x fiscal years: a float64 matrix with NaN for anything missing,
+    # rows sorted by interned metric id and columns by ascending fiscal year (one column per year)
+    __slots__ = ("metric_ids", "years", "values")
+
+    def __init__(self, metric_ids, years, values):
+        self.metric_ids = metric_ids
+        self.years = years
+        self.values = values
+
+    @classmethod
+    def build(cls, metrics, years, values, source_positions=None):
+        # metrics: line item names, years: fiscal year per column, values: len(metrics) x len(years),
+        # source_positions: each column's position in the file (default: the columns' order).
+        # A repeated year keeps the column that comes last in the file and a repeated line item its
+        # last row, as the dict-of-dicts did (each later cell overwrote data[year][metric]).
+        values = np.asarray(values, dtype='float64').reshape(len(metrics), len(years))
+        years = np.asarray(years, dtype='int16')
+        if source_positions is None:
+            source_positions = np.arange(len(years))
+        order = np.lexsort((np.asarray(source_positions), years))
+        last_of_year = np.r_[years[order][1:] != years[order][:-1], True]
+        columns = order[last_of_year]
+
+        ids = np.fromiter((metric_id(name) for name in metrics), dtype='int32', count=len(metrics))
+        # First occurrence in the reversed ids is the last row of each line item
+        unique_ids, reversed_rows = np.unique(ids[::-1], return_index=True)
+        rows = len(ids) - 1 - reversed_rows
+        matrix = np.ascontiguousarray(values[np.ix_(rows, columns)])
+        return cls(unique_ids, years[columns], matrix)
+
+    @classmethod
+    def from_frame(cls, df):
+        # From a normalize_statement() frame (date columns, float values); None stays None
+        if df is None:
+            return None
+        return cls.build([str(name) for name in df.index], [date.year for date in df.columns], df.to_numpy(),
+                         df.attrs.get("source_positions"))
+
+    @classmethod
+    def from_csv(cls, file_path):
+        # Reads a saved yfinance statement directly: first column the line item, date columns "YYYY-..."
+        with open(file_path, 'r', newline='') as f:
+            reader = csv.reader(f)
+            headers = next(reader)
+            year_columns = [i for i, h in enumerate(headers) if i > 0 and h[:4].isdigit() and h[:2] in ('19', '20')]
+            metrics, values = [], []
+            for row in reader:
+                if not row:
+                    continue
+                metrics.append(row[0])
+                values.extend(_to_float(row[i]) if i < len(row) else np.nan for i in year_columns)
+        return cls.build(metrics, [int(headers[i][:4]) for i in year_columns], values)
+
+    def __len__(self):
+        return len(self.years)
+
+    @property
+    def nbytes(self):
+        return self.metric_ids.nbytes + self.years.nbytes + self.values.nbytes
+
+    def metrics(self):
+        return [METRIC_NAMES[i] for i in self.metric_ids]
+
+    def _row_index(self, metric):
+        found = metric_id(metric, create=False)
+        if found is None:
+            return None
+        position = np.searchsorted(self.metric_ids, found)
+        if position < len(self.metric_ids) and self.metric_ids[position] == found:
+            return position
+        return None
+
+    def __contains__(self, metric):
+        return self._row_index(metric) is not None
+
+    def row(self, metric):
+        # Values of one line item per fiscal year (a read-only view); all NaN if the row is missing
+        position = self._row_index(metric)
+        if position is None:
+            return np.full(len(self.years), np.nan)
+        row = self.values[position]
+        row.flags.writeable = False
+        return row
+
+    def value(self, metric, year, missing=None):
+        # One value as a float, or `missing` when the line item, the year or the value is absent
+        position = self._row_index(metric)
+        column = self.year_index(year)
+        if position is None or column is None:
+            return missing
+        value = self.values[position, column]
+        return missing if np.isnan(value) else float(value)
+
+    def year_index(self, year):
+        column = np.searchsorted(self.years, int(year))
+        if column < len(self.years) and self.years[column] == int(year):
+            return int(column)
+        return None
+
+    def aligned(self, metric, years):
+        # Line item values at the given fiscal years, NaN where this statement has no such year;
+        # lines two statements (or a statement and itself) up by year rather than by position
+        row = self.row(metric)
+        years = np.asarray(years)
+        columns = np.minimum(np.searchsorted(self.years, years), max(len(self.years) - 1, 0))
+        if not len(self.years):
+            return np.full(len(years), np.nan)
+        return np.where(self.years[columns] == years, row[columns], np.nan)
+
+    def shifted(self, metric, periods=1, years=None):
+        # Value of the line item `periods` fiscal years earlier, at each of `years` (default: this
+        # statement's own years); NaN where that earlier year is not in the statement
+        years = self.years if years is None else np.asarray(years)
+        return self.aligned(metric, years - periods)
@@ -0,0 +1,279 @@
+import http.client
+import io
+import os
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit, quote
+
+import pandas as pd
+
+# Frames every provider yields, grouped by the datasets the fetch manifest tracks
+DATASET_FRAMES = {
+    "info": ["info"],
+    "statements": ["balance_sheet", "financials", "cashflow"],
+    "prices": ["prices"],
+}
+
+# Frame name -> file suffix in the saham/<TICKER>/ layout
+FRAME_FILES = {
+    "info": "company_info",
+    "balance_sheet": "balance_sheet",
+    "financials": "financials",
+    "cashflow": "cashflow",
+    "prices": "historical_prices",
+}
+
+class TransientFetchError(Exception):
+    # A failure worth retrying later (connection reset, timeout, 5xx)
+    pass
+
+class ThrottledError(TransientFetchError):
+    # The provider asked us to slow down; retry_after is its hint in seconds, if it gave one
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class DataProvider:
+    # Yields the same frames get_fundamental_data.py saves:
+    # info (a 'Value' column indexed by field), balance sheet, financials and cash flow
+    # (line items x fiscal dates) and price history (dates x Close/Volume/...)
+    name = "base"
+
+    def get_info(self, ticker):
+        raise NotImplementedError
+
+    def get_balance_sheet(self, ticker):
+        raise NotImplementedError
+
+    def get_financials(self, ticker):
+        raise NotImplementedError
+
+    def get_cashflow(self, ticker):
+        raise NotImplementedError
+
+    def get_history(self, ticker):
+        raise NotImplementedError
+
+    def get_latest_prices(self, tickers):
+        # {ticker: latest price} for many tickers at once, for price-only refreshes; this default
+        # reads each ticker's info, providers with a batch endpoint override it. Tickers without a
+        # price are left out.
+        prices = {}
+        for ticker in tickers:
+            try:
+                info = self.get_info(ticker)
+                price = float(info.loc['currentPrice', 'Value'])
+            except (FileNotFoundError, KeyError, ValueError, TypeError):
+                continue
+            if price == price:
+                prices[ticker] = price
+        return prices
+
+    def fetch(self, ticker, datasets=None):
+        if datasets is None:
+            datasets = list(DATASET_FRAMES)
+        frames = {}
+        if "info" in datasets:
+            frames["info"] = self.get_info(ticker)
+        if "statements" in datasets:
+            frames["balance_sheet"] = self.get_balance_sheet(ticker)
+            frames["financials"] = self.get_financials(ticker)
+            frames["cashflow"] = self.get_cashflow(ticker)
+        if "prices" in datasets:
+            frames["prices"] = self.get_history(ticker)
+        return frames
+
+class YFinanceProvider(DataProvider):
+    # yfinance keeps one HTTP session for every Ticker in the process; pass a session
+    # (e.g. a curl_cffi Session) to control pooling yourself
+    name = "yfinance"
+
+    def __init__(self, session=None, history_years=5):
+        # Imported here so offline providers work on machines without yfinance
+        import yfinance as yf
+        self._yf = yf
+        self.session = session
+        self.history_years = history_years
+
+    def _ticker(self, ticker):
+        if self.session is not None:
+            return self._yf.Ticker(ticker, session=self.session)
+        return self._yf.Ticker(ticker)
+
+    def get_info(self, ticker):
+        # Convert dictionary to DataFrame for easier saving
+        return pd.DataFrame.from_dict(self._ticker(ticker).info, orient='index', columns=['Value'])
+
+    def get_balance_sheet(self, ticker):
+        return self._ticker(ticker).balance_sheet
+
+    def get_financials(self, ticker):
+        return self._ticker(ticker).financials
+
+    def get_cashflow(self, ticker):
+        return self._ticker(ticker).cashflow
+
+    def _history(self, stock):
+        # Define start and end dates for historical data (e.g., last 5 years)
+        end_date = datetime.now().strftime("%Y-%m-%d")
+        start_date = (datetime.now() - pd.DateOffset(years=self.history_years)).strftime("%Y-%m-%d")
+
+        # Get historical price data
+        historical_data = stock.history(start=start_date, end=end_date)
+
+        # Define desired columns, and check if 'Dividends' and 'Stock Splits' exist
+        desired_columns = ['Close', 'Volume']
+        if 'Dividends' in historical_data.columns:
+            desired_columns.append('Dividends')
+        if 'Stock Splits' in historical_data.columns:
+            desired_columns.append('Stock Splits')
+
+        # Select only desired columns that exist in the DataFrame
+        return historical_data[desired_columns]
+
+    def get_history(self, ticker):
+        return self._history(self._ticker(ticker))
+
+    def fetch(self, ticker, datasets=None):
+        # Map yfinance's throttling and transport errors onto the retryable error types
+        try:
+            return self._fetch(ticker, datasets)
+        except self._yf.exceptions.YFRateLimitError as e:
+            raise ThrottledError(f"Rate limited by Yahoo Finance: {e}") from e
+        except OSError as e:
+            # curl_cffi's request errors are OSErrors too
+            raise TransientFetchError(f"{type(e).__name__}: {e}") from e
+
+    def get_latest_prices(self, tickers):
+        # One batched download of the last few daily bars instead of an info fetch per ticker;
+        # unadjusted closes, like info's currentPrice
+        tickers = list(tickers)
+        options = {"session": self.session} if self.session is not None else {}
+        try:
+            data = self._yf.download(tickers, period="5d", interval="1d", auto_adjust=False,
+                                     progress=False, threads=True, **options)
+        except self._yf.exceptions.YFRateLimitError as e:
+            raise ThrottledError(f"Rate limited by Yahoo Finance: {e}") from e
+        except OSError as e:
+            raise TransientFetchError(f"{type(e).__name__}: {e}") from e
+        if data is None or data.empty:
+            return {}
+        closes = data['Close']
+        if isinstance(closes, pd.Series):
+            closes = closes.to_frame(tickers[0])
+        latest = closes.ffill().iloc[-1]
+        return {str(ticker): float(price) for ticker, price in latest.items() if pd.notna(price)}
+
+    def _fetch(self, ticker, datasets=None):
+        # Reuse one Ticker object across datasets, as get_fundamental_data.py always has
+        if datasets is None:
+            datasets = list(DATASET_FRAMES)
+        stock = self._ticker(ticker)
+        frames = {}
+        if "info" in datasets:
+            frames["info"] = pd.DataFrame.from_dict(stock.info, orient='index', columns=['Value'])
+        if "statements" in datasets:
+            frames["balance_sheet"] = stock.balance_sheet
+            frames["financials"] = stock.financials
+            frames["cashflow"] = stock.cashflow
+        if "prices" in datasets:
+            frames["prices"] = self._history(stock)
+        return frames
+
+class CsvFrameProvider(DataProvider):
+    # Providers that hand back the saved CSVs themselves; subclasses implement _read()
+    def _read(self, ticker, frame_name):
+        raise NotImplementedError
+
+    def get_info(self, ticker):
+        return self._read(ticker, "info")
+
+    def get_balance_sheet(self, ticker):
+        return self._read(ticker, "balance_sheet")
+
+    def get_financials(self, ticker):
+        return self._read(ticker, "financials")
+
+    def get_cashflow(self, ticker):
+        return self._read(ticker, "cashflow")
+
+    def get_history(self, ticker):
+        return self._read(ticker, "prices")
+
+class FixtureProvider(CsvFrameProvider):
+    # Replays recorded or synthetic data from a directory in the saham/<TICKER>/ layout
+    # (any earlier run's output works as a recording), with no network access
+    name = "fixture"
+
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+
+    def _read(self, ticker, frame_name):
+        file_path = os.path.join(self.fixture_dir, ticker, f"{ticker}_{FRAME_FILES[frame_name]}.csv")
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"No recorded {frame_name} for {ticker} at {file_path}")
+        # Dates stay as recorded strings and floats round-trip, so saving the frame reproduces the recording
+        return pd.read_csv(file_path, index_col=0, float_precision='round_trip')
+
+class HttpProvider(CsvFrameProvider):
+    # Fetches the saved CSVs from a stand-in server (see async_fetcher.make_stand_in_server) over
+    # keep-alive connections; each worker thread holds one persistent connection
+    name = "http"
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _get(self, path):
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                # The server may have closed an idle keep-alive connection; reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise TransientFetchError(f"{type(e).__name__}: {e}") from e
+                continue
+            if response.status == 429:
+                try:
+                    retry_after = float(response.getheader("Retry-After"))
+                except (TypeError, ValueError):
+                    retry_after = None
+                raise ThrottledError(f"HTTP 429 for {path}", retry_after)
+            if response.status >= 500:
+                raise TransientFetchError(f"HTTP {response.status} for {path}")
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status} for {path}")
+            return body.decode('utf-8')
+
+    def _read(self, ticker, frame_name):
+        body = self._get(f"{self.prefix}/{quote(ticker)}/{frame_name}")
+        return pd.read_csv(io.StringIO(body), index_col=0, float_precision='round_trip')
+
+def make_provider(spec="yfinance"):
+    # "yfinance", "fixture:<directory>" or an http:// URL of a stand-in server
+    if spec == "yfinance":
+        return YFinanceProvider()
+    if spec.startswith("fixture:"):
+        fixture_dir = spec[len("fixture:"):]
+        if not os.path.isdir(fixture_dir):
+            raise ValueError(f"Fixture directory '{fixture_dir}' not found")
+        return FixtureProvider(fixture_dir)
+    if spec.startswith("http://"):
+        return HttpProvider(spec)
+    raise ValueError(f"Unknown data provider '{spec}' (use yfinance, fixture:<dir> or http://host:port)")
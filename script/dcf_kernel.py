@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+import argparse
+import os
+import sys
+
+from fundamentals_store import load_line_items, load_year_end_prices, list_tickers
+from price_index import load_price_index, year_end_closes
+from statement_loader import load_ticker_statements, statement_file, projection
+
+def gordon_growth_kernel(fcf, shares, price, discount_rate, terminal_growth_rate, dcf_rules=False):
+    # Simple Gordon Growth Model over whole arrays at once.
+    # fcf, shares and price broadcast against each other (e.g. tickers x years), and so do
+    # discount_rate / terminal_growth_rate, which may be scalars or arrays of scenarios.
+    # Zero/missing shares and a missing or non-positive price give NaN, and so does r <= g.
+    # calculate_dcf() differs on the last two: it values the company at zero when r <= g (a margin
+    # of safety of -100%) and takes a negative price at face value. dcf_rules follows it there,
+    # for callers that must select what screen.py selects.
+    fcf = np.asarray(fcf, dtype=np.float64)
+    shares = np.asarray(shares, dtype=np.float64)
+    price = np.asarray(price, dtype=np.float64)
+    r = np.asarray(discount_rate, dtype=np.float64)
+    g = np.asarray(terminal_growth_rate, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = np.where(r > g, r - g, np.nan)
+        intrinsic_value = fcf * (1 + g) / spread
+        if dcf_rules:
+            intrinsic_value = np.where(r > g, intrinsic_value, np.where(np.isnan(fcf), np.nan, 0.0))
+        value_per_share = intrinsic_value / np.where(shares > 0, shares, np.nan)
+        priced = price != 0 if dcf_rules else price > 0
+        margin_of_safety = (value_per_share - price) / np.where(priced, price, np.nan) * 100
+    return intrinsic_value, value_per_share, margin_of_safety
+
+def _row_by_year(df, row_name):
+    # {fiscal year: value} for one statement row, skipping NaNs and non-date columns
+    values = {}
+    if row_name not in df.index:
+        return values
+    for col_date, value in df.loc[row_name].dropna().items():
+        try:
+            values[pd.to_datetime(col_date).year] = float(value)
+        except (ValueError, TypeError):
+            pass
+    return values
+
+def _info_value(df_company_info, key):
+    try:
+        if key in df_company_info.index:
+            return float(df_company_info.loc[key, 'Value'])
+    except (ValueError, TypeError):
+        pass
+    return np.nan
+
+def load_ticker_inputs(ticker, base_dir, with_prices=True, fields=None, dcf_rules=False):
+    # calculate_dcf()'s inputs reduced to plain per-year dicts. Without with_prices the year-end
+    # price history (only the historical table needs it) is left empty.
+    # By default the company info's sharesOutstanding stands in for missing balance-sheet shares,
+    # which calculate_dcf() does not manage: it reads that value as text and fails the ticker
+    # ("Cannot calculate historical intrinsic value per share..." or a str/int comparison). With
+    # dcf_rules, such a ticker gets no current shares, and one without its daily price history, or
+    # whose price index cannot be read, raises as in calculate_dcf(), so screens built on these
+    # inputs value exactly the tickers calculate_dcf() values.
+    statements = load_ticker_statements(ticker, base_dir, fields or projection("dcf"))
+    for statement in ("cashflow", "balance_sheet", "info"):
+        if statements[statement] is None:
+            raise FileNotFoundError(f"{statement_file(ticker, base_dir, statement)} not found")
+    df_cashflow = statements["cashflow"]
+    df_balance_sheet = statements["balance_sheet"]
+    df_company_info = statements["info"]
+
+    fcf = _row_by_year(df_cashflow, 'Free Cash Flow')
+    shares = _row_by_year(df_balance_sheet, 'Ordinary Shares Number')
+    latest_shares = np.nan if dcf_rules else _info_value(df_company_info, 'sharesOutstanding')
+    if not shares and not np.isnan(latest_shares):
+        shares = {year: latest_shares for year in fcf}
+
+    if dcf_rules:
+        prices_file = os.path.join(base_dir, ticker, f"{ticker}_historical_prices.csv")
+        if not os.path.exists(prices_file):
+            raise FileNotFoundError(f"Historical prices data not found for {ticker} at {prices_file}")
+    price_index = load_price_index(ticker, base_dir) if with_prices or dcf_rules else None
+    year_end_price = year_end_closes(price_index) if with_prices else {}
+
+    last_year = max(fcf) if fcf else None
+    current_shares = shares.get(last_year, latest_shares) if last_year is not None else np.nan
+    return {
+        "fcf": fcf,
+        "shares": shares,
+        "year_end_price": year_end_price,
+        "last_year": last_year,
+        "current_shares": current_shares,
+        "current_price": _info_value(df_company_info, 'currentPrice')
+    }
+
+def build_universe_panel(inputs_by_ticker):
+    # Lays per-ticker inputs out as dense tickers x fiscal-years matrices (NaN where missing)
+    tickers = sorted(inputs_by_ticker)
+    years = sorted({year for inputs in inputs_by_ticker.values() for year in inputs["fcf"]})
+    year_pos = {year: j for j, year in enumerate(years)}
+
+    shape = (len(tickers), len(years))
+    fcf = np.full(shape, np.nan)
+    shares = np.full(shape, np.nan)
+    year_end_price = np.full(shape, np.nan)
+    last_fcf = np.full(len(tickers), np.nan)
+    current_shares = np.full(len(tickers), np.nan)
+    current_price = np.full(len(tickers), np.nan)
+
+    for i, ticker in enumerate(tickers):
+        inputs = inputs_by_ticker[ticker]
+        for year, value in inputs["fcf"].items():
+            fcf[i, year_pos[year]] = value
+        for year, value in inputs["shares"].items():
+            if year in year_pos:
+                shares[i, year_pos[year]] = value
+        for year, value in inputs["year_end_price"].items():
+            if year in year_pos:
+                year_end_price[i, year_pos[year]] = value
+        if inputs["last_year"] is not None:
+            last_fcf[i] = inputs["fcf"][inputs["last_year"]]
+        current_shares[i] = inputs["current_shares"]
+        current_price[i] = inputs["current_price"]
+
+    return {
+        "tickers": tickers,
+        "years": years,
+        "fcf": fcf,
+        "shares": shares,
+        "year_end_price": year_end_price,
+        "last_fcf": last_fcf,
+        "current_shares": current_shares,
+        "current_price": current_price
+    }
+
+def load_universe_panel(base_dir, tickers=None):
+    if tickers is None:
+        tickers = [d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))]
+    inputs_by_ticker = {}
+    errors = {}
+    for ticker in tickers:
+        try:
+            inputs_by_ticker[ticker] = load_ticker_inputs(ticker, base_dir)
+        except Exception as e:
+            errors[ticker] = str(e)
+    return build_universe_panel(inputs_by_ticker), errors
+
+def load_universe_panel_from_store(db_path, tickers=None):
+    # Same panel as load_universe_panel(), built from four line-item reads of the fundamentals store
+    df_fcf = load_line_items(db_path, "cashflow", ["Free Cash Flow"], tickers)
+    df_shares = load_line_items(db_path, "balance_sheet", ["Ordinary Shares Number"], tickers)
+    df_info = load_line_items(db_path, "info", ["sharesOutstanding", "currentPrice"], tickers)
+    df_prices = load_year_end_prices(db_path, tickers)
+
+    def by_ticker_year(df):
+        values = {}
+        for ticker, fiscal_date, value in zip(df['ticker'], df['fiscal_date'], df['value']):
+            values.setdefault(ticker, {})[int(fiscal_date[:4])] = float(value)
+        return values
+
+    fcf_by_ticker = by_ticker_year(df_fcf)
+    shares_by_ticker = by_ticker_year(df_shares)
+    info = {(ticker, item): value for ticker, item, value in zip(df_info['ticker'], df_info['line_item'], df_info['value'])}
+    prices_by_ticker = {}
+    for ticker, year, value in zip(df_prices['ticker'], df_prices['year'], df_prices['value']):
+        prices_by_ticker.setdefault(ticker, {})[int(year)] = float(value)
+
+    inputs_by_ticker = {}
+    for ticker, fcf in fcf_by_ticker.items():
+        latest_shares = info.get((ticker, "sharesOutstanding"), np.nan)
+        shares = shares_by_ticker.get(ticker, {})
+        if not shares and not np.isnan(latest_shares):
+            shares = {year: latest_shares for year in fcf}
+        last_year = max(fcf)
+        inputs_by_ticker[ticker] = {
+            "fcf": fcf,
+            "shares": shares,
+            "year_end_price": prices_by_ticker.get(ticker, {}),
+            "last_year": last_year,
+            "current_shares": shares.get(last_year, latest_shares),
+            "current_price": info.get((ticker, "currentPrice"), np.nan)
+        }
+
+    requested = tickers if tickers is not None else list_tickers(db_path)
+    errors = {ticker: "No Free Cash Flow data in store" for ticker in requested if ticker not in inputs_by_ticker}
+    return build_universe_panel(inputs_by_ticker), errors
+
+def value_universe(panel, discount_rate, terminal_growth_rate):
+    # Current valuation (latest FCF vs current price) and the historical table for every ticker and year
+    intrinsic_value, value_per_share, margin_of_safety = gordon_growth_kernel(
+        panel["last_fcf"], panel["current_shares"], panel["current_price"], discount_rate, terminal_growth_rate)
+    hist_value, hist_value_per_share, hist_mos = gordon_growth_kernel(
+        panel["fcf"], panel["shares"], panel["year_end_price"], discount_rate, terminal_growth_rate)
+    # The historical table only reports a margin of safety for a positive value per share
+    hist_mos = np.where(hist_value_per_share > 0, hist_mos, np.nan)
+    return {
+        "intrinsic_value": intrinsic_value,
+        "intrinsic_value_per_share": value_per_share,
+        "margin_of_safety": margin_of_safety,
+        "historical_intrinsic_value": hist_value,
+        "historical_intrinsic_value_per_share": hist_value_per_share,
+        "historical_margin_of_safety": hist_mos
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Value every ticker in a directory with the vectorized Gordon Growth kernel.")
+    parser.add_argument("--dir", type=str, default="saham", help="The directory containing the ticker folders.")
+    parser.add_argument("--r", type=float, default=10.0, help="The discount rate percentage (e.g., 10 for 10%%).")
+    parser.add_argument("--g", type=float, default=2.5, help="The terminal growth rate percentage (e.g., 2.5 for 2.5%%).")
+    parser.add_argument("--store", type=str, default=None, help="Read inputs from this fundamentals store instead of the per-ticker CSVs.")
+    parser.add_argument("--output", type=str, default="universe_valuation.csv", help="Output CSV with one row per ticker.")
+    args = parser.parse_args()
+
+    if not args.store and not os.path.exists(args.dir):
+        print(f"Error: Directory '{args.dir}' not found.", file=sys.stderr)
+        sys.exit(1)
+
+    if args.store:
+        panel, errors = load_universe_panel_from_store(args.store)
+    else:
+        panel, errors = load_universe_panel(args.dir)
+    for ticker, error in sorted(errors.items()):
+        print(f"{ticker}: Fail ({error})", file=sys.stderr)
+
+    valuation = value_universe(panel, args.r / 100.0, args.g / 100.0)
+    df = pd.DataFrame({
+        'kode': panel["tickers"],
+        'intrinsic value': valuation["intrinsic_value"],
+        'intrinsic value per share': valuation["intrinsic_value_per_share"],
+        'market price': panel["current_price"],
+        'margin of safety': valuation["margin_of_safety"]
+    })
+    df.to_csv(args.output, index=False)
+    print(f"Valued {len(df)} tickers across {len(panel['years'])} fiscal years; saved to {args.output}")
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import argparse
+import os
+import sys
+import time
+import zlib
+
+from dcf_kernel import load_universe_panel, load_universe_panel_from_store, gordon_growth_kernel
+
+# Distribution name -> number of parameters, all in percent:
+#   fixed:v  normal:mean,sd  uniform:low,high  triangular:low,mode,high  lognormal:median,sigma
+DISTRIBUTIONS = {"fixed": 1, "normal": 2, "uniform": 2, "triangular": 3, "lognormal": 2}
+DEFAULT_PERCENTILES = [5, 25, 50, 75, 95]
+
+def parse_distribution(spec):
+    # "normal:10,1" -> ("normal", [10.0, 1.0]); a bare number is a fixed value
+    name, _, params = spec.partition(':')
+    if not params:
+        try:
+            return "fixed", [float(name)]
+        except ValueError:
+            pass
+    name = name.strip().lower()
+    if name not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution '{name}' (known: {', '.join(DISTRIBUTIONS)})")
+    try:
+        values = [float(value) for value in params.split(',')]
+    except ValueError:
+        raise ValueError(f"Invalid parameters in '{spec}'")
+    if len(values) != DISTRIBUTIONS[name]:
+        raise ValueError(f"'{name}' takes {DISTRIBUTIONS[name]} parameter(s), got {len(values)} in '{spec}'")
+    return name, values
+
+def draw(rng, distribution, size):
+    # Draws in percent from a parsed distribution
+    name, params = distribution
+    if name == "fixed":
+        return np.full(size, params[0])
+    if name == "normal":
+        return rng.normal(params[0], params[1], size)
+    if name == "uniform":
+        return rng.uniform(params[0], params[1], size)
+    if name == "triangular":
+        return rng.triangular(params[0], params[1], params[2], size)
+    return rng.lognormal(np.log(params[0]), params[1], size)
+
+def draw_scenarios(n_draws, r_distribution, g_distribution, seed=0):
+    # Market-wide (r, g) scenarios as fractions, shared by every ticker. Scenarios with r <= g have
+    # no Gordon Growth value and are dropped; returns (r, g, number dropped).
+    rng = np.random.default_rng([seed, 0])
+    r = draw(rng, r_distribution, n_draws) / 100.0
+    g = draw(rng, g_distribution, n_draws) / 100.0
+    valid = r > g
+    return r[valid], g[valid], int((~valid).sum())
+
+def ticker_haircuts(tickers, n_draws, haircut_distribution, seed=0):
+    # draws x tickers FCF haircuts as fractions; each ticker's stream is seeded from its name, so a
+    # ticker gets the same draws whatever else is in the universe
+    haircuts = np.empty((n_draws, len(tickers)))
+    for j, ticker in enumerate(tickers):
+        rng = np.random.default_rng([seed, 1, zlib.crc32(ticker.encode())])
+        haircuts[:, j] = draw(rng, haircut_distribution, n_draws) / 100.0
+    return haircuts
+
+def monte_carlo_universe(panel, n_draws, r_distribution, g_distribution, haircut_distribution,
+                         seed=0, percentiles=DEFAULT_PERCENTILES, block_size=256):
+    # Intrinsic value per share percentiles and P(MoS > 0) for every ticker, evaluated as
+    # draws x tickers arrays a block of tickers at a time (memory stays at draws x block_size)
+    r, g, dropped = draw_scenarios(n_draws, r_distribution, g_distribution, seed)
+    tickers = panel["tickers"]
+    n_tickers = len(tickers)
+    value_percentiles = np.full((len(percentiles), n_tickers), np.nan)
+    prob_positive_mos = np.full(n_tickers, np.nan)
+
+    # Tickers without usable inputs would be NaN in every draw; leave them out of the arrays
+    usable = np.flatnonzero(~np.isnan(panel["last_fcf"]) & (panel["current_shares"] > 0) & (panel["current_price"] > 0))
+    for start in range(0, len(usable), block_size):
+        block = usable[start:start + block_size]
+        haircut = ticker_haircuts([tickers[i] for i in block], len(r), haircut_distribution, seed)
+        fcf = panel["last_fcf"][block] * (1 - haircut)
+        _, value_per_share, margin_of_safety = gordon_growth_kernel(
+            fcf, panel["current_shares"][block], panel["current_price"][block], r[:, None], g[:, None])
+        if len(r):
+            value_percentiles[:, block] = np.percentile(value_per_share, percentiles, axis=0)
+            prob_positive_mos[block] = (margin_of_safety > 0).mean(axis=0)
+
+    return {
+        "percentiles": list(percentiles),
+        "intrinsic_value_per_share": value_percentiles,
+        "prob_positive_mos": prob_positive_mos,
+        "draws": len(r),
+        "dropped_draws": dropped,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo GGM valuation: intrinsic value percentiles and P(MoS > 0) per ticker.",
+                                     epilog="Distributions (in percent): fixed:v, normal:mean,sd, uniform:low,high, triangular:low,mode,high, lognormal:median,sigma.")
+    parser.add_argument("--dir", type=str, default="saham", help="The directory containing the ticker folders.")
+    parser.add_argument("--store", type=str, default=None, help="Read inputs from this fundamentals store instead of the per-ticker CSVs.")
+    parser.add_argument("--draws", type=int, default=10000, help="Number of scenarios.")
+    parser.add_argument("--r", type=str, default="normal:10,1", help="Discount rate distribution (percent).")
+    parser.add_argument("--g", type=str, default="uniform:1.5,3.5", help="Terminal growth rate distribution (percent).")
+    parser.add_argument("--haircut", type=str, default="uniform:0,20", help="FCF haircut distribution (percent cut from the latest FCF), drawn per ticker.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed and inputs always give the same results.")
+    parser.add_argument("--percentiles", type=str, default=",".join(str(p) for p in DEFAULT_PERCENTILES), help="Comma-separated percentiles of intrinsic value per share.")
+    parser.add_argument("--block-size", type=int, default=256, help="Tickers evaluated together (memory is draws x block size).")
+    parser.add_argument("--output", type=str, default="dcf_monte_carlo.csv", help="Output CSV with one row per ticker.")
+    args = parser.parse_args()
+
+    if not args.store and not os.path.exists(args.dir):
+        print(f"Error: Directory '{args.dir}' not found.", file=sys.stderr)
+        sys.exit(1)
+    try:
+        distributions = [parse_distribution(spec) for spec in (args.r, args.g, args.haircut)]
+        percentiles = [float(p) for p in args.percentiles.split(',') if p.strip()]
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.store:
+        panel, errors = load_universe_panel_from_store(args.store)
+    else:
+        panel, errors = load_universe_panel(args.dir)
+    for ticker, error in sorted(errors.items()):
+        print(f"{ticker}: Fail ({error})", file=sys.stderr)
+
+    started = time.perf_counter()
+    results = monte_carlo_universe(panel, args.draws, *distributions, seed=args.seed,
+                                   percentiles=percentiles, block_size=args.block_size)
+    seconds = time.perf_counter() - started
+    if results["dropped_draws"]:
+        print(f"Dropped {results['dropped_draws']} of {args.draws} draws with r <= g")
+
+    df = pd.DataFrame({'kode': panel["tickers"], 'market price': panel["current_price"]})
+    for p, values in zip(percentiles, results["intrinsic_value_per_share"]):
+        df[f'intrinsic value per share p{p:g}'] = values
+    df['prob mos > 0'] = results["prob_positive_mos"]
+    df.to_csv(args.output, index=False)
+    print(f"{results['draws']} draws x {len(df)} tickers valued in {seconds:.2f}s; saved to {args.output}")
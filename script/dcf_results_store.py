@@ -0,0 +1,127 @@
+import sqlite3
+import os
+from datetime import datetime
+
+RESULTS_DB_FILENAME = "dcf_results.db"
+
+RESULT_COLUMNS = ["intrinsic_value_total", "intrinsic_value_per_share", "market_price", "margin_of_safety", "error"]
+
+def default_results_db(base_dir):
+    return os.path.join(base_dir, RESULTS_DB_FILENAME)
+
+def _rate_key(rate):
+    # Rates are part of the primary key; round so 0.1 and 0.1000000001 land on the same row
+    return round(float(rate), 6)
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dcf_results (
+            ticker TEXT NOT NULL,
+            discount_rate REAL NOT NULL,
+            terminal_growth_rate REAL NOT NULL,
+            intrinsic_value_total REAL,
+            intrinsic_value_per_share REAL,
+            market_price REAL,
+            margin_of_safety REAL,
+            error TEXT,
+            computed_at TEXT NOT NULL,
+            PRIMARY KEY (ticker, discount_rate, terminal_growth_rate)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dcf_results_params ON dcf_results (discount_rate, terminal_growth_rate, margin_of_safety)")
+    # Parameter sets written by batch runs over a universe; they define the "latest run", so a
+    # one-off single-ticker valuation at other rates does not
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS runs (
+            discount_rate REAL NOT NULL,
+            terminal_growth_rate REAL NOT NULL,
+            recorded_at TEXT NOT NULL,
+            PRIMARY KEY (discount_rate, terminal_growth_rate)
+        )
+    """)
+    return conn
+
+def _as_float(value):
+    # NumPy scalars and None both end up as plain SQLite values
+    return None if value is None else float(value)
+
+def save_dcf_results(db_path, results, discount_rate, terminal_growth_rate, record_run=True):
+    # results: iterable of calculate_dcf() result dicts; one row per (ticker, r, g), newest wins.
+    # Batch callers record (r, g) as the latest run; single-ticker saves pass record_run=False.
+    computed_at = datetime.now().isoformat(timespec='seconds')
+    rows = [
+        (
+            result["ticker"], _rate_key(discount_rate), _rate_key(terminal_growth_rate),
+            _as_float(result.get("intrinsic_value_total")), _as_float(result.get("intrinsic_value_per_share")),
+            _as_float(result.get("market_price")), _as_float(result.get("margin_of_safety")),
+            result.get("error"), computed_at
+        )
+        for result in results
+    ]
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO dcf_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            if record_run:
+                conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?)",
+                             (_rate_key(discount_rate), _rate_key(terminal_growth_rate), computed_at))
+    finally:
+        conn.close()
+    return len(rows)
+
+def update_market_prices(db_path, rows, discount_rate, terminal_growth_rate):
+    # rows: iterable of (ticker, market_price, margin_of_safety). Re-marks existing results at new
+    # prices and leaves the valuation (and computed_at) alone; returns the number of rows updated.
+    rows = [(_as_float(price), _as_float(mos), ticker, _rate_key(discount_rate), _rate_key(terminal_growth_rate))
+            for ticker, price, mos in rows]
+    conn = connect(db_path)
+    try:
+        with conn:
+            cursor = conn.executemany(
+                "UPDATE dcf_results SET market_price = ?, margin_of_safety = ? "
+                "WHERE ticker = ? AND discount_rate = ? AND terminal_growth_rate = ?", rows)
+            return cursor.rowcount
+    finally:
+        conn.close()
+
+def latest_run_parameters(db_path):
+    # (discount_rate, terminal_growth_rate) of the most recent batch run, or None. Tables written
+    # before runs were recorded fall back to the parameter set with the most rows.
+    conn = connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT discount_rate, terminal_growth_rate FROM runs ORDER BY recorded_at DESC, rowid DESC LIMIT 1"
+        ).fetchone()
+        if row is None:
+            row = conn.execute(
+                "SELECT discount_rate, terminal_growth_rate FROM dcf_results GROUP BY discount_rate, terminal_growth_rate "
+                "ORDER BY COUNT(*) DESC, MAX(computed_at) DESC LIMIT 1"
+            ).fetchone()
+    finally:
+        conn.close()
+    return row
+
+def query_dcf_results(db_path, discount_rate, terminal_growth_rate, min_mos=None, max_mos=None):
+    # Rows for one parameter set as dicts, optionally restricted to a margin-of-safety band (inclusive)
+    return list(iter_dcf_results(db_path, discount_rate, terminal_growth_rate, min_mos, max_mos))
+
+def iter_dcf_results(db_path, discount_rate, terminal_growth_rate, min_mos=None, max_mos=None):
+    # query_dcf_results() one row at a time, for callers that stream over a whole run
+    sql = "SELECT ticker, " + ", ".join(RESULT_COLUMNS) + " FROM dcf_results WHERE discount_rate = ? AND terminal_growth_rate = ?"
+    params = [_rate_key(discount_rate), _rate_key(terminal_growth_rate)]
+    if min_mos is not None:
+        sql += " AND margin_of_safety >= ?"
+        params.append(min_mos)
+    if max_mos is not None:
+        sql += " AND margin_of_safety <= ?"
+        params.append(max_mos)
+    sql += " ORDER BY ticker"
+
+    conn = connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        for row in conn.execute(sql, params):
+            yield dict(row)
+    finally:
+        conn.close()
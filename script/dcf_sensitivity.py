@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import argparse
+import os
+import sys
+
+from dcf_kernel import load_universe_panel, load_universe_panel_from_store, gordon_growth_kernel
+
+def rate_grid(start, stop, step):
+    # Inclusive percentage grid, e.g. rate_grid(8, 14, 0.25) -> 8.0, 8.25, ..., 14.0
+    count = int(round((stop - start) / step)) + 1
+    return np.round(start + step * np.arange(count), 6)
+
+def sensitivity_cube(panel, discount_rates, growth_rates):
+    # Current margin of safety for every (r, g, ticker): shape (len(r), len(g), tickers), rates as fractions
+    r = np.asarray(discount_rates, dtype=np.float64)[:, None, None]
+    g = np.asarray(growth_rates, dtype=np.float64)[None, :, None]
+    _, value_per_share, margin_of_safety = gordon_growth_kernel(
+        panel["last_fcf"], panel["current_shares"], panel["current_price"], r, g)
+    return value_per_share, margin_of_safety
+
+def screen_grid(tickers, r_values, g_values, margin_of_safety, min_mos=0.0, max_mos=100.0):
+    # Long table of the tickers inside the filter_dcf_results.py band at every grid point
+    with np.errstate(invalid='ignore'):
+        passing = (margin_of_safety >= min_mos) & (margin_of_safety <= max_mos)
+    r_idx, g_idx, t_idx = np.nonzero(passing)
+    return pd.DataFrame({
+        'r': r_values[r_idx],
+        'g': g_values[g_idx],
+        'kode': np.asarray(tickers, dtype=object)[t_idx],
+        'margin of safety': margin_of_safety[r_idx, g_idx, t_idx]
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the DCF screen over a grid of discount and growth rates in one pass.")
+    parser.add_argument("--dir", type=str, default="saham", help="The directory containing the ticker folders.")
+    parser.add_argument("--store", type=str, default=None, help="Read inputs from this fundamentals store instead of the per-ticker CSVs.")
+    parser.add_argument("--r-min", type=float, default=8.0, help="Lowest discount rate percentage.")
+    parser.add_argument("--r-max", type=float, default=14.0, help="Highest discount rate percentage.")
+    parser.add_argument("--g-min", type=float, default=0.0, help="Lowest terminal growth rate percentage.")
+    parser.add_argument("--g-max", type=float, default=4.0, help="Highest terminal growth rate percentage.")
+    parser.add_argument("--step", type=float, default=0.25, help="Grid step in percentage points (0.25 = 25bp).")
+    parser.add_argument("--min-mos", type=float, default=0.0, help="Minimum Margin of Safety percentage (inclusive).")
+    parser.add_argument("--max-mos", type=float, default=100.0, help="Maximum Margin of Safety percentage (inclusive).")
+    parser.add_argument("--cube", type=str, default="dcf_sensitivity_cube.npz", help="Output file for the full sensitivity cube.")
+    parser.add_argument("--output", type=str, default="dcf_sensitivity_screen.csv", help="Output CSV of passing tickers per grid point.")
+    args = parser.parse_args()
+
+    if not args.store and not os.path.exists(args.dir):
+        print(f"Error: Directory '{args.dir}' not found.", file=sys.stderr)
+        sys.exit(1)
+
+    r_values = rate_grid(args.r_min, args.r_max, args.step)
+    g_values = rate_grid(args.g_min, args.g_max, args.step)
+
+    if args.store:
+        panel, errors = load_universe_panel_from_store(args.store)
+    else:
+        panel, errors = load_universe_panel(args.dir)
+    for ticker, error in sorted(errors.items()):
+        print(f"{ticker}: Fail ({error})", file=sys.stderr)
+
+    value_per_share, margin_of_safety = sensitivity_cube(panel, r_values / 100.0, g_values / 100.0)
+
+    np.savez_compressed(
+        args.cube,
+        tickers=np.asarray(panel["tickers"]),
+        r=r_values,
+        g=g_values,
+        market_price=panel["current_price"],
+        intrinsic_value_per_share=value_per_share.astype(np.float32),
+        margin_of_safety=margin_of_safety.astype(np.float32)
+    )
+    print(f"Sensitivity cube ({len(r_values)} r x {len(g_values)} g x {len(panel['tickers'])} tickers) saved to {args.cube}")
+
+    df_screen = screen_grid(panel["tickers"], r_values, g_values, margin_of_safety, args.min_mos, args.max_mos)
+    df_screen.to_csv(args.output, index=False)
+    print(f"{len(df_screen)} passing (r, g, ticker) rows saved to {args.output}")
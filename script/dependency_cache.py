@@ -0,0 +1,172 @@
+import os
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+
+from price_index import price_index_path
+
+CACHE_FILENAME = "dependency_cache.db"
+
+# Stage -> the ticker files (by suffix) its result depends on. A stage's result is reused while
+# the content of these files and the stage's parameters are unchanged.
+STAGE_INPUTS = {
+    "dcf": ["cashflow", "balance_sheet", "company_info", "year_end_prices"],
+    "health": ["balance_sheet", "financials", "cashflow"],
+    "roic_igr": ["financials", "balance_sheet", "cashflow"],
+    # filtered_roic_igr.py's per-year history above the minimums
+    "roic_igr_history": ["financials", "balance_sheet", "cashflow"],
+}
+# Bump a stage's version when its code changes what it computes, so older results are not reused
+STAGE_VERSIONS = {"dcf": 2, "health": 1, "roic_igr": 1, "roic_igr_history": 1}
+
+def default_cache_db(base_dir):
+    return os.path.join(base_dir, CACHE_FILENAME)
+
+def _json_value(value):
+    # NumPy scalars as plain numbers and booleans
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    # Worker processes write their chunks concurrently
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS file_digests (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            digest TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stage_results (
+            stage TEXT NOT NULL,
+            ticker TEXT NOT NULL,
+            input_key TEXT NOT NULL,
+            result TEXT NOT NULL,
+            computed_at TEXT NOT NULL,
+            output_key TEXT,
+            PRIMARY KEY (stage, ticker)
+        )
+    """)
+    # Caches created before output files were keyed
+    if "output_key" not in [column[1] for column in conn.execute("PRAGMA table_info(stage_results)")]:
+        conn.execute("ALTER TABLE stage_results ADD COLUMN output_key TEXT")
+    return conn
+
+class DependencyCache:
+    # Per-ticker stage results keyed by the content hashes of the stage's input files plus its
+    # parameters. File hashes are remembered by (size, mtime), so an unchanged file is hashed once;
+    # a file that was rewritten with the same content still hashes to the same key.
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = connect(db_path)
+        self._digests = {}
+        self._pending_digests = []
+        self._pending_results = []
+        self.hits = 0
+        self.misses = 0
+
+    def file_digest(self, path):
+        # Content hash of a file, or None if it does not exist
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if path not in self._digests:
+            row = self.conn.execute("SELECT size, mtime_ns, digest FROM file_digests WHERE path = ?", (path,)).fetchone()
+            self._digests[path] = row
+        known = self._digests[path]
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        with open(path, 'rb') as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        self._digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        self._pending_digests.append((path, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def input_key(self, stage, ticker, base_dir, params=None):
+        # Key of one stage's inputs for one ticker, or None when they cannot be trusted yet
+        digests = []
+        for suffix in STAGE_INPUTS[stage]:
+            if suffix == "year_end_prices" and _price_index_outdated(ticker, base_dir):
+                # load_price_index() rebuilds it on the next read; key on what it will contain
+                return None
+            if suffix == "year_end_prices":
+                # calculate_dcf() requires the daily prices even though it reads the index
+                digests.append(os.path.exists(os.path.join(base_dir, ticker, f"{ticker}_historical_prices.csv")))
+            digests.append(self.file_digest(os.path.join(base_dir, ticker, f"{ticker}_{suffix}.csv")))
+        payload = json.dumps([stage, STAGE_VERSIONS[stage], digests, params or {}], sort_keys=True, default=_json_value)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def output_key(self, paths):
+        # Key of the files a stage wrote, or None when it wrote none or one of them is missing
+        digests = [self.file_digest(path) for path in paths]
+        if not digests or None in digests:
+            return None
+        return hashlib.blake2b(json.dumps(digests).encode(), digest_size=16).hexdigest()
+
+    def get(self, stage, ticker, input_key, output_key=None):
+        # (True, cached result) for these inputs, or (False, None); a cached result may itself be None.
+        # With output_key, the result must also have been computed by the run that wrote those files.
+        if input_key is not None:
+            row = self.conn.execute("SELECT input_key, result, output_key FROM stage_results WHERE stage = ? AND ticker = ?",
+                                    (stage, ticker)).fetchone()
+            if row is not None and row[0] == input_key and (output_key is None or row[2] == output_key):
+                self.hits += 1
+                return True, json.loads(row[1])
+        self.misses += 1
+        return False, None
+
+    def put(self, stage, ticker, input_key, result, output_key=None):
+        # Queued until flush(); results computed from inputs without a key are not cached
+        if input_key is None:
+            return
+        self._pending_results.append((stage, ticker, input_key, json.dumps(result, default=_json_value),
+                                      datetime.now().isoformat(timespec='seconds'), output_key))
+
+    def flush(self):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO file_digests VALUES (?, ?, ?, ?)", self._pending_digests)
+            self.conn.executemany("INSERT OR REPLACE INTO stage_results VALUES (?, ?, ?, ?, ?, ?)", self._pending_results)
+        self._pending_digests = []
+        self._pending_results = []
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+def _price_index_outdated(ticker, base_dir):
+    # Same freshness rule as price_index.load_price_index()
+    index_file = price_index_path(ticker, base_dir)
+    sources = [os.path.join(base_dir, ticker, f"{ticker}_{suffix}.csv") for suffix in ("historical_prices", "cashflow")]
+    try:
+        index_mtime = os.path.getmtime(index_file)
+    except FileNotFoundError:
+        return any(os.path.exists(source) for source in sources[:1])
+    return index_mtime < max((os.path.getmtime(p) for p in sources if os.path.exists(p)), default=0)
+
+def cached_stage(cache, stage, ticker, base_dir, params, compute, outputs=()):
+    # compute() unless the cache holds a result for the same inputs and params and, when the caller
+    # wants outputs (what compute() writes, e.g. the DCF report), those files are exactly the ones
+    # that computation wrote: a report a run at other rates left behind is regenerated, not kept.
+    # Returns (result, reused). Without a cache this is just compute().
+    if cache is None:
+        return compute(), False
+    input_key = cache.input_key(stage, ticker, base_dir, params)
+    output_key = cache.output_key(outputs) if outputs else None
+    # A missing output is a miss, as an unusable input key is
+    found, result = cache.get(stage, ticker, None if outputs and output_key is None else input_key, output_key)
+    if found:
+        return result, True
+    result = compute()
+    # Keyed on the inputs as they were before compute() ran; a price index it rebuilt is picked up next time
+    cache.put(stage, ticker, input_key, result, cache.output_key(outputs) if outputs else None)
+    return result, False
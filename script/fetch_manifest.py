@@ -0,0 +1,75 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+# What get_fundamental_data.py can fetch separately, and the files each dataset produces
+DATASETS = {
+    "info": ["company_info"],
+    "statements": ["balance_sheet", "financials", "cashflow"],
+    "prices": ["historical_prices"],
+}
+
+# info carries currentPrice, so it goes stale as fast as the price history. Counted in calendar
+# days, not elapsed time: a nightly run refetches what the previous night's run saved, even though
+# that was saved less than 24 hours ago
+DEFAULT_TTL = {
+    "info": timedelta(days=1),
+    "prices": timedelta(days=1),
+}
+# Annual statements: a new fiscal period is expected this long after the latest one we have...
+FISCAL_PERIOD = timedelta(days=365)
+# ...plus the usual delay before the annual report is published
+REPORTING_LAG = timedelta(days=90)
+# Once a new period is overdue, ask again at most this often until it shows up
+STATEMENTS_RETRY = timedelta(days=7)
+
+def manifest_path(ticker, base_dir):
+    return os.path.join(base_dir, ticker, f"{ticker}_fetch_manifest.json")
+
+def load_manifest(ticker, base_dir):
+    try:
+        with open(manifest_path(ticker, base_dir), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def record_fetch(ticker, base_dir, dataset, latest_period=None, fetched_at=None):
+    manifest = load_manifest(ticker, base_dir)
+    entry = {"fetched_at": (fetched_at or datetime.now()).isoformat(timespec='seconds')}
+    if latest_period is not None:
+        entry["latest_period"] = str(latest_period)[:10]
+    manifest[dataset] = entry
+
+    # Write-then-rename so a crash never leaves a half-written manifest behind
+    path = manifest_path(ticker, base_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _files_present(ticker, base_dir, dataset):
+    return all(os.path.exists(os.path.join(base_dir, ticker, f"{ticker}_{suffix}.csv")) for suffix in DATASETS[dataset])
+
+def is_stale(ticker, base_dir, dataset, manifest=None, now=None):
+    if manifest is None:
+        manifest = load_manifest(ticker, base_dir)
+    now = now or datetime.now()
+    entry = manifest.get(dataset)
+    if entry is None or not _files_present(ticker, base_dir, dataset):
+        return True
+    fetched_at = datetime.fromisoformat(entry["fetched_at"])
+
+    if dataset in DEFAULT_TTL:
+        return now.date() - fetched_at.date() >= DEFAULT_TTL[dataset]
+
+    # Statements only change when a new fiscal period is published
+    latest_period = entry.get("latest_period")
+    if latest_period is None:
+        return now - fetched_at >= STATEMENTS_RETRY
+    next_period_expected = datetime.fromisoformat(latest_period) + FISCAL_PERIOD + REPORTING_LAG
+    return now >= next_period_expected and now - fetched_at >= STATEMENTS_RETRY
+
+def stale_datasets(ticker, base_dir, now=None):
+    manifest = load_manifest(ticker, base_dir)
+    return [dataset for dataset in DATASETS if is_stale(ticker, base_dir, dataset, manifest, now)]
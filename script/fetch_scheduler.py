@@ -0,0 +1,158 @@
+import asyncio
+import random
+import time
+
+from data_providers import ThrottledError, TransientFetchError
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0):
+    # Exponential backoff with full jitter: uniform in [0, min(max_delay, base_delay * 2^attempt)]
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+class TokenBucket:
+    # Allows `rate` acquisitions per second on average, with bursts of up to `burst`
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst) if burst else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AdaptiveLimit:
+    # Concurrency limit that halves on throttling and grows by one after a full window of
+    # successes (additive increase, multiplicative decrease)
+    def __init__(self, initial, minimum=1, maximum=None, decrease_cooldown=2.0):
+        self.maximum = maximum or initial
+        self.minimum = max(1, minimum)
+        self.limit = max(self.minimum, min(initial, self.maximum))
+        self.in_flight = 0
+        self.decrease_cooldown = decrease_cooldown
+        self._successes = 0
+        self._last_decrease = float('-inf')
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, outcome):
+        # outcome: "ok", "throttled", "error" or "stopped" (the slot was released unused)
+        async with self._condition:
+            self.in_flight -= 1
+            if outcome == "throttled":
+                self._successes = 0
+                # Requests already in flight tend to be throttled together; count them as one signal
+                now = time.monotonic()
+                if now - self._last_decrease >= self.decrease_cooldown:
+                    self.limit = max(self.minimum, self.limit // 2)
+                    self._last_decrease = now
+            elif outcome == "ok":
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+class FetchScheduler:
+    # Runs an async job per ticker under a token-bucket rate limit and an adaptive concurrency limit.
+    # Throttling pauses every worker with jittered exponential backoff; transient failures go to a
+    # retry queue that is worked through after the main pass, up to max_retries more rounds.
+    def __init__(self, max_concurrency=16, min_concurrency=1, rate=None, burst=None,
+                 max_retries=3, base_delay=1.0, max_delay=60.0):
+        self.limit = AdaptiveLimit(max_concurrency, min_concurrency, max_concurrency)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"attempts": 0, "throttled": 0, "transient_errors": 0, "retried": 0}
+        self._paused_until = 0.0
+        self._consecutive_throttles = 0
+
+    def _on_throttle(self, error):
+        self.stats["throttled"] += 1
+        delay = error.retry_after if error.retry_after is not None else \
+            backoff_delay(self._consecutive_throttles, self.base_delay, self.max_delay)
+        self._consecutive_throttles += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    async def _wait_if_paused(self):
+        while True:
+            remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    async def _attempt(self, ticker, job, stop=None):
+        # Returns (result, retryable); None instead of a result when stop was set before the job started
+        await self._wait_if_paused()
+        await self.limit.acquire()
+        outcome = "error"
+        try:
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            if stop is not None and stop.is_set():
+                outcome = "stopped"
+                return None, False
+            self.stats["attempts"] += 1
+            started = time.perf_counter()
+            try:
+                result = await job(ticker)
+                outcome = "ok"
+                self._consecutive_throttles = 0
+                return dict(result, status="Done", error=None, seconds=time.perf_counter() - started), False
+            except ThrottledError as e:
+                outcome = "throttled"
+                self._on_throttle(e)
+                error, retryable = f"Throttled: {e}", True
+            except TransientFetchError as e:
+                self.stats["transient_errors"] += 1
+                error, retryable = f"{type(e).__name__}: {e}", True
+            except Exception as e:
+                error, retryable = f"{type(e).__name__}: {e}", False
+            return {"ticker": ticker, "status": "Fail", "error": error, "seconds": time.perf_counter() - started}, retryable
+        finally:
+            await self.limit.release(outcome)
+
+    async def run(self, tickers, job, on_result=None, stop=None):
+        # job(ticker) is awaited and returns a dict; on_result sees each ticker's final result once.
+        # Once stop (a threading.Event, e.g. set by a consumer that went away) is set, no further job
+        # is started: tickers not fetched by then get a "Stopped" result and are not reported.
+        results = {}
+        pending = list(tickers)
+        for round_number in range(self.max_retries + 1):
+            if not pending or (stop is not None and stop.is_set()):
+                break
+            if round_number:
+                self.stats["retried"] += len(pending)
+                await asyncio.sleep(backoff_delay(round_number, self.base_delay, self.max_delay))
+
+            retry_queue = []
+            last_round = round_number == self.max_retries
+
+            async def run_one(ticker):
+                result, retryable = await self._attempt(ticker, job, stop)
+                if result is None:
+                    return
+                result["attempts"] = round_number + 1
+                results[ticker] = result
+                if retryable and not last_round:
+                    retry_queue.append(ticker)
+                elif on_result is not None:
+                    on_result(result)
+
+            await asyncio.gather(*(run_one(ticker) for ticker in pending))
+            pending = retry_queue
+
+        stopped = {"status": "Stopped", "error": "Stopped before fetching", "seconds": 0.0, "attempts": 0}
+        return [results.get(ticker) or dict(stopped, ticker=ticker) for ticker in tickers]
@@ -3,16 +3,21 @@ import re
 import csv
 import argparse
 
-def filter_dcf_results(root_dir="saham", min_mos=0.0, max_mos=100.0):
+from dcf_results_store import default_results_db, latest_run_parameters, query_dcf_results
+
+FILTERED_FIELDS = ['kode', 'intrinsic value per share', 'market price', 'margin of safety']
+
+def scan_dcf_reports(root_dir="saham", min_mos=0.0, max_mos=100.0):
+    # Fallback for trees without a results table: scrape the numbers back out of the text reports
     results = []
-    
+
     # Walk through all subdirectories to find dcf_analysis.txt files
     for dirpath, dirnames, filenames in os.walk(root_dir):
         for filename in filenames:
             if filename.endswith("_dcf_analysis.txt"):
                 file_path = os.path.join(dirpath, filename)
                 ticker = os.path.basename(dirpath) # Ticker is the name of the parent directory
-                
+
                 current_mos = None
                 current_price = None
                 intrinsic_value_per_share = None
@@ -20,7 +25,7 @@ def filter_dcf_results(root_dir="saham", min_mos=0.0, max_mos=100.0):
                 try:
                     with open(file_path, 'r') as f:
                         content = f.read()
-                        
+
                         # Regex for Current Margin of Safety
                         mos_match = re.search(r'Current Margin of Safety: (-?[\d\.,]+)%', content)
                         if mos_match:
@@ -39,7 +44,7 @@ def filter_dcf_results(root_dir="saham", min_mos=0.0, max_mos=100.0):
                 except Exception as e:
                     print(f"Error reading or parsing {file_path}: {e}")
                     continue
-                
+
                 # Filter based on Current Margin of Safety
                 if current_mos is not None and min_mos <= current_mos <= max_mos:
                     results.append({
@@ -48,18 +53,49 @@ def filter_dcf_results(root_dir="saham", min_mos=0.0, max_mos=100.0):
                         'market price': current_price,
                         'intrinsic value per share': intrinsic_value_per_share
                     })
+    return results
+
+def query_results_table(results_db, min_mos=0.0, max_mos=100.0, discount_rate=None, terminal_growth_rate=None):
+    # The filter is a predicate over the results table; without explicit rates use the latest run's
+    if discount_rate is None or terminal_growth_rate is None:
+        latest = latest_run_parameters(results_db)
+        if latest is None:
+            return []
+        discount_rate, terminal_growth_rate = latest
+    rows = query_dcf_results(results_db, discount_rate, terminal_growth_rate, min_mos, max_mos)
+    return [
+        {
+            'kode': row["ticker"],
+            'margin of safety': row["margin_of_safety"],
+            'market price': row["market_price"],
+            'intrinsic value per share': row["intrinsic_value_per_share"]
+        }
+        for row in rows
+    ]
+
+def write_filtered_results(results, output_csv_path):
+    # Extra keys (e.g. full screen rows) are left out
+    with open(output_csv_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FILTERED_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for row in results:
+            writer.writerow(row)
+
+def filter_dcf_results(root_dir="saham", min_mos=0.0, max_mos=100.0, discount_rate=None, terminal_growth_rate=None, results_db=None):
+    if results_db is None:
+        results_db = default_results_db(root_dir)
+
+    if os.path.exists(results_db):
+        results = query_results_table(results_db, min_mos, max_mos, discount_rate, terminal_growth_rate)
+    else:
+        print(f"Results table {results_db} not found; scanning DCF text reports instead.")
+        results = scan_dcf_reports(root_dir, min_mos, max_mos)
 
     # Define the output CSV file path
     output_csv_path = os.path.join(".", "filtered_dcf_results.csv")
 
     if results:
-        with open(output_csv_path, 'w', newline='') as csvfile:
-            fieldnames = ['kode', 'intrinsic value per share', 'market price', 'margin of safety']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            writer.writeheader()
-            for row in results:
-                writer.writerow(row)
+        write_filtered_results(results, output_csv_path)
         print(f"Filtered DCF results saved to {output_csv_path}")
     else:
         print(f"No stocks found with Current Margin of Safety between {min_mos}% and {max_mos}%.")
@@ -69,5 +105,11 @@ if __name__ == "__main__":
     parser.add_argument("--dir", type=str, default="saham", help="Directory to search for ticker folders.")
     parser.add_argument("--min-mos", type=float, default=0.0, help="Minimum Margin of Safety percentage (inclusive).")
     parser.add_argument("--max-mos", type=float, default=100.0, help="Maximum Margin of Safety percentage (inclusive).")
+    parser.add_argument("--r", type=float, default=None, help="Discount rate percentage of the run to filter (default: the latest run).")
+    parser.add_argument("--g", type=float, default=None, help="Terminal growth rate percentage of the run to filter (default: the latest run).")
+    parser.add_argument("--db", type=str, default=None, help="SQLite results table (default: <dir>/dcf_results.db).")
     args = parser.parse_args()
-    filter_dcf_results(root_dir=args.dir, min_mos=args.min_mos, max_mos=args.max_mos)
\ No newline at end of file
+    discount_rate = args.r / 100.0 if args.r is not None else None
+    terminal_growth_rate = args.g / 100.0 if args.g is not None else None
+    filter_dcf_results(root_dir=args.dir, min_mos=args.min_mos, max_mos=args.max_mos,
+                       discount_rate=discount_rate, terminal_growth_rate=terminal_growth_rate, results_db=args.db)
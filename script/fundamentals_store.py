@@ -0,0 +1,151 @@
+import sqlite3
+import pandas as pd
+import argparse
+import os
+import sys
+
+FUNDAMENTALS_DB_FILENAME = "fundamentals.db"
+
+# Statement name in the store -> file suffix in the saham/<TICKER>/ layout
+STATEMENT_FILES = {
+    "info": "company_info",
+    "balance_sheet": "balance_sheet",
+    "financials": "financials",
+    "cashflow": "cashflow",
+    "prices": "historical_prices",
+}
+
+def default_fundamentals_db(base_dir):
+    return os.path.join(base_dir, FUNDAMENTALS_DB_FILENAME)
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    # One long table: info rows have an empty fiscal_date, price rows use the trading date (UTC)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fundamentals (
+            ticker TEXT NOT NULL,
+            statement TEXT NOT NULL,
+            line_item TEXT NOT NULL,
+            fiscal_date TEXT NOT NULL,
+            value REAL,
+            value_text TEXT,
+            PRIMARY KEY (statement, line_item, ticker, fiscal_date)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fundamentals_ticker ON fundamentals (ticker, statement)")
+    return conn
+
+def _to_float(value):
+    try:
+        number = float(value)
+    except (ValueError, TypeError):
+        return None
+    return None if number != number else number # NaN -> NULL
+
+def frame_rows(ticker, statement, df):
+    # Flattens one saved frame into (ticker, statement, line_item, fiscal_date, value, value_text) rows
+    if df is None or df.empty:
+        return []
+    rows = []
+    if statement == "info":
+        for key, value in df['Value'].items():
+            number = _to_float(value)
+            text = None if number is not None or pd.isna(value) else str(value)
+            rows.append((ticker, statement, str(key), "", number, text))
+    elif statement == "prices":
+        dates = pd.to_datetime(df.index, utc=True).strftime('%Y-%m-%d %H:%M:%S')
+        for column in df.columns:
+            for fiscal_date, value in zip(dates, df[column].tolist()):
+                number = _to_float(value)
+                if number is not None:
+                    rows.append((ticker, statement, str(column), fiscal_date, number, None))
+    else:
+        for line_item, values in df.iterrows():
+            for fiscal_date, value in values.items():
+                number = _to_float(value)
+                if number is not None:
+                    rows.append((ticker, statement, str(line_item), str(fiscal_date)[:10], number, None))
+    return rows
+
+def store_ticker_frames(conn, ticker, frames):
+    # frames: {statement: DataFrame as saved by get_fundamental_data.py}; replaces what the store held
+    with conn:
+        for statement, df in frames.items():
+            conn.execute("DELETE FROM fundamentals WHERE ticker = ? AND statement = ?", (ticker, statement))
+            conn.executemany("INSERT OR REPLACE INTO fundamentals VALUES (?, ?, ?, ?, ?, ?)", frame_rows(ticker, statement, df))
+
+def read_saham_frames(ticker, base_dir, statements=None):
+    ticker_dir = os.path.join(base_dir, ticker)
+    frames = {}
+    for statement in statements or STATEMENT_FILES:
+        file_path = os.path.join(ticker_dir, f"{ticker}_{STATEMENT_FILES[statement]}.csv")
+        if os.path.exists(file_path):
+            frames[statement] = pd.read_csv(file_path, index_col=0)
+    return frames
+
+def import_saham_dir(base_dir, db_path, tickers=None):
+    # Bulk import of the existing saham/<TICKER>/<TICKER>_*.csv layout; returns {ticker: error} for failures
+    if tickers is None:
+        tickers = sorted(d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d)))
+    errors = {}
+    conn = connect(db_path)
+    try:
+        for ticker in tickers:
+            try:
+                store_ticker_frames(conn, ticker, read_saham_frames(ticker, base_dir))
+            except Exception as e:
+                errors[ticker] = str(e)
+    finally:
+        conn.close()
+    return errors
+
+def load_line_items(db_path, statement, line_items, tickers=None):
+    # One read for the requested line items across all (or the given) tickers, in long format
+    sql = f"SELECT ticker, line_item, fiscal_date, value, value_text FROM fundamentals WHERE statement = ? AND line_item IN ({', '.join('?' * len(line_items))})"
+    params = [statement] + list(line_items)
+    if tickers is not None:
+        sql += f" AND ticker IN ({', '.join('?' * len(tickers))})"
+        params += list(tickers)
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+def load_year_end_prices(db_path, tickers=None, line_item="Close"):
+    # Last close of each calendar year per ticker, reduced inside SQLite
+    # (SQLite returns the row holding MAX() for the bare "value" column)
+    sql = "SELECT ticker, CAST(substr(fiscal_date, 1, 4) AS INTEGER) AS year, value, MAX(fiscal_date) AS fiscal_date FROM fundamentals WHERE statement = 'prices' AND line_item = ?"
+    params = [line_item]
+    if tickers is not None:
+        sql += f" AND ticker IN ({', '.join('?' * len(tickers))})"
+        params += list(tickers)
+    sql += " GROUP BY ticker, year"
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+def list_tickers(db_path):
+    conn = connect(db_path)
+    try:
+        return [row[0] for row in conn.execute("SELECT DISTINCT ticker FROM fundamentals ORDER BY ticker")]
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import the per-ticker CSV layout into a single long-format fundamentals store.")
+    parser.add_argument("--dir", type=str, default="saham", help="The directory containing the ticker folders.")
+    parser.add_argument("--db", type=str, default=None, help="SQLite store to write (default: <dir>/fundamentals.db).")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.dir):
+        print(f"Error: Directory '{args.dir}' not found.", file=sys.stderr)
+        sys.exit(1)
+
+    db_path = args.db if args.db else default_fundamentals_db(args.dir)
+    errors = import_saham_dir(args.dir, db_path)
+    for ticker, error in sorted(errors.items()):
+        print(f"{ticker}: Fail ({error})", file=sys.stderr)
+    print(f"Imported {len(list_tickers(db_path))} tickers into {db_path}")
@@ -1,78 +1,125 @@
-import yfinance as yf
 import argparse
 import pandas as pd
-from datetime import datetime
 import os
 
-# Set up argument parser
-parser = argparse.ArgumentParser(description='Fetch fundamental and historical data for a stock ticker.')
-parser.add_argument('ticker_symbol', type=str, help='The ticker symbol of the stock (e.g., SIDO.JK)')
-parser.add_argument('--dir', type=str, default='saham', help='The base directory to save the output files.')
-
-# Parse command-line arguments
-args = parser.parse_args()
-ticker_symbol = args.ticker_symbol.upper()
-base_output_dir = args.dir
-
-# Define the output directory for the ticker
-output_dir = os.path.join(base_output_dir, ticker_symbol)
-
-# Create the output directory if it doesn't exist
-os.makedirs(output_dir, exist_ok=True)
-
-# Create a Ticker object
-stock = yf.Ticker(ticker_symbol)
-
-# --- Get and Save Fundamental Data ---
-
-# Get fundamental data
-company_info = stock.info
-balance_sheet = stock.balance_sheet
-financials = stock.financials
-cashflow = stock.cashflow
-
-# Save Company Info to CSV
-# Convert dictionary to DataFrame for easier saving
-info_df = pd.DataFrame.from_dict(company_info, orient='index', columns=['Value'])
-info_filename = os.path.join(output_dir, f"{ticker_symbol}_company_info.csv")
-info_df.to_csv(info_filename)
-print(f"Company info saved to {info_filename}")
-
-# Save Balance Sheet to CSV
-balance_sheet_filename = os.path.join(output_dir, f"{ticker_symbol}_balance_sheet.csv")
-balance_sheet.to_csv(balance_sheet_filename)
-print(f"Balance sheet saved to {balance_sheet_filename}")
-
-# Save Financials to CSV
-financials_filename = os.path.join(output_dir, f"{ticker_symbol}_financials.csv")
-financials.to_csv(financials_filename)
-print(f"Financials saved to {financials_filename}")
-
-# Save Cash Flow to CSV
-cashflow_filename = os.path.join(output_dir, f"{ticker_symbol}_cashflow.csv")
-cashflow.to_csv(cashflow_filename)
-print(f"Cash flow saved to {cashflow_filename}")
-
-# --- Get and Save Historical Price Data ---
-
-# Define start and end dates for historical data (e.g., last 5 years)
-end_date = datetime.now().strftime("%Y-%m-%d")
-start_date = (datetime.now() - pd.DateOffset(years=5)).strftime("%Y-%m-%d")
-
-# Get historical price data
-historical_data = stock.history(start=start_date, end=end_date)
-
-# Define desired columns, and check if 'Dividends' and 'Stock Splits' exist
-desired_columns = ['Close', 'Volume']
-if 'Dividends' in historical_data.columns:
-    desired_columns.append('Dividends')
-if 'Stock Splits' in historical_data.columns:
-    desired_columns.append('Stock Splits')
-
-# Select only desired columns that exist in the DataFrame
-historical_data_filtered = historical_data[desired_columns]
-
-# Save Historical Price Data to CSV
-historical_filename = os.path.join(output_dir, f"{ticker_symbol}_historical_prices.csv")
-historical_data_filtered.to_csv(historical_filename)
-print(f"Historical price data saved to {historical_filename}")
\ No newline at end of file
+from fundamentals_store import connect, store_ticker_frames
+from fetch_manifest import DATASETS, record_fetch, stale_datasets
+from data_providers import make_provider
+from price_index import save_price_index, price_index_path
+from statement_loader import ALL_FIELDS, project_frame
+
+def latest_fiscal_period(*statements):
+    # Most recent fiscal date among the statement columns, or None
+    dates = []
+    for df in statements:
+        if df is not None and not df.empty:
+            dates.extend(pd.to_datetime(df.columns, errors='coerce').dropna())
+    return max(dates).strftime("%Y-%m-%d") if dates else None
+
+def save_frames(ticker_symbol, base_output_dir, frames, store=None, verbose=True, fields=None):
+    # Writes fetched frames into the per-ticker CSV layout and records each dataset in the fetch manifest.
+    # With fields (a statement_loader projection) only those rows of the info and statements are kept.
+    def report(message):
+        if verbose:
+            print(message)
+
+    if fields is not None:
+        # The price history is kept whole; the price index is built from it
+        wanted = dict(fields)
+        frames = {name: project_frame(df, wanted[name]) if name in wanted else df for name, df in frames.items()}
+
+    # Define the output directory for the ticker
+    output_dir = os.path.join(base_output_dir, ticker_symbol)
+
+    # Create the output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    if "info" in frames:
+        # Save Company Info to CSV
+        info_filename = os.path.join(output_dir, f"{ticker_symbol}_company_info.csv")
+        frames["info"].to_csv(info_filename)
+        report(f"Company info saved to {info_filename}")
+        record_fetch(ticker_symbol, base_output_dir, "info")
+
+    if "cashflow" in frames:
+        # Save Balance Sheet to CSV
+        balance_sheet_filename = os.path.join(output_dir, f"{ticker_symbol}_balance_sheet.csv")
+        frames["balance_sheet"].to_csv(balance_sheet_filename)
+        report(f"Balance sheet saved to {balance_sheet_filename}")
+
+        # Save Financials to CSV
+        financials_filename = os.path.join(output_dir, f"{ticker_symbol}_financials.csv")
+        frames["financials"].to_csv(financials_filename)
+        report(f"Financials saved to {financials_filename}")
+
+        # Save Cash Flow to CSV
+        cashflow_filename = os.path.join(output_dir, f"{ticker_symbol}_cashflow.csv")
+        frames["cashflow"].to_csv(cashflow_filename)
+        report(f"Cash flow saved to {cashflow_filename}")
+
+        record_fetch(ticker_symbol, base_output_dir, "statements",
+                     latest_fiscal_period(frames["balance_sheet"], frames["financials"], frames["cashflow"]))
+
+    if "prices" in frames:
+        # Save Historical Price Data to CSV
+        historical_filename = os.path.join(output_dir, f"{ticker_symbol}_historical_prices.csv")
+        frames["prices"].to_csv(historical_filename)
+        report(f"Historical price data saved to {historical_filename}")
+        latest_date = frames["prices"].index.max() if not frames["prices"].empty else None
+        record_fetch(ticker_symbol, base_output_dir, "prices", latest_date)
+
+    # --- Reduce the Price History to Year-End / Fiscal-Period-End Closes ---
+
+    historical_filename = os.path.join(output_dir, f"{ticker_symbol}_historical_prices.csv")
+    if ("prices" in frames or "cashflow" in frames) and os.path.exists(historical_filename):
+        fiscal_dates = list(frames["cashflow"].columns) if "cashflow" in frames else None
+        save_price_index(ticker_symbol, base_output_dir, frames.get("prices"), fiscal_dates)
+        report(f"Price index saved to {price_index_path(ticker_symbol, base_output_dir)}")
+
+    # --- Optionally Write Everything to the Fundamentals Store ---
+
+    if store:
+        conn = connect(store)
+        try:
+            store_ticker_frames(conn, ticker_symbol, frames)
+        finally:
+            conn.close()
+        report(f"Fundamentals stored in {store}")
+
+def fetch_fundamental_data(ticker_symbol, base_output_dir='saham', datasets=None, store=None, provider=None, fields=None):
+    # Fetches the requested datasets ("info", "statements", "prices"; default all) from a data
+    # provider (yfinance unless given) and saves them (only the fields projection, if given)
+    if provider is None:
+        provider = make_provider("yfinance")
+    frames = provider.fetch(ticker_symbol, datasets)
+    save_frames(ticker_symbol, base_output_dir, frames, store, fields=fields)
+    return frames
+
+if __name__ == "__main__":
+    # Set up argument parser
+    parser = argparse.ArgumentParser(description='Fetch fundamental and historical data for a stock ticker.')
+    parser.add_argument('ticker_symbol', type=str, help='The ticker symbol of the stock (e.g., SIDO.JK)')
+    parser.add_argument('--dir', type=str, default='saham', help='The base directory to save the output files.')
+    parser.add_argument('--store', type=str, default=None, help='Optional: also write the fetched frames into this fundamentals store (SQLite).')
+    parser.add_argument('--datasets', type=str, default=None, help='Comma-separated datasets to fetch: info, statements, prices (default: all).')
+    parser.add_argument('--provider', type=str, default='yfinance', help='Data provider: yfinance, fixture:<dir> or http://host:port of a stand-in server.')
+    parser.add_argument('--if-stale', action='store_true', help='Only fetch datasets the fetch manifest considers stale.')
+    parser.add_argument('--projected', action='store_true', help='Only save the info fields and statement rows the screening stages read.')
+
+    # Parse command-line arguments
+    args = parser.parse_args()
+    ticker_symbol = args.ticker_symbol.upper()
+
+    datasets = args.datasets.split(',') if args.datasets else list(DATASETS)
+    unknown = [d for d in datasets if d not in DATASETS]
+    if unknown:
+        parser.error(f"unknown dataset(s): {', '.join(unknown)}")
+    if args.if_stale:
+        stale = stale_datasets(ticker_symbol, args.dir)
+        datasets = [d for d in datasets if d in stale]
+        if not datasets:
+            print(f"All data for {ticker_symbol} is still current; nothing to fetch.")
+
+    if datasets:
+        fetch_fundamental_data(ticker_symbol, args.dir, datasets, args.store, make_provider(args.provider),
+                               ALL_FIELDS if args.projected else None)
@@ -0,0 +1,154 @@
+import os
+import sys
+import argparse
+
+from process_all_stocks import read_ticker_list, ticker_folder_name
+from calculate_dcf_all import format_status
+from fetch_manifest import stale_datasets
+from data_providers import make_provider
+from fetch_scheduler import FetchScheduler
+from streaming_pipeline import run_streaming_pipeline
+from screen import observe_screen_result, format_screen_status, write_screen_results, SCREEN_FIELDS
+from filter_dcf_results import write_filtered_results
+from dcf_results_store import save_dcf_results, default_results_db
+from dependency_cache import default_cache_db
+from statement_loader import ALL_FIELDS
+from ranking import TopK, RANK_BY, make_score, write_ranking
+from run_metrics import RunMetrics, default_metrics_path
+
+def parse_universe(spec):
+    # "nasdaq-100.csv:raw" -> ("nasdaq-100", "nasdaq-100.csv", True); without ":raw" the list gets the
+    # ".jk" suffix, as process_all_stocks.py does without --raw
+    path, raw = spec, False
+    if spec.lower().endswith(":raw"):
+        path, raw = spec[:-len(":raw")], True
+    name = os.path.splitext(os.path.basename(path))[0].replace(' ', '_')
+    return name, path, raw
+
+def load_universes(specs):
+    # [(name, ticker folders)] in list order; each list's own suffix rule decides its folder names, so
+    # "BBCA" in a .jk list and "BBCA" in a raw list are different tickers
+    universes = []
+    names = set()
+    for spec in specs:
+        name, path, raw = parse_universe(spec)
+        if name in names:
+            name = f"{name}_{len(universes) + 1}"
+        names.add(name)
+        folders = list(dict.fromkeys(ticker_folder_name(ticker, raw) for ticker in read_ticker_list(path)))
+        universes.append((name, folders))
+    return universes
+
+def unique_folders(universes):
+    # Every ticker folder once, in the order the lists first mention it
+    return list(dict.fromkeys(folder for _, folders in universes for folder in folders))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screen several ticker lists in one run: each ticker shared by the lists is fetched and screened once, and the results are written per list.")
+    parser.add_argument("--universe", type=str, action="append", required=True, help="A CSV or XLSX list with a 'Kode' column; append \":raw\" to use its symbols as-is instead of adding \".jk\". Repeat for each list.")
+    parser.add_argument("--dir", type=str, default="saham", help="The base directory for ticker data, shared by every list.")
+    parser.add_argument("--output-dir", type=str, default="universe_results", help="Per-list results go to <output-dir>/<list name>/.")
+    parser.add_argument("--store", type=str, default=None, help="Optional: also write fetched data into this fundamentals store (SQLite).")
+    parser.add_argument("--provider", type=str, default="yfinance", help="Data provider: yfinance, fixture:<dir> or http://host:port of a stand-in server.")
+    parser.add_argument("--max-in-flight", type=int, default=os.cpu_count() * 2, help="Maximum number of tickers being fetched at once.")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum ticker fetches started per second (default: unlimited).")
+    parser.add_argument("--max-retries", type=int, default=3, help="Rounds of retries for throttled or transient fetch failures.")
+    parser.add_argument("--force", action="store_true", help="Fetch every dataset for every ticker, ignoring the fetch manifest.")
+    parser.add_argument("--projected", action="store_true", help="Only save the info fields and statement rows the screening stages read.")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every ticker instead of reusing results whose inputs have not changed.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes for the screen (default: CPU count).")
+    parser.add_argument("--queue-size", type=int, default=64, help="Tickers that may wait between the fetch and compute stages.")
+    parser.add_argument("--top", type=int, default=None, help="Also write each list's best K tickers within the filter's margin of safety band to top_ranked.csv.")
+    parser.add_argument("--rank-by", type=str, choices=RANK_BY, default="mos", help="For --top: margin of safety, or a composite of MoS, lowest ROIC and lowest IGR.")
+    parser.add_argument("--metrics", type=str, default=None, help="Where to write this run's metrics JSON (default: run_metrics/<run id>.json).")
+    parser.add_argument("--progress", action="store_true", help="Show a live progress line with rate and ETA.")
+    args = parser.parse_args()
+
+    try:
+        universes = load_universes(args.universe)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    base_dir = args.dir
+    folders = unique_folders(universes)
+    listed = sum(len(universe_folders) for _, universe_folders in universes)
+    print(f"{listed} tickers listed across {len(universes)} lists, {len(folders)} unique; "
+          f"{listed - len(folders)} duplicate fetches and screens avoided.")
+
+    # Only go to the provider for datasets the fetch manifest considers stale
+    to_fetch = {}
+    current = []
+    for folder in folders:
+        datasets = None if args.force else stale_datasets(folder, base_dir)
+        if datasets == []:
+            current.append(folder)
+        else:
+            to_fetch[folder] = datasets
+    if current:
+        print(f"{len(current)} tickers are still current; fetching {len(to_fetch)}.")
+
+    metrics = RunMetrics(progress=args.progress)
+    metrics.record_cache("fetch_manifest", {
+        "hits": len(current),
+        "misses": len(to_fetch),
+        "hit_rate": len(current) / len(folders) if folders else 0.0,
+    })
+    metrics.extra["universes"] = {name: len(universe_folders) for name, universe_folders in universes}
+    metrics.extra["unique_tickers"] = len(folders)
+    scheduler = FetchScheduler(max_concurrency=args.max_in_flight, rate=args.rate, max_retries=args.max_retries)
+    thresholds = {"discount_rate": 0.10, "terminal_growth_rate": 0.025}
+
+    def collect_fetch_result(result):
+        metrics.observe("fetch", result.get("seconds"), result["error"], bytes_written=result.get("bytes_written", 0))
+        metrics.tick("fetch")
+        if result["status"] != "Done":
+            print(format_status(result), flush=True)
+
+    # Each unique ticker is screened once; its row is then fanned out to every list that holds it
+    members = {}
+    for name, universe_folders in universes:
+        for folder in universe_folders:
+            members.setdefault(folder, []).append(name)
+    rows_by_universe = {name: [] for name, _ in universes}
+    top_by_universe = {name: TopK(args.top, make_score(args.rank_by)) for name, _ in universes} if args.top else {}
+    dcf_results = []
+
+    metrics.start_stage("fetch", len(to_fetch), show_progress=False)
+    metrics.start_stage("screen", len(folders))
+    for row, dcf, timings in run_streaming_pipeline(
+            to_fetch, current, base_dir, make_provider(args.provider), thresholds, scheduler, args.store,
+            max_workers=args.workers, queue_size=args.queue_size, on_fetch_result=collect_fetch_result, metrics=metrics,
+            cache_db=None if args.no_cache else default_cache_db(base_dir), fields=ALL_FIELDS if args.projected else None):
+        observe_screen_result(metrics, row, dcf, timings)
+        status = format_screen_status(row)
+        if not args.progress or status.endswith(")"):
+            print(status, flush=True)
+        dcf_results.append(dcf)
+        for name in members.get(row['kode'], []):
+            rows_by_universe[name].append(row)
+            if name in top_by_universe and row['mos_ok']:
+                top_by_universe[name].push(row)
+    metrics.end_stage("fetch")
+    metrics.end_stage("screen")
+    metrics.extra["fetch_scheduler"] = dict(scheduler.stats, final_concurrency=scheduler.limit.limit)
+
+    # One results table for the shared data tree, as process_all_stocks.py keeps
+    results_db = default_results_db(base_dir)
+    save_dcf_results(results_db, dcf_results, thresholds["discount_rate"], thresholds["terminal_growth_rate"])
+
+    print()
+    for name, universe_folders in universes:
+        output_dir = os.path.join(args.output_dir, name)
+        os.makedirs(output_dir, exist_ok=True)
+        rows = sorted(rows_by_universe[name], key=lambda row: row['kode'])
+        write_screen_results(rows, os.path.join(output_dir, "screen_results.csv"))
+        write_filtered_results([row for row in rows if row['mos_ok']], os.path.join(output_dir, "filtered_dcf_results.csv"))
+        if name in top_by_universe:
+            write_ranking(top_by_universe[name], os.path.join(output_dir, "top_ranked.csv"), SCREEN_FIELDS)
+        passed = sum(1 for row in rows if row['passed'])
+        print(f"{name}: {passed} of {len(rows)} screened tickers passed ({len(universe_folders)} listed). Results saved to {output_dir}")
+
+    print(f"DCF numbers for {len(dcf_results)} unique tickers saved to {results_db}")
+    metrics_path = metrics.write(args.metrics if args.metrics else default_metrics_path(metrics.run_id))
+    print(f"Run metrics saved to {metrics_path}")
@@ -0,0 +1,97 @@
+import pandas as pd
+import argparse
+import os
+import sys
+
+# Kinds of rows in <TICKER>_year_end_prices.csv
+YEAR_END = "year_end"
+FISCAL_PERIOD_END = "fiscal_period_end"
+
+def price_index_path(ticker, base_dir):
+    return os.path.join(base_dir, ticker, f"{ticker}_year_end_prices.csv")
+
+def build_price_index(df_historical_prices, fiscal_dates=()):
+    # Reduces daily bars to the last close of each calendar year and the last close on or before
+    # each fiscal period end. Years are taken in UTC, as calculate_dcf() always has.
+    if df_historical_prices is None or df_historical_prices.empty or 'Close' not in df_historical_prices.columns:
+        return pd.DataFrame(columns=['Kind', 'Date', 'Close'], index=pd.Index([], name='Period'))
+
+    closes = df_historical_prices['Close'].copy()
+    closes.index = pd.to_datetime(closes.index, utc=True)
+    closes = closes.dropna().sort_index()
+
+    rows = []
+    last_by_year = closes.groupby(closes.index.year)
+    for year, group in last_by_year:
+        rows.append((str(year), YEAR_END, group.index[-1].isoformat(), float(group.iloc[-1])))
+
+    for fiscal_date in sorted({pd.Timestamp(d).strftime('%Y-%m-%d') for d in fiscal_dates}):
+        period_end = pd.Timestamp(fiscal_date, tz='UTC') + pd.Timedelta(days=1)
+        position = closes.index.searchsorted(period_end, side='left') - 1
+        if position >= 0:
+            rows.append((fiscal_date, FISCAL_PERIOD_END, closes.index[position].isoformat(), float(closes.iloc[position])))
+
+    df = pd.DataFrame(rows, columns=['Period', 'Kind', 'Date', 'Close']).set_index('Period')
+    return df
+
+def _fiscal_dates_from_statement(file_path):
+    # Fiscal dates are the column headers of a saved statement
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path, 'r') as f:
+        header = f.readline().strip().split(',')[1:]
+    return [h for h in header if h.startswith(('19', '20'))]
+
+def save_price_index(ticker, base_dir, df_historical_prices=None, fiscal_dates=None):
+    ticker_dir = os.path.join(base_dir, ticker)
+    if df_historical_prices is None:
+        df_historical_prices = pd.read_csv(os.path.join(ticker_dir, f"{ticker}_historical_prices.csv"), index_col=0)
+    if fiscal_dates is None:
+        fiscal_dates = _fiscal_dates_from_statement(os.path.join(ticker_dir, f"{ticker}_cashflow.csv"))
+    df_index = build_price_index(df_historical_prices, fiscal_dates)
+    df_index.to_csv(price_index_path(ticker, base_dir))
+    return df_index
+
+def load_price_index(ticker, base_dir):
+    # Reads the index, (re)building it first if it is missing or older than the price history
+    index_file = price_index_path(ticker, base_dir)
+    prices_file = os.path.join(base_dir, ticker, f"{ticker}_historical_prices.csv")
+    cashflow_file = os.path.join(base_dir, ticker, f"{ticker}_cashflow.csv")
+    if os.path.exists(index_file):
+        index_mtime = os.path.getmtime(index_file)
+        sources_mtime = max((os.path.getmtime(p) for p in (prices_file, cashflow_file) if os.path.exists(p)), default=0)
+        if index_mtime >= sources_mtime:
+            return pd.read_csv(index_file, index_col=0, dtype={'Period': str}, float_precision='round_trip')
+    if not os.path.exists(prices_file):
+        raise FileNotFoundError(f"Historical prices data not found for {ticker} at {prices_file}")
+    return save_price_index(ticker, base_dir)
+
+def year_end_closes(df_index):
+    # {calendar year: last close of that year}
+    year_end = df_index[df_index['Kind'] == YEAR_END]
+    return {int(period): float(close) for period, close in year_end['Close'].items()}
+
+def fiscal_period_closes(df_index):
+    # {'YYYY-MM-DD' fiscal period end: last close on or before it}
+    fiscal = df_index[df_index['Kind'] == FISCAL_PERIOD_END]
+    return {str(period): float(close) for period, close in fiscal['Close'].items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the year-end / fiscal-period-end close index for every ticker in a directory.")
+    parser.add_argument("--dir", type=str, default="saham", help="The directory containing the ticker folders.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.dir):
+        print(f"Error: Directory '{args.dir}' not found.", file=sys.stderr)
+        sys.exit(1)
+
+    built = 0
+    for ticker in sorted(os.listdir(args.dir)):
+        if not os.path.isdir(os.path.join(args.dir, ticker)):
+            continue
+        try:
+            save_price_index(ticker, args.dir)
+            built += 1
+        except Exception as e:
+            print(f"{ticker}: Fail ({e})", file=sys.stderr)
+    print(f"Price index built for {built} tickers in {args.dir}")
@@ -3,49 +3,163 @@ import subprocess
 import os
 import sys
 import argparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+
+from calculate_dcf_all import run_dcf_batch, format_status
+from dcf_results_store import save_dcf_results, default_results_db
+from fetch_manifest import stale_datasets
+from async_fetcher import fetch_tickers
+from data_providers import make_provider
+from fetch_scheduler import FetchScheduler
+from run_metrics import RunMetrics, default_metrics_path
+from dependency_cache import default_cache_db
+from statement_loader import ALL_FIELDS
+from ranking import TopK, RANK_BY, make_score, write_ranking
+from streaming_pipeline import run_streaming_pipeline
+from screen import observe_screen_result, format_screen_status, write_screen_results, SCREEN_FIELDS
+from filter_dcf_results import filter_dcf_results, FILTERED_FIELDS
+from run_journal import RunJournal, DONE, FAILED, SKIPPED, new_run_id, latest_run_id, load_journal, select_tickers
+
+# DCF results are written to the results table (and journaled) in batches of this many tickers,
+# so a run that dies loses at most one batch of finished work
+SAVE_BATCH_SIZE = 50
+# Ranked shortlist written by --top
+TOP_RANKED_FILE = "top_ranked.csv"
 
 def run_command(command, description):
+    # Returns (success, error reason); the reason is the last line the command wrote to stderr
     try:
         subprocess.run(command, capture_output=True, text=True, check=True)
-        return True
-    except (subprocess.CalledProcessError, Exception) as e:
-        return False
+        return True, None
+    except subprocess.CalledProcessError as e:
+        stderr_lines = (e.stderr or "").strip().splitlines()
+        reason = stderr_lines[-1] if stderr_lines else f"exit code {e.returncode}"
+        return False, f"{description}: {reason}"
+    except Exception as e:
+        return False, f"{description}: {e}"
 
-def process_ticker(ticker, base_dir, raw_ticker=False):
-    script_dir = "script"
-    get_fundamental_script = os.path.join(script_dir, "get_fundamental_data.py")
-    calculate_dcf_script = os.path.join(script_dir, "calculate_dcf.py")
+class ResultSaver:
+    # Buffers DCF results and writes them to the results table, then to the journal, batch by batch
+    def __init__(self, base_dir, journal, stage, discount_rate, terminal_growth_rate, batch_size=SAVE_BATCH_SIZE):
+        self.results_db = default_results_db(base_dir)
+        self.journal = journal
+        self.stage = stage
+        self.discount_rate = discount_rate
+        self.terminal_growth_rate = terminal_growth_rate
+        self.batch_size = batch_size
+        self.pending = []
+
+    def add(self, dcf_result, status, error=None, journal_result=None):
+        self.pending.append((dcf_result, status, error, journal_result))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        save_dcf_results(self.results_db, [dcf for dcf, _, _, _ in self.pending], self.discount_rate, self.terminal_growth_rate)
+        for dcf, status, error, journal_result in self.pending:
+            self.journal.record(dcf["ticker"], self.stage, status, error, journal_result)
+        self.pending = []
+
+def run_streaming(args, base_dir, to_fetch, current, scheduler, metrics, journal, previous_rows=(), cache_db=None):
+    # Fetch, screen and collect at the same time: each ticker is screened as soon as its data lands.
+    # previous_rows are the screen rows an earlier, resumed invocation of the same run already finished.
+    thresholds = {"discount_rate": 0.10, "terminal_growth_rate": 0.025}
+    saver = ResultSaver(base_dir, journal, "screen", thresholds["discount_rate"], thresholds["terminal_growth_rate"])
+
+    def collect_fetch_result(result):
+        metrics.observe("fetch", result.get("seconds"), result["error"], bytes_written=result.get("bytes_written", 0))
+        metrics.tick("fetch")
+        if result["status"] != "Done":
+            journal.record(result["ticker"], "fetch", FAILED, result["error"])
+            print(format_status(result), flush=True)
+        else:
+            journal.record(result["ticker"], "fetch", DONE)
+
+    metrics.start_stage("fetch", len(to_fetch), show_progress=False)
+    metrics.start_stage("screen", len(to_fetch) + len(current))
+    rows = list(previous_rows)
+    # Ranks what filtered_dcf_results.csv will hold (margin of safety within 0-100%) as rows arrive
+    top = TopK(args.top, make_score(args.rank_by)) if args.top else None
+    if top is not None:
+        top.extend(row for row in rows if row.get('mos_ok'))
+    for row, dcf, timings in run_streaming_pipeline(
+            to_fetch, current, base_dir, make_provider(args.provider), thresholds, scheduler, args.store,
+            queue_size=args.queue_size, on_fetch_result=collect_fetch_result, metrics=metrics, cache_db=cache_db,
+            fields=ALL_FIELDS if args.projected else None):
+        observe_screen_result(metrics, row, dcf, timings)
+        status = format_screen_status(row)
+        if not args.progress or status.endswith(")"):
+            print(status, flush=True)
+        rows.append(row)
+        if top is not None and row['mos_ok']:
+            top.push(row)
+        failed = row['error'] is not None and row['margin of safety'] is None
+        saver.add(dcf, FAILED if failed else DONE, row['error'] if failed else None, row)
+    saver.flush()
+    metrics.end_stage("fetch")
+    metrics.end_stage("screen")
+    if top is not None:
+        write_ranking(top, TOP_RANKED_FILE, SCREEN_FIELDS)
+        print(f"Top {len(top.heap)} by {args.rank_by} saved to {TOP_RANKED_FILE}")
+    metrics.extra["fetch_scheduler"] = dict(scheduler.stats, final_concurrency=scheduler.limit.limit)
+
+    rows.sort(key=lambda row: row['kode'])
+    write_screen_results(rows, "screen_results.csv")
+    # The same filtered list the staged run leaves behind, straight from the results table
+    filter_dcf_results(base_dir)
+    passed = sum(1 for row in rows if row['passed'])
+    print(f"\n{passed} of {len(rows)} tickers passed the screen. Results saved to screen_results.csv")
 
+def read_ticker_list(input_file_path):
+    # The 'Kode' column of a CSV or XLSX ticker list; ValueError when the file cannot be used
+    file_extension = os.path.splitext(input_file_path)[1].lower()
+    if file_extension not in ['.csv', '.xlsx', '.xls']:
+        raise ValueError(f"Unsupported file format '{file_extension}'. Please use a CSV or XLSX file.")
+    try:
+        if file_extension == '.csv':
+            df = pd.read_csv(input_file_path)
+        else:
+            df = pd.read_excel(input_file_path)
+    except Exception as e:
+        raise ValueError(f"Could not read '{input_file_path}': {e}")
+    if 'Kode' not in df.columns:
+        raise ValueError(f"'Kode' column not found in '{input_file_path}'.")
+    return df['Kode'].dropna().astype(str).tolist()
+
+def ticker_folder_name(ticker, raw_ticker=False):
+    # get_fundamental_data.py upper-cases the symbol to name the ticker folder
     if raw_ticker:
-        ticker_to_use = ticker
-    else:
-        ticker_to_use = f"{ticker}.jk"
-    
-    # Step 1: Get Fundamental Data
-    success_fundamental = run_command(
-        ["python", get_fundamental_script, ticker_to_use, "--dir", base_dir],
-        f"get_fundamental_data for {ticker}"
-    )
-    
-    if not success_fundamental:
-        return ticker, False
-
-    # Step 2: Calculate DCF
-    success_dcf = run_command(
-        ["python", calculate_dcf_script, ticker_to_use, "--dir", base_dir],
-        f"calculate_dcf for {ticker}"
-    )
-    
-    return ticker, success_dcf
+        return ticker.upper()
+    return f"{ticker}.jk".upper()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process all stocks from a list, including data fetching and DCF calculation.")
     parser.add_argument("--dir", type=str, default="saham", help="The base directory for ticker data.")
     parser.add_argument("--file", type=str, default="Daftar saham.xlsx", help="The input file (CSV or XLSX) containing the list of stock tickers.")
     parser.add_argument("--raw", action="store_true", help="If set, ticker symbols will be used as-is without appending \".jk\".")
+    parser.add_argument("--store", type=str, default=None, help="Optional: also write fetched data into this fundamentals store (SQLite).")
+    parser.add_argument("--provider", type=str, default="yfinance", help="Data provider: yfinance, fixture:<dir> or http://host:port of a stand-in server.")
+    parser.add_argument("--max-in-flight", type=int, default=os.cpu_count() * 2, help="Maximum number of tickers being fetched at once.")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum ticker fetches started per second (default: unlimited).")
+    parser.add_argument("--max-retries", type=int, default=3, help="Rounds of retries for throttled or transient fetch failures.")
+    parser.add_argument("--force", action="store_true", help="Fetch every dataset for every ticker, ignoring the fetch manifest.")
+    parser.add_argument("--stream", action="store_true", help="Fetch and screen at the same time, each ticker as soon as its data lands (writes screen_results.csv).")
+    parser.add_argument("--queue-size", type=int, default=64, help="For --stream: tickers that may wait between the fetch and compute stages.")
+    parser.add_argument("--run-id", type=str, default=None, help="Name of the run journal to write or resume (default: a new timestamp, or the latest run with --resume / --retry-failed).")
+    parser.add_argument("--resume", action="store_true", help="Continue a run: skip tickers the run journal already has an outcome for.")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run the tickers that failed in the journaled run.")
+    parser.add_argument("--metrics", type=str, default=None, help="Where to write this run's metrics JSON (default: run_metrics/<run id>.json).")
+    parser.add_argument("--progress", action="store_true", help="Show a live progress line with rate and ETA for each stage.")
+    parser.add_argument("--projected", action="store_true", help="Only save the info fields and statement rows the screening stages read.")
+    parser.add_argument("--top", type=int, default=None, help=f"Also rank the tickers within the filter's margin of safety band as they finish and write the best K to {TOP_RANKED_FILE}.")
+    parser.add_argument("--rank-by", type=str, choices=RANK_BY, default="mos", help="For --top: margin of safety, or (with --stream) a composite of MoS, lowest ROIC and lowest IGR.")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every ticker instead of reusing results whose inputs have not changed.")
     parser.add_argument("num_to_process", type=int, nargs='?', default=None, help="Optional: Number of tickers to process.")
     args = parser.parse_args()
+    if args.rank_by == "composite" and not args.stream:
+        parser.error("--rank-by composite needs ROIC/IGR, which only the --stream run computes")
 
     base_dir = args.dir
     input_file_path = args.file
@@ -56,21 +170,9 @@ if __name__ == "__main__":
         sys.exit(1)
 
     try:
-        file_extension = os.path.splitext(input_file_path)[1].lower()
-        if file_extension == '.csv':
-            df = pd.read_csv(input_file_path)
-        elif file_extension in ['.xlsx', '.xls']:
-            df = pd.read_excel(input_file_path)
-        else:
-            print(f"Error: Unsupported file format '{file_extension}'. Please use a CSV or XLSX file.", file=sys.stderr)
-            sys.exit(1)
-
-        if 'Kode' not in df.columns:
-            print(f"Error: 'Kode' column not found in '{input_file_path}'.", file=sys.stderr)
-            sys.exit(1)
-        all_tickers = df['Kode'].dropna().astype(str).tolist()
-    except Exception as e:
-        print(f"Error reading or processing file '{input_file_path}': {e}", file=sys.stderr)
+        all_tickers = read_ticker_list(input_file_path)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
     if not all_tickers:
@@ -83,28 +185,136 @@ if __name__ == "__main__":
     else:
         tickers = all_tickers
 
-    print(f"Processing {len(tickers)} tickers from '{input_file_path}' into directory '{base_dir}'...")
-    with ThreadPoolExecutor(max_workers=os.cpu_count() * 2) as executor:
-        future_to_ticker = {executor.submit(process_ticker, ticker, base_dir, raw_ticker_flag): ticker for ticker in tickers}
-        for future in as_completed(future_to_ticker):
-            ticker = future_to_ticker[future]
-            try:
-                ticker_result, success = future.result()
-                status = "Done" if success else "Fail"
-                print(f"{ticker_result}: {status}", flush=True)
-            except Exception as exc:
-                print(f"{ticker}: Fail (Exception: {exc})", flush=True)
+    folders = [ticker_folder_name(ticker, raw_ticker_flag) for ticker in tickers]
+
+    # The run journal records every ticker's stage outcomes so an interrupted run can pick up where it stopped
+    resuming = args.resume or args.retry_failed
+    final_stage = "screen" if args.stream else "dcf"
+    run_id = args.run_id or (latest_run_id() if resuming else new_run_id())
+    if run_id is None:
+        print("Error: no run journal to resume.", file=sys.stderr)
+        sys.exit(1)
+    journal_state = load_journal(run_id) if resuming else {}
+    if resuming:
+        selected = select_tickers(folders, journal_state, final_stage, args.resume, args.retry_failed)
+        print(f"Resuming run {run_id}: {len(selected)} of {len(folders)} tickers still to do.")
+        folders = selected
+
+    print(f"Processing {len(folders)} tickers from '{input_file_path}' into directory '{base_dir}'...")
+    # Named after the journal's run id, so a run's metrics files sit next to its journal
+    metrics = RunMetrics(run_id=run_id, progress=args.progress)
+    metrics.extra["resumed"] = resuming
+    journal = RunJournal(run_id)
+    journal.start(file=input_file_path, dir=base_dir, stream=args.stream, resume=args.resume,
+                  retry_failed=args.retry_failed, tickers=len(folders))
+
+    # Only go to the provider for datasets the fetch manifest considers stale; a ticker this run
+    # already fetched goes straight to the DCF when resuming
+    to_fetch = {}
+    fetched = []
+    for folder in folders:
+        if args.force:
+            datasets = None
+        elif journal_state.get(folder, {}).get("fetch", {}).get("status") == DONE:
+            datasets = []
+        else:
+            datasets = stale_datasets(folder, base_dir)
+        if datasets == []:
+            fetched.append(folder)
+            journal.record(folder, "fetch", SKIPPED)
+        else:
+            to_fetch[folder] = datasets
+    if fetched:
+        print(f"{len(fetched)} tickers are still current; fetching {len(to_fetch)}.")
+    metrics.record_cache("fetch_manifest", {
+        "hits": len(fetched),
+        "misses": len(to_fetch),
+        "hit_rate": len(fetched) / len(folders) if folders else 0.0,
+    })
+
+    # Tickers whose inputs did not change since the last run reuse its results
+    cache_db = None if args.no_cache else default_cache_db(base_dir)
+
+    # Throttled or transient failures are retried at the end of the fetch instead of being dropped
+    scheduler = FetchScheduler(max_concurrency=args.max_in_flight, rate=args.rate, max_retries=args.max_retries)
+
+    if args.stream:
+        # Rows of tickers an earlier invocation of this run already screened
+        previous_rows = [stages["screen"]["result"] for ticker, stages in journal_state.items()
+                         if ticker not in folders and stages.get("screen", {}).get("result")]
+        run_streaming(args, base_dir, to_fetch, fetched, scheduler, metrics, journal, previous_rows, cache_db)
+        journal.close()
+        metrics_path = metrics.write(args.metrics if args.metrics else default_metrics_path(metrics.run_id, resuming))
+        print(f"Run metrics saved to {metrics_path}")
+        sys.exit(0)
+
+    # Step 1: Get Fundamental Data for many tickers at once from the data provider
+    def collect_fetch_result(result):
+        metrics.observe("fetch", result.get("seconds"), result["error"], bytes_written=result.get("bytes_written", 0))
+        metrics.tick("fetch")
+        if result["status"] == "Done":
+            fetched.append(result["ticker"])
+            journal.record(result["ticker"], "fetch", DONE)
+        else:
+            journal.record(result["ticker"], "fetch", FAILED, result["error"])
+            print(format_status(result), flush=True)
+
+    metrics.start_stage("fetch", len(to_fetch))
+    fetch_tickers(list(to_fetch), base_dir, make_provider(args.provider), datasets_by_ticker=to_fetch,
+                  store=args.store, on_result=collect_fetch_result, scheduler=scheduler,
+                  fields=ALL_FIELDS if args.projected else None)
+    metrics.end_stage("fetch")
+    metrics.extra["fetch_scheduler"] = dict(scheduler.stats, final_concurrency=scheduler.limit.limit)
+    if scheduler.stats["throttled"] or scheduler.stats["retried"]:
+        print(f"Provider throttled {scheduler.stats['throttled']} times; {scheduler.stats['retried']} fetches retried.", flush=True)
+
+    # Step 2: Calculate DCF for every fetched ticker in one batch of worker processes
+    saver = ResultSaver(base_dir, journal, "dcf", 0.10, 0.025)
+    metrics.start_stage("dcf", len(fetched))
+    reused = 0
+    top = TopK(args.top) if args.top else None
+    for result in run_dcf_batch(fetched, base_dir, 0.10, 0.025, cache_db=cache_db):
+        reused += result.get("reused", False)
+        if top is not None and result.get("margin_of_safety") is not None and 0.0 <= result["margin_of_safety"] <= 100.0:
+            top.push({'kode': result["ticker"], 'intrinsic value per share': result["intrinsic_value_per_share"],
+                      'market price': result["market_price"], 'margin of safety': result["margin_of_safety"]})
+        metrics.observe("dcf", result.get("seconds"), result["error"], result.get("bytes_read", 0), result.get("bytes_written", 0))
+        metrics.tick("dcf")
+        if not args.progress or result["status"] != "Done":
+            print(format_status(result), flush=True)
+        saver.add(result, DONE if result["status"] == "Done" else FAILED, result["error"])
+    started = time.perf_counter()
+    saver.flush()
+    metrics.observe("save_results", time.perf_counter() - started)
+    metrics.end_stage("dcf")
+    if top is not None:
+        write_ranking(top, TOP_RANKED_FILE, FILTERED_FIELDS)
+        print(f"Top {len(top.heap)} by margin of safety saved to {TOP_RANKED_FILE}")
+    metrics.record_cache("dependency_cache", {
+        "hits": reused,
+        "misses": len(fetched) - reused,
+        "hit_rate": reused / len(fetched) if fetched else 0.0,
+    })
+    journal.close()
 
     # Step 3: Filter DCF results after all tickers are processed
     print("\nAll tickers processed. Filtering DCF results...")
     script_dir = "script"
     filter_dcf_script = os.path.join(script_dir, "filter_dcf_results.py")
-    success_filter = run_command(
+    metrics.start_stage("filter", 1)
+    started = time.perf_counter()
+    success_filter, error = run_command(
         ["python", filter_dcf_script, "--dir", base_dir],
         "filter_dcf_results"
     )
+    metrics.observe("filter", time.perf_counter() - started, error)
+    metrics.tick("filter")
+    metrics.end_stage("filter")
 
     if success_filter:
         print("DCF results filtered successfully.")
     else:
-        print("Failed to filter DCF results.", file=sys.stderr)
+        print(f"Failed to filter DCF results ({error}).", file=sys.stderr)
+
+    metrics_path = metrics.write(args.metrics if args.metrics else default_metrics_path(metrics.run_id, resuming))
+    print(f"Run metrics saved to {metrics_path}")
@@ -0,0 +1,166 @@
+import os
+import sys
+import csv
+import math
+import heapq
+import argparse
+
+from dcf_results_store import default_results_db, latest_run_parameters, iter_dcf_results
+
+RANK_BY = ["mos", "composite"]
+# Composite score weights for (margin of safety, lowest ROIC, lowest IGR), all in percent
+DEFAULT_WEIGHTS = (0.5, 0.25, 0.25)
+
+def _number(value):
+    # Float from a row value (CSV rows hold strings); None when missing or not a number
+    if value is None or value == '':
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+def mos_score(row):
+    return _number(row.get('margin of safety'))
+
+def composite_score(weights=DEFAULT_WEIGHTS):
+    # Weighted sum of margin of safety, lowest ROIC and lowest IGR; rows missing any of them are not ranked
+    def score(row):
+        values = [_number(row.get(field)) for field in ('margin of safety', 'roic_min', 'igr_min')]
+        if None in values:
+            return None
+        return sum(weight * value for weight, value in zip(weights, values))
+    return score
+
+def make_score(rank_by="mos", weights=DEFAULT_WEIGHTS):
+    if rank_by == "mos":
+        return mos_score
+    if rank_by == "composite":
+        return composite_score(weights)
+    raise ValueError(f"Unknown ranking '{rank_by}' (known: {', '.join(RANK_BY)})")
+
+class _Entry:
+    # Heap entry ordered worst-first: a lower score is worse, and on equal scores the later ticker
+    # name is worse, so ties are broken by ticker and not by the order results happen to arrive in
+    __slots__ = ("score", "ticker", "row")
+
+    def __init__(self, score, ticker, row):
+        self.score = score
+        self.ticker = ticker
+        self.row = row
+
+    def __lt__(self, other):
+        if self.score != other.score:
+            return self.score < other.score
+        return self.ticker > other.ticker
+
+class TopK:
+    # The k best rows seen so far, kept in a k-sized min-heap while results stream in: memory is O(k)
+    # whatever the size of the universe, and the ranking is ready as soon as the last row is pushed
+    def __init__(self, k, score=mos_score):
+        self.k = k
+        self.score = score
+        self.heap = []
+        self.seen = 0
+        self.ranked = 0
+
+    def push(self, row):
+        # Rows without a score (e.g. no margin of safety) are counted but not ranked
+        self.seen += 1
+        score = self.score(row)
+        if score is None or self.k <= 0:
+            return
+        self.ranked += 1
+        entry = _Entry(score, str(row.get('kode')), row)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif self.heap[0] < entry:
+            heapq.heapreplace(self.heap, entry)
+
+    def extend(self, rows):
+        for row in rows:
+            self.push(row)
+        return self
+
+    def result(self):
+        # [(rank, score, row)] best first
+        best_first = sorted(self.heap, reverse=True)
+        return [(rank, entry.score, entry.row) for rank, entry in enumerate(best_first, start=1)]
+
+def write_ranking(top, output_path, fieldnames):
+    # One row per ranked ticker: its rank, the original fields and the score it was ranked by
+    with open(output_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['rank'] + list(fieldnames) + ['score'], extrasaction='ignore')
+        writer.writeheader()
+        for rank, score, row in top.result():
+            writer.writerow(dict(row, rank=rank, score=score))
+
+def iter_csv_rows(input_path, passed_only=False):
+    # Streams a screen_results.csv (or filtered_dcf_results.csv) row by row
+    with open(input_path, newline='') as csvfile:
+        for row in csv.DictReader(csvfile):
+            if passed_only and row.get('passed') != 'True':
+                continue
+            yield row
+
+def iter_table_rows(results_db, min_mos=None, max_mos=None, discount_rate=None, terminal_growth_rate=None):
+    # Streams one run of the results table (default: the latest) as filter_dcf_results.py rows
+    if discount_rate is None or terminal_growth_rate is None:
+        latest = latest_run_parameters(results_db)
+        if latest is None:
+            return
+        discount_rate, terminal_growth_rate = latest
+    for row in iter_dcf_results(results_db, discount_rate, terminal_growth_rate, min_mos, max_mos):
+        yield {
+            'kode': row["ticker"],
+            'intrinsic value per share': row["intrinsic_value_per_share"],
+            'market price': row["market_price"],
+            'margin of safety': row["margin_of_safety"],
+        }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank screen or DCF results and keep the top K, streaming through the results once.")
+    parser.add_argument("--input", type=str, default=None, help="Rank the rows of this CSV (e.g. screen_results.csv) instead of the results table.")
+    parser.add_argument("--dir", type=str, default="saham", help="The directory containing the ticker folders (for the default results table).")
+    parser.add_argument("--db", type=str, default=None, help="SQLite results table (default: <dir>/dcf_results.db).")
+    parser.add_argument("--r", type=float, default=None, help="Discount rate percentage of the run to rank (default: the latest run).")
+    parser.add_argument("--g", type=float, default=None, help="Terminal growth rate percentage of the run to rank (default: the latest run).")
+    parser.add_argument("--min-mos", type=float, default=0.0, help="Minimum Margin of Safety percentage (inclusive), for the results table.")
+    parser.add_argument("--max-mos", type=float, default=100.0, help="Maximum Margin of Safety percentage (inclusive), for the results table.")
+    parser.add_argument("--passed-only", action="store_true", help="For --input: only rank rows that passed the screen.")
+    parser.add_argument("--top", type=int, default=50, help="Number of tickers to keep.")
+    parser.add_argument("--rank-by", type=str, choices=RANK_BY, default="mos", help="Margin of safety, or a weighted composite of MoS, lowest ROIC and lowest IGR (needs screen rows).")
+    parser.add_argument("--weights", type=str, default=",".join(str(w) for w in DEFAULT_WEIGHTS), help="Composite weights for MoS, ROIC and IGR.")
+    parser.add_argument("--output", type=str, default="top_ranked.csv", help="Output CSV, best first.")
+    args = parser.parse_args()
+
+    try:
+        weights = tuple(float(w) for w in args.weights.split(','))
+    except ValueError:
+        weights = ()
+    if len(weights) != 3:
+        parser.error("--weights takes three comma-separated numbers")
+
+    if args.input:
+        if not os.path.exists(args.input):
+            print(f"Error: Input file '{args.input}' not found.", file=sys.stderr)
+            sys.exit(1)
+        with open(args.input, newline='') as csvfile:
+            fieldnames = next(csv.reader(csvfile), [])
+        rows = iter_csv_rows(args.input, args.passed_only)
+    else:
+        results_db = args.db or default_results_db(args.dir)
+        if not os.path.exists(results_db):
+            print(f"Error: Results table '{results_db}' not found; run the DCF step first.", file=sys.stderr)
+            sys.exit(1)
+        if args.rank_by == "composite":
+            parser.error("--rank-by composite needs screen rows (--input screen_results.csv)")
+        fieldnames = ['kode', 'intrinsic value per share', 'market price', 'margin of safety']
+        rows = iter_table_rows(results_db, args.min_mos, args.max_mos,
+                               args.r / 100.0 if args.r is not None else None,
+                               args.g / 100.0 if args.g is not None else None)
+
+    top = TopK(args.top, make_score(args.rank_by, weights)).extend(rows)
+    write_ranking(top, args.output, fieldnames)
+    print(f"Top {len(top.heap)} of {top.ranked} ranked tickers ({top.seen} rows read) by {args.rank_by} saved to {args.output}")
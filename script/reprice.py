@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from data_providers import make_provider
+from dcf_results_store import default_results_db, latest_run_parameters, query_dcf_results, update_market_prices
+from filter_dcf_results import filter_dcf_results
+
+def remark_margin_of_safety(value_per_share, market_price):
+    # Current margin of safety as calculate_dcf() reports it, for whole arrays; NaN without a price
+    value_per_share = np.asarray(value_per_share, dtype=np.float64)
+    market_price = np.asarray(market_price, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (value_per_share - market_price) / np.where(market_price > 0, market_price, np.nan) * 100
+
+def fetch_latest_prices(provider, tickers, batch_size=500):
+    # Latest prices in provider batches (one request per batch for providers that support it)
+    prices = {}
+    for start in range(0, len(tickers), batch_size):
+        prices.update(provider.get_latest_prices(tickers[start:start + batch_size]))
+    return prices
+
+def reprice(results_db, provider, discount_rate=None, terminal_growth_rate=None, batch_size=500):
+    # Re-marks every valued ticker of one run (default: the latest) at fresh market prices, keeping
+    # the cached intrinsic value per share. Returns (rows re-marked, tickers without a new price,
+    # discount_rate, terminal_growth_rate).
+    if discount_rate is None or terminal_growth_rate is None:
+        latest = latest_run_parameters(results_db)
+        if latest is None:
+            return 0, [], None, None
+        discount_rate, terminal_growth_rate = latest
+
+    rows = [row for row in query_dcf_results(results_db, discount_rate, terminal_growth_rate)
+            if row["intrinsic_value_per_share"] is not None]
+    tickers = [row["ticker"] for row in rows]
+    prices = fetch_latest_prices(provider, tickers, batch_size)
+
+    priced = [row for row in rows if row["ticker"] in prices]
+    missing = [row["ticker"] for row in rows if row["ticker"] not in prices]
+    market_price = np.array([prices[row["ticker"]] for row in priced], dtype=np.float64)
+    margin_of_safety = remark_margin_of_safety([row["intrinsic_value_per_share"] for row in priced], market_price)
+
+    updates = [(row["ticker"], price, None if np.isnan(mos) else mos)
+               for row, price, mos in zip(priced, market_price.tolist(), margin_of_safety.tolist())]
+    update_market_prices(results_db, updates, discount_rate, terminal_growth_rate)
+    return len(updates), missing, discount_rate, terminal_growth_rate
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh market prices only and re-mark the margin of safety against the cached DCF values.")
+    parser.add_argument("--dir", type=str, default="saham", help="The directory containing the ticker folders.")
+    parser.add_argument("--db", type=str, default=None, help="SQLite results table (default: <dir>/dcf_results.db).")
+    parser.add_argument("--provider", type=str, default="yfinance", help="Price source: yfinance, fixture:<dir> or an http:// stand-in server.")
+    parser.add_argument("--r", type=float, default=None, help="Discount rate percentage of the run to re-mark (default: the latest run).")
+    parser.add_argument("--g", type=float, default=None, help="Terminal growth rate percentage of the run to re-mark (default: the latest run).")
+    parser.add_argument("--min-mos", type=float, default=0.0, help="Minimum Margin of Safety percentage (inclusive).")
+    parser.add_argument("--max-mos", type=float, default=100.0, help="Maximum Margin of Safety percentage (inclusive).")
+    parser.add_argument("--batch-size", type=int, default=500, help="Tickers per price request.")
+    args = parser.parse_args()
+
+    results_db = args.db or default_results_db(args.dir)
+    if not os.path.exists(results_db):
+        print(f"Error: Results table '{results_db}' not found; run the DCF step first.", file=sys.stderr)
+        sys.exit(1)
+    try:
+        provider = make_provider(args.provider)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    discount_rate = args.r / 100.0 if args.r is not None else None
+    terminal_growth_rate = args.g / 100.0 if args.g is not None else None
+    count, missing, discount_rate, terminal_growth_rate = reprice(results_db, provider, discount_rate, terminal_growth_rate, args.batch_size)
+    if discount_rate is None:
+        print(f"No DCF results in {results_db}.")
+        sys.exit(0)
+    for ticker in missing:
+        print(f"{ticker}: Fail (no latest price)")
+    print(f"Re-marked {count} tickers at r={discount_rate * 100:.2f}%, g={terminal_growth_rate * 100:.2f}% in {time.perf_counter() - started:.2f}s")
+
+    filter_dcf_results(args.dir, args.min_mos, args.max_mos, discount_rate, terminal_growth_rate, results_db)
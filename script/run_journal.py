@@ -0,0 +1,110 @@
+import os
+import json
+import threading
+from datetime import datetime
+
+JOURNAL_DIR = "run_journal"
+
+# Per-ticker outcomes; a later entry for the same ticker and stage replaces an earlier one
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+def new_run_id():
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+def journal_path(run_id, journal_dir=JOURNAL_DIR):
+    return os.path.join(journal_dir, f"{run_id}.jsonl")
+
+def latest_run_id(journal_dir=JOURNAL_DIR):
+    # Most recently written journal, or None
+    if not os.path.isdir(journal_dir):
+        return None
+    journals = [f for f in os.listdir(journal_dir) if f.endswith(".jsonl")]
+    if not journals:
+        return None
+    latest = max(journals, key=lambda f: os.path.getmtime(os.path.join(journal_dir, f)))
+    return latest[:-len(".jsonl")]
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+def _json_value(value):
+    # NumPy scalars as plain numbers and booleans, anything else as text
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+class RunJournal:
+    # Append-only JSON-lines record of what each ticker got through in one run. Every entry is
+    # flushed as it is written, so a run that dies leaves everything up to its last ticker behind.
+    def __init__(self, run_id, journal_dir=JOURNAL_DIR):
+        self.run_id = run_id
+        self.path = journal_path(run_id, journal_dir)
+        os.makedirs(journal_dir, exist_ok=True)
+        self._file = open(self.path, 'a')
+        if self._file.tell() and not _ends_with_newline(self.path):
+            # Finish the line a crashed writer left torn, so the next entry starts on its own line
+            self._file.write("\n")
+        self._lock = threading.Lock()
+
+    def _append(self, entry):
+        line = json.dumps(entry, default=_json_value)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def start(self, **details):
+        # One "run" entry per start or resume, with whatever describes the invocation
+        self._append({"time": datetime.now().isoformat(timespec='seconds'), "run": self.run_id, **details})
+
+    def record(self, ticker, stage, status, error=None, result=None):
+        # result: optional JSON-friendly output of the stage, for stages whose output lives nowhere else
+        entry = {"time": datetime.now().isoformat(timespec='seconds'), "ticker": ticker,
+                 "stage": stage, "status": status, "error": error}
+        if result is not None:
+            entry["result"] = result
+        self._append(entry)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def load_journal(run_id, journal_dir=JOURNAL_DIR):
+    # {ticker: {stage: {"status", "error", "result"}}} as of the last entry for each; a torn last line
+    # (the run died mid-write) is ignored
+    state = {}
+    path = journal_path(run_id, journal_dir)
+    if not os.path.exists(path):
+        return state
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if "ticker" not in entry:
+                continue
+            state.setdefault(entry["ticker"], {})[entry["stage"]] = {
+                "status": entry["status"], "error": entry.get("error"), "result": entry.get("result")}
+    return state
+
+def ticker_outcome(stages, final_stage):
+    # DONE once the final stage succeeded, FAILED once any stage failed (and was not redone), else None
+    final = stages.get(final_stage)
+    if final is not None and final["status"] == DONE:
+        return DONE
+    if any(stage["status"] == FAILED for stage in stages.values()):
+        return FAILED
+    return None
+
+def select_tickers(tickers, state, final_stage, resume=False, retry_failed=False):
+    # --resume picks tickers without an outcome yet, --retry-failed those that failed; both: the union
+    selected = []
+    for ticker in tickers:
+        outcome = ticker_outcome(state.get(ticker, {}), final_stage)
+        if (resume and outcome is None) or (retry_failed and outcome == FAILED):
+            selected.append(ticker)
+    return selected
@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import bisect
+from datetime import datetime
+
+from statement_loader import STATEMENT_FILES
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+# Error categories, checked in order against the error text each stage reports
+ERROR_CATEGORIES = [
+    ("throttled", ("Throttled", "HTTP 429", "Rate limited")),
+    ("transient", ("TransientFetchError", "HTTP 5", "timed out", "Connection")),
+    ("worker", ("Worker failed",)),
+    ("missing_file", ("not found for", "Missing one or more", "No recorded", "FileNotFoundError")),
+    ("missing_data", ("row not found", "No Free Cash Flow", "Cannot calculate", "No Free Cash Flow data in store")),
+    ("read_error", ("Error reading", "Error parsing", "ParserError", "EmptyDataError")),
+]
+
+def classify_error(message):
+    if not message:
+        return None
+    for category, markers in ERROR_CATEGORIES:
+        if any(marker in message for marker in markers):
+            return category
+    return "other"
+
+def ticker_file_bytes(ticker, base_dir, names=None, extension=".csv"):
+    # Total size of the ticker's files with the given suffixes (default: statements and info)
+    suffixes = list(STATEMENT_FILES.values()) if names is None else names
+    total = 0
+    for suffix in suffixes:
+        try:
+            total += os.path.getsize(os.path.join(base_dir, ticker, f"{ticker}_{suffix}{extension}"))
+        except OSError:
+            pass
+    return total
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    position = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[position]
+
+class StageMetrics:
+    # Latencies, counts, bytes and error categories of one pipeline stage
+    def __init__(self):
+        self.latencies = []
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.ok = 0
+        self.failed = 0
+        self.errors = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def observe(self, seconds, error=None, bytes_read=0, bytes_written=0):
+        if seconds is not None:
+            self.latencies.append(seconds)
+            self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        category = classify_error(error)
+        if category is None:
+            self.ok += 1
+        else:
+            self.failed += 1
+            self.errors[category] = self.errors.get(category, 0) + 1
+        self.bytes_read += bytes_read or 0
+        self.bytes_written += bytes_written or 0
+
+    def to_dict(self):
+        latencies = sorted(self.latencies)
+        bounds = [f"<={bound}" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}"]
+        return {
+            "tickers": self.ok + self.failed,
+            "ok": self.ok,
+            "failed": self.failed,
+            "errors": self.errors,
+            "seconds_total": sum(latencies),
+            "seconds_mean": sum(latencies) / len(latencies) if latencies else None,
+            "seconds_p50": percentile(latencies, 0.50),
+            "seconds_p90": percentile(latencies, 0.90),
+            "seconds_p99": percentile(latencies, 0.99),
+            "seconds_max": latencies[-1] if latencies else None,
+            "histogram": {bound: count for bound, count in zip(bounds, self.buckets) if count},
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+
+class RunMetrics:
+    # Collects per-stage, per-ticker measurements for one run and writes them as one JSON file
+    def __init__(self, run_id=None, progress=False, stream=None):
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self.started_clock = time.perf_counter()
+        self.stages = {}
+        self.stage_wall = {}
+        self.caches = {}
+        self.extra = {}
+        self.progress = progress
+        self.stream = stream or sys.stderr
+        self._progress_state = {}
+
+    def stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = StageMetrics()
+        return self.stages[name]
+
+    def observe(self, stage, seconds, error=None, bytes_read=0, bytes_written=0):
+        self.stage(stage).observe(seconds, error, bytes_read, bytes_written)
+
+    def start_stage(self, name, total=None, show_progress=True):
+        # Wall-clock span of a stage; total enables the progress line's ETA. Stages that overlap
+        # (as in the streaming pipeline) should leave the progress line to one of them.
+        self.stage(name)
+        self.stage_wall[name] = [time.perf_counter(), None]
+        self._progress_state[name] = {"done": 0, "total": total, "last_print": 0.0, "show": show_progress}
+
+    def end_stage(self, name):
+        if name in self.stage_wall:
+            self.stage_wall[name][1] = time.perf_counter()
+        if self.progress and self._progress_state.get(name, {}).get("show"):
+            self._print_progress(name, force=True)
+            self.stream.write("\n")
+            self.stream.flush()
+
+    def tick(self, name, count=1):
+        # One more ticker finished in this stage; refreshes the progress line at most a few times a second
+        state = self._progress_state.setdefault(name, {"done": 0, "total": None, "last_print": 0.0, "show": True})
+        state["done"] += count
+        if self.progress and state["show"]:
+            self._print_progress(name)
+
+    def _print_progress(self, name, force=False):
+        state = self._progress_state[name]
+        now = time.perf_counter()
+        if not force and now - state["last_print"] < 0.25:
+            return
+        state["last_print"] = now
+        started = self.stage_wall.get(name, [self.started_clock])[0]
+        elapsed = max(now - started, 1e-9)
+        rate = state["done"] / elapsed
+        line = f"[{name}] {state['done']}"
+        if state["total"]:
+            line += f"/{state['total']}"
+        line += f"  {rate:.1f} tickers/s"
+        if state["total"] and rate > 0:
+            eta = max(0.0, (state["total"] - state["done"]) / rate)
+            line += f"  ETA {eta:.0f}s"
+        failed = self.stages[name].failed if name in self.stages else 0
+        if failed:
+            line += f"  {failed} failed"
+        self.stream.write("\r" + line.ljust(79))
+        self.stream.flush()
+
+    def record_cache(self, name, stats):
+        self.caches[name] = stats
+
+    def to_dict(self):
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = stage.to_dict()
+            wall = self.stage_wall.get(name)
+            if wall is not None and wall[1] is not None:
+                stages[name]["wall_seconds"] = wall[1] - wall[0]
+                stages[name]["tickers_per_second"] = stages[name]["tickers"] / stages[name]["wall_seconds"] if stages[name]["wall_seconds"] > 0 else None
+        return {
+            "run_id": self.run_id,
+            "started": self.started,
+            "finished": datetime.now().isoformat(timespec='seconds'),
+            "wall_seconds": time.perf_counter() - self.started_clock,
+            "stages": stages,
+            "bytes_read": sum(stage.bytes_read for stage in self.stages.values()),
+            "bytes_written": sum(stage.bytes_written for stage in self.stages.values()),
+            "caches": self.caches,
+            **self.extra,
+        }
+
+    def write(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        return path
+
+def default_metrics_path(run_id, resume=False):
+    # Next to the other run outputs in the working directory, not inside the ticker directory
+    # (every sub-directory there is taken for a ticker folder). Each resumed invocation of a run
+    # gets its own <run id>.resume-N.json next to the first one's, so none overwrites another.
+    path = os.path.join("run_metrics", f"{run_id}.json")
+    attempt = 0
+    while resume and os.path.exists(path):
+        attempt += 1
+        path = os.path.join("run_metrics", f"{run_id}.resume-{attempt}.json")
+    return path
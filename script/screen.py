@@ -0,0 +1,261 @@
+import os
+import sys
+import csv
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from calculate_dcf import calculate_dcf
+from calculate_dcf_all import split_into_chunks
+from analyze_financials import check_financial_health, empty_health_results
+from filtered_roic_igr import roic_igr_history
+from dcf_results_store import save_dcf_results
+from statement_loader import load_ticker_statements, cache_stats, projection
+from compact_statement import CompactStatement
+from run_metrics import RunMetrics, default_metrics_path, ticker_file_bytes
+from dependency_cache import DependencyCache, cached_stage, default_cache_db
+from ranking import TopK, RANK_BY, make_score, write_ranking
+
+SCREEN_FIELDS = [
+    'kode', 'intrinsic value per share', 'market price', 'margin of safety', 'mos_ok',
+    'der_value', 'der_ok', 'net_income_status', 'profit_ok', 'fcf_status', 'fcf_ok',
+    'roic_min', 'igr_min', 'roic_igr_years', 'roic_igr_ok', 'passed', 'error'
+]
+
+# Default thresholds, as process_all_stocks.py and the filter scripts use them
+DEFAULT_THRESHOLDS = {
+    "discount_rate": 0.10,
+    "terminal_growth_rate": 0.025,
+    "min_mos": 0.0,
+    "max_mos": 100.0,
+    "min_roic": 10.0,
+    "min_igr": 2.5,
+}
+
+# The rows the three parts read, parsed together once per ticker
+SCREEN_PROJECTION = projection("dcf", "health", "roic_igr")
+
+def roic_igr_summary(df_financials, df_balance_sheet, df_cashflow):
+    # (lowest ROIC, lowest IGR, years evaluated) over the full history without minimums, so callers
+    # can show the values even when they miss the thresholds; None when they cannot be computed
+    financials = CompactStatement.from_frame(df_financials)
+    balance_sheet = CompactStatement.from_frame(df_balance_sheet)
+    if not financials or not balance_sheet or df_cashflow is None or not len(df_cashflow.columns):
+        return None
+    history = roic_igr_history(financials, balance_sheet, float('-inf'), float('-inf'))
+    if not history:
+        return None
+    return (min(year['roic'] for year in history.values()),
+            min(year['igr'] for year in history.values()),
+            len(history))
+
+def screen_ticker(ticker, base_dir, thresholds, write_report=False, timings=None, cache=None):
+    # GGM valuation, DER/profit/FCF health and ROIC/IGR history from one load of the ticker's
+    # statements, combined into one row with every threshold applied. timings, if given, receives
+    # the seconds spent in each part ("dcf", "health", "roic_igr"); with a dependency cache, also the
+    # parts taken from it because their inputs have not changed, under "reused".
+    t = dict(DEFAULT_THRESHOLDS, **thresholds)
+    timings = {} if timings is None else timings
+    row = {field: None for field in SCREEN_FIELDS}
+    row['kode'] = ticker
+    statements = {}
+
+    def load_statements():
+        # Parsed once for health and ROIC/IGR, and not at all when both come from the cache
+        if not statements:
+            statements.update(load_ticker_statements(ticker, base_dir, SCREEN_PROJECTION))
+        return statements["balance_sheet"], statements["financials"], statements["cashflow"]
+
+    def compute_dcf():
+        return calculate_dcf(ticker, base_dir, t["discount_rate"], t["terminal_growth_rate"],
+                             verbose=False, write_report=write_report, fields=SCREEN_PROJECTION)
+
+    def compute_health():
+        df_balance_sheet, df_financials, df_cashflow = load_statements()
+        if df_balance_sheet is None or df_financials is None or df_cashflow is None:
+            health = empty_health_results(ticker)
+            health["error"] = "Missing one or more required financial files."
+            return health
+        return check_financial_health(ticker, df_balance_sheet, df_financials, df_cashflow)
+
+    def compute_roic_igr():
+        df_balance_sheet, df_financials, df_cashflow = load_statements()
+        return roic_igr_summary(df_financials, df_balance_sheet, df_cashflow)
+
+    # Thresholds are applied below, outside the cached parts, so changing them never recomputes
+    params = {"dcf": {"discount_rate": t["discount_rate"], "terminal_growth_rate": t["terminal_growth_rate"]}}
+    outputs = {"dcf": [os.path.join(base_dir, ticker, f"{ticker}_dcf_analysis.txt")] if write_report else []}
+    parts = {}
+    reused_parts = []
+    for stage, compute in (("dcf", compute_dcf), ("health", compute_health), ("roic_igr", compute_roic_igr)):
+        started = time.perf_counter()
+        parts[stage], reused = cached_stage(cache, stage, ticker, base_dir, params.get(stage), compute, outputs.get(stage, ()))
+        timings[stage] = time.perf_counter() - started
+        if reused:
+            reused_parts.append(stage)
+    if cache is not None:
+        timings["reused"] = reused_parts
+    dcf, health, summary = parts["dcf"], parts["health"], parts["roic_igr"]
+
+    row['intrinsic value per share'] = dcf["intrinsic_value_per_share"]
+    row['market price'] = dcf["market_price"]
+    row['margin of safety'] = dcf["margin_of_safety"]
+    row['mos_ok'] = dcf["margin_of_safety"] is not None and t["min_mos"] <= dcf["margin_of_safety"] <= t["max_mos"]
+    for field in ('der_value', 'der_ok', 'net_income_status', 'profit_ok', 'fcf_status', 'fcf_ok'):
+        row[field] = health[field]
+    if summary:
+        row['roic_min'], row['igr_min'], row['roic_igr_years'] = summary
+        row['roic_igr_ok'] = row['roic_min'] >= t["min_roic"] and row['igr_min'] >= t["min_igr"]
+    else:
+        row['roic_igr_ok'] = False
+
+    row['error'] = dcf["error"] or health["error"]
+    row['passed'] = bool(row['mos_ok'] and health["der_ok"] and health["profit_ok"] and health["fcf_ok"] and row['roic_igr_ok'])
+    return row, dcf
+
+def screen_chunk(tickers, base_dir, thresholds, write_report=False, cache_db=None):
+    # Runs inside a pool worker, like calculate_dcf_chunk(); each worker opens its own connection
+    # to the dependency cache and writes the chunk's new results in one transaction
+    cache = DependencyCache(cache_db) if cache_db else None
+    chunk_results = []
+    for ticker in tickers:
+        timings = {}
+        try:
+            row, dcf = screen_ticker(ticker, base_dir, thresholds, write_report, timings, cache)
+        except Exception as e:
+            row = {field: None for field in SCREEN_FIELDS}
+            row.update({'kode': ticker, 'passed': False, 'error': f"Exception: {e}"})
+            dcf = {"ticker": ticker, "error": row['error']}
+        timings["bytes_read"] = ticker_file_bytes(ticker, base_dir)
+        chunk_results.append((row, dcf, timings))
+    if cache is not None:
+        cache.close()
+    return chunk_results
+
+def run_screen(tickers, base_dir, thresholds=None, max_workers=None, chunk_size=None, write_report=False, cache_db=None):
+    # Yields (row, dcf_results, timings) per ticker as chunks complete
+    thresholds = thresholds or {}
+    if not tickers:
+        return
+    if max_workers is None or max_workers <= 0:
+        max_workers = os.cpu_count() or 1
+    chunks = split_into_chunks(list(tickers), max_workers, chunk_size)
+    max_workers = min(max_workers, len(chunks))
+
+    if max_workers == 1:
+        for chunk in chunks:
+            yield from screen_chunk(chunk, base_dir, thresholds, write_report, cache_db)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        future_to_chunk = {executor.submit(screen_chunk, chunk, base_dir, thresholds, write_report, cache_db): chunk for chunk in chunks}
+        for future in as_completed(future_to_chunk):
+            chunk = future_to_chunk[future]
+            try:
+                yield from future.result()
+            except Exception as exc:
+                for ticker in chunk:
+                    row = {field: None for field in SCREEN_FIELDS}
+                    row.update({'kode': ticker, 'passed': False, 'error': f"Worker failed: {exc}"})
+                    yield row, {"ticker": ticker, "error": row['error']}, {}
+
+def observe_screen_result(metrics, row, dcf, timings):
+    # Feeds one screened ticker into RunMetrics: a "screen" entry plus one per part
+    for stage in ("dcf", "health", "roic_igr"):
+        if stage in timings:
+            metrics.observe(stage, timings[stage], dcf["error"] if stage == "dcf" else None)
+    metrics.observe("screen", sum(timings.get(stage, 0.0) for stage in ("dcf", "health", "roic_igr")),
+                    row['error'], bytes_read=timings.get("bytes_read", 0))
+    metrics.tick("screen")
+    if "reused" in timings:
+        stats = metrics.caches.setdefault("dependency_cache", {"hits": 0, "misses": 0, "hit_rate": 0.0})
+        stats["hits"] += len(timings["reused"])
+        stats["misses"] += 3 - len(timings["reused"])
+        stats["hit_rate"] = stats["hits"] / (stats["hits"] + stats["misses"])
+
+def format_screen_status(row):
+    if row['error'] is not None and row['margin of safety'] is None:
+        return f"{row['kode']}: Fail ({row['error']})"
+    return f"{row['kode']}: {'Pass' if row['passed'] else 'Done'}"
+
+def write_screen_results(rows, output_path):
+    with open(output_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=SCREEN_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the whole screen (DCF, financial health, ROIC/IGR) in one pass per ticker.")
+    parser.add_argument("--dir", type=str, default="saham", help="The directory containing the ticker folders.")
+    parser.add_argument("num_to_process", type=int, nargs='?', default=None, help="Optional: Number of tickers to process.")
+    parser.add_argument("--r", type=float, default=10.0, help="The discount rate percentage (e.g., 10 for 10%%).")
+    parser.add_argument("--g", type=float, default=2.5, help="The terminal growth rate percentage (e.g., 2.5 for 2.5%%).")
+    parser.add_argument("--min-mos", type=float, default=0.0, help="Minimum Margin of Safety percentage (inclusive).")
+    parser.add_argument("--max-mos", type=float, default=100.0, help="Maximum Margin of Safety percentage (inclusive).")
+    parser.add_argument("--min-roic", type=float, default=10.0, help="Minimum acceptable ROIC percentage.")
+    parser.add_argument("--min-igr", type=float, default=2.5, help="Minimum acceptable Internal Growth Rate percentage.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Tickers per work unit (default: sized from the number of tickers and workers).")
+    parser.add_argument("--output", type=str, default="screen_results.csv", help="Combined result rows, one per ticker.")
+    parser.add_argument("--passed-only", action="store_true", help="Only write the tickers that pass every criterion.")
+    parser.add_argument("--reports", action="store_true", help="Also write each ticker's DCF text report.")
+    parser.add_argument("--metrics", type=str, default=None, help="Where to write this run's metrics JSON (default: run_metrics/<run id>.json).")
+    parser.add_argument("--progress", action="store_true", help="Show a live progress line with rate and ETA.")
+    parser.add_argument("--db", type=str, default=None, help="Also record the DCF numbers in this results table (e.g. saham/dcf_results.db).")
+    parser.add_argument("--top", type=int, default=None, help="Also rank the passing tickers as they finish and write the best K to --top-output.")
+    parser.add_argument("--rank-by", type=str, choices=RANK_BY, default="mos", help="For --top: margin of safety, or a composite of MoS, lowest ROIC and lowest IGR.")
+    parser.add_argument("--top-output", type=str, default="screen_top.csv", help="For --top: the ranked shortlist, best first.")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every part instead of reusing results whose inputs have not changed.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.dir):
+        print(f"Error: Directory '{args.dir}' not found.", file=sys.stderr)
+        sys.exit(1)
+
+    all_ticker_folders = [d for d in os.listdir(args.dir) if os.path.isdir(os.path.join(args.dir, d))]
+    if args.num_to_process is not None and args.num_to_process > 0:
+        all_ticker_folders = all_ticker_folders[:args.num_to_process]
+
+    thresholds = {
+        "discount_rate": args.r / 100.0,
+        "terminal_growth_rate": args.g / 100.0,
+        "min_mos": args.min_mos,
+        "max_mos": args.max_mos,
+        "min_roic": args.min_roic,
+        "min_igr": args.min_igr,
+    }
+
+    metrics = RunMetrics(progress=args.progress)
+    metrics.start_stage("screen", len(all_ticker_folders))
+    rows = []
+    dcf_results = []
+    top = TopK(args.top, make_score(args.rank_by)) if args.top else None
+    cache_db = None if args.no_cache else default_cache_db(args.dir)
+    for row, dcf, timings in run_screen(all_ticker_folders, args.dir, thresholds, args.workers, args.chunk_size, args.reports, cache_db):
+        observe_screen_result(metrics, row, dcf, timings)
+        status = format_screen_status(row)
+        if not args.progress or status.endswith(")"):
+            print(status, flush=True)
+        rows.append(row)
+        dcf_results.append(dcf)
+        if top is not None and row['passed']:
+            top.push(row)
+    metrics.end_stage("screen")
+    if top is not None:
+        # The shortlist is complete as soon as the last ticker is in; write it before the full table
+        write_ranking(top, args.top_output, SCREEN_FIELDS)
+        print(f"Top {len(top.heap)} by {args.rank_by} saved to {args.top_output}")
+    # Only meaningful when the screen ran in this process (--workers 1)
+    metrics.record_cache("statements", cache_stats())
+
+    rows.sort(key=lambda row: row['kode'])
+    passed = [row for row in rows if row['passed']]
+    write_screen_results(passed if args.passed_only else rows, args.output)
+
+    if args.db:
+        save_dcf_results(args.db, dcf_results, thresholds["discount_rate"], thresholds["terminal_growth_rate"])
+
+    print(f"\n{len(passed)} of {len(rows)} tickers passed the screen. Results saved to {args.output}")
+    metrics_path = metrics.write(args.metrics if args.metrics else default_metrics_path(metrics.run_id))
+    print(f"Run metrics saved to {metrics_path}")
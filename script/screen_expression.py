@@ -0,0 +1,430 @@
+import os
+import re
+import sys
+import warnings
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from dcf_kernel import load_ticker_inputs, gordon_growth_kernel
+from analyze_financials import check_financial_health
+from filtered_roic_igr import roic_igr_arrays, roic_igr_history
+from compact_statement import CompactStatement
+from statement_loader import load_ticker_statements, projection
+
+# The screen process_all_stocks.py applies today, written as an expression
+DEFAULT_EXPRESSION = "mos between 0 and 100 and der_ok and profit_ok and fcf_ok and roic_igr_complete and roic_min >= 10 and igr_min >= 2.5"
+
+# Fiscal years of history kept per ticker, newest last; windows like 5y look at the last N of them
+MAX_HISTORY_YEARS = 10
+
+# Metric groups: each is loaded for a batch of tickers at once and has a relative cost, so that an
+# "and" evaluates cheap predicates first and expensive ones only for the tickers still standing.
+#   health:    DER and the profit / FCF checks of analyze_financials.py, from the statements
+#   valuation: GGM value per share and margin of safety at the run's r and g, valuing the tickers
+#              calculate_dcf() values (see load_ticker_inputs())
+#   history:   per-year line items and ROIC / IGR, for min(), max(), mean() and last(), plus
+#              screen.py's ROIC / IGR over the full history: roic_igr_complete is 0 when a year
+#              lacks EBIT, tax rate or IGR (screen.py fails such a ticker), and roic_min / igr_min
+#              are then NaN
+SCALAR_METRICS = {
+    "der": "health", "der_ok": "health", "profit_ok": "health", "fcf_ok": "health",
+    "mos": "valuation", "value": "valuation", "price": "valuation", "shares": "valuation",
+    "roic_igr_complete": "history", "roic_min": "history", "igr_min": "history",
+}
+HISTORY_METRICS = {
+    # name -> (statement, line item); roic and igr are derived, in percent
+    "roic": (None, None),
+    "igr": (None, None),
+    "fcf": ("cashflow", "Free Cash Flow"),
+    "net_income": ("financials", "Net Income"),
+    "revenue": ("financials", "Total Revenue"),
+    "ebit": ("financials", "EBIT"),
+    "invested_capital": ("balance_sheet", "Invested Capital"),
+}
+GROUP_COST = {"health": 1, "valuation": 2, "history": 3}
+# Every group reads through the same projection, so a ticker's statements are parsed once
+EXPRESSION_PROJECTION = projection("dcf", "health", "history")
+FUNCTIONS = {"min": np.nanmin, "max": np.nanmax, "mean": np.nanmean, "last": None}
+
+def _load_health(ticker, base_dir, params):
+    statements = load_ticker_statements(ticker, base_dir, EXPRESSION_PROJECTION)
+    if statements["balance_sheet"] is None or statements["financials"] is None or statements["cashflow"] is None:
+        return {}
+    health = check_financial_health(ticker, statements["balance_sheet"], statements["financials"], statements["cashflow"])
+    try:
+        der = float(health["der_value"])
+    except ValueError:
+        der = np.nan
+    return {"der": der, "der_ok": float(health["der_ok"]), "profit_ok": float(health["profit_ok"]),
+            "fcf_ok": float(health["fcf_ok"])}
+
+def _load_valuation(ticker, base_dir, params):
+    # Inputs only; the GGM itself runs once over the whole batch (see MetricsTable._fill)
+    inputs = load_ticker_inputs(ticker, base_dir, with_prices=False, fields=EXPRESSION_PROJECTION, dcf_rules=True)
+    last_fcf = inputs["fcf"][inputs["last_year"]] if inputs["last_year"] is not None else np.nan
+    return {"fcf": last_fcf, "shares": inputs["current_shares"], "price": inputs["current_price"]}
+
+def _right_aligned(years, values):
+    # Per-year values laid out over the last MAX_HISTORY_YEARS years ending at the newest year with
+    # a value; years without one stay NaN
+    row = np.full(MAX_HISTORY_YEARS, np.nan)
+    known = ~np.isnan(values)
+    if not known.any():
+        return row
+    offsets = years[known].max() - years[known]
+    keep = offsets < MAX_HISTORY_YEARS
+    row[MAX_HISTORY_YEARS - 1 - offsets[keep]] = values[known][keep]
+    return row
+
+def _load_history(ticker, base_dir, params):
+    statements = load_ticker_statements(ticker, base_dir, EXPRESSION_PROJECTION)
+    compact = {name: CompactStatement.from_frame(statements[name]) for name in ("balance_sheet", "financials", "cashflow")}
+    rows = {"roic_igr_complete": 0.0}
+    for name, (statement, line_item) in HISTORY_METRICS.items():
+        if statement is not None and compact[statement] is not None:
+            rows[name] = _right_aligned(compact[statement].years, compact[statement].row(line_item))
+    if compact["financials"] and compact["balance_sheet"] and compact["cashflow"]:
+        years, roic, igr, _, _ = roic_igr_arrays(compact["financials"], compact["balance_sheet"])
+        rows["roic"] = _right_aligned(years, roic * 100)
+        rows["igr"] = _right_aligned(years, igr * 100)
+        # As screen.py's roic_igr_summary(): every year, not just the last MAX_HISTORY_YEARS
+        history = roic_igr_history(compact["financials"], compact["balance_sheet"], float('-inf'), float('-inf'))
+        if history:
+            rows["roic_igr_complete"] = 1.0
+            rows["roic_min"] = min(year['roic'] for year in history.values())
+            rows["igr_min"] = min(year['igr'] for year in history.values())
+    return rows
+
+GROUP_LOADERS = {"health": _load_health, "valuation": _load_valuation, "history": _load_history}
+
+class MetricsTable:
+    # Universe-wide metrics, one array (or tickers x years matrix) per metric, filled lazily: a group
+    # is loaded only for the tickers an expression still needs it for. Load errors leave NaN.
+    def __init__(self, tickers, base_dir, discount_rate=0.10, terminal_growth_rate=0.025):
+        self.tickers = list(tickers)
+        self.base_dir = base_dir
+        self.params = {"discount_rate": discount_rate, "terminal_growth_rate": terminal_growth_rate}
+        n = len(self.tickers)
+        self.scalars = {name: np.full(n, np.nan) for name in list(SCALAR_METRICS) + ["fcf"]}
+        self.history = {name: np.full((n, MAX_HISTORY_YEARS), np.nan) for name in HISTORY_METRICS}
+        self.loaded = {group: np.zeros(n, dtype=bool) for group in GROUP_LOADERS}
+        self.errors = {}
+
+    def _fill(self, group, positions):
+        missing = positions[~self.loaded[group][positions]]
+        for i in missing:
+            try:
+                values = GROUP_LOADERS[group](self.tickers[i], self.base_dir, self.params)
+            except Exception as e:
+                self.errors.setdefault(self.tickers[i], str(e))
+                continue
+            for name, value in values.items():
+                # The history group also fills screen.py's ROIC / IGR scalars
+                target = self.history if group == "history" and name not in SCALAR_METRICS else self.scalars
+                target[name][i] = value
+        self.loaded[group][missing] = True
+        if group == "valuation" and len(missing):
+            _, value_per_share, margin_of_safety = gordon_growth_kernel(
+                self.scalars["fcf"][missing], self.scalars["shares"][missing], self.scalars["price"][missing],
+                self.params["discount_rate"], self.params["terminal_growth_rate"], dcf_rules=True)
+            self.scalars["value"][missing] = value_per_share
+            self.scalars["mos"][missing] = margin_of_safety
+
+    def scalar(self, name, positions):
+        self._fill(SCALAR_METRICS[name], positions)
+        return self.scalars[name][positions]
+
+    def window(self, name, positions, years=None):
+        # tickers x years history over the last `years` fiscal years (all kept years by default)
+        self._fill("history", positions)
+        matrix = self.history[name][positions]
+        return matrix if years is None else matrix[:, MAX_HISTORY_YEARS - years:]
+
+    def loaded_counts(self):
+        return {group: int(loaded.sum()) for group, loaded in self.loaded.items()}
+
+# --- Parsing -----------------------------------------------------------------------------------
+
+TOKEN_PATTERN = re.compile(r"\s*(?:(?P<window>\d+)y\b|(?P<number>-?\d+(?:\.\d+)?)|(?P<op><=|>=|==|!=|<|>)|(?P<punct>[(),])|(?P<name>[A-Za-z_][A-Za-z0-9_]*))")
+KEYWORDS = {"and", "or", "not", "between"}
+TOKEN_LABELS = {"name": "a metric or number", "window": "a window like 5y", "op": "a comparison"}
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match:
+            raise ValueError(f"Invalid screen expression at column {position + 1}: '{text[position:position + 10]}'")
+        kind = match.lastgroup
+        value = match.group(kind)
+        column = match.start(kind) + 1
+        if kind == "name" and value.lower() in KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value, column))
+        position = match.end()
+    return tokens
+
+class _Parser:
+    # Recursive descent over: or-expr := and-expr ("or" and-expr)*
+    #                         and-expr := unary ("and" unary)*
+    #                         unary    := "not" unary | "(" or-expr ")" | comparison
+    #                         comparison := operand [op operand | "between" operand "and" operand]
+    #                         operand  := number | name | function "(" name ["," N"y"] ")"
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self, kind=None, value=None):
+        if self.position >= len(self.tokens):
+            return None
+        token = self.tokens[self.position]
+        if (kind is None or token[0] == kind) and (value is None or token[1] == value):
+            return token
+        return None
+
+    def take(self, kind=None, value=None):
+        token = self.peek(kind, value)
+        if token is None:
+            found = self.tokens[self.position] if self.position < len(self.tokens) else None
+            where = f"column {found[2]} ('{found[1]}')" if found else "end of expression"
+            raise ValueError(f"Invalid screen expression: expected {value or TOKEN_LABELS.get(kind, kind)} at {where}")
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.position < len(self.tokens):
+            token = self.tokens[self.position]
+            raise ValueError(f"Invalid screen expression: unexpected '{token[1]}' at column {token[2]}")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek("keyword", "or"):
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_unary()]
+        while self.peek("keyword", "and"):
+            self.take()
+            nodes.append(self.parse_unary())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_unary(self):
+        if self.peek("keyword", "not"):
+            self.take()
+            return ("not", self.parse_unary())
+        if self.peek("punct", "("):
+            self.take()
+            node = self.parse_or()
+            self.take("punct", ")")
+            return node
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        left = self.parse_operand()
+        if self.peek("op"):
+            op = self.take()[1]
+            return ("compare", op, left, self.parse_operand())
+        if self.peek("keyword", "between"):
+            self.take()
+            low = self.parse_operand()
+            self.take("keyword", "and")
+            return ("between", left, low, self.parse_operand())
+        if left[0] == "number":
+            raise ValueError(f"Invalid screen expression: a number alone is not a condition ('{self.text}')")
+        return ("truthy", left)
+
+    def parse_operand(self):
+        if self.peek("number"):
+            return ("number", float(self.take()[1]))
+        token = self.take("name")
+        name = token[1].lower()
+        if self.peek("punct", "("):
+            if name not in FUNCTIONS:
+                raise ValueError(f"Unknown function '{name}' at column {token[2]} (known: {', '.join(FUNCTIONS)})")
+            self.take()
+            metric = self.take("name")
+            if metric[1].lower() not in HISTORY_METRICS:
+                raise ValueError(f"'{metric[1]}' at column {metric[2]} has no history (known: {', '.join(HISTORY_METRICS)})")
+            years = None
+            if self.peek("punct", ","):
+                self.take()
+                years = int(self.take("window")[1])
+                if not 1 <= years <= MAX_HISTORY_YEARS:
+                    raise ValueError(f"Window of {years}y is outside 1y..{MAX_HISTORY_YEARS}y")
+            self.take("punct", ")")
+            return ("function", name, metric[1].lower(), years)
+        if name not in SCALAR_METRICS and name not in HISTORY_METRICS:
+            known = sorted(set(SCALAR_METRICS) | set(HISTORY_METRICS))
+            raise ValueError(f"Unknown metric '{token[1]}' at column {token[2]} (known: {', '.join(known)})")
+        if name in SCALAR_METRICS:
+            return ("scalar", name)
+        # A history metric on its own means its latest value
+        return ("function", "last", name, None)
+
+# --- Evaluation --------------------------------------------------------------------------------
+
+def _cost(node):
+    kind = node[0]
+    if kind in ("and", "or"):
+        return max(_cost(child) for child in node[1])
+    if kind == "not":
+        return _cost(node[1])
+    if kind == "scalar":
+        return GROUP_COST[SCALAR_METRICS[node[1]]]
+    if kind == "function":
+        return GROUP_COST["history"]
+    if kind == "number":
+        return 0
+    return max(_cost(child) for child in node[1:] if isinstance(child, tuple))
+
+def _operand(node, table, positions):
+    kind = node[0]
+    if kind == "number":
+        return np.full(len(positions), node[1])
+    if kind == "scalar":
+        return table.scalar(node[1], positions)
+    _, function, metric, years = node
+    matrix = table.window(metric, positions, years)
+    if function == "last":
+        # Newest year in the window that has a value
+        values = np.full(len(positions), np.nan)
+        for column in matrix.T:
+            values = np.where(np.isnan(column), values, column)
+        return values
+    with warnings.catch_warnings():
+        # nanmin() and friends warn on rows without any value; those rows simply yield NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return FUNCTIONS[function](matrix, axis=1) if len(positions) else np.zeros(0)
+
+COMPARE = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+           "==": np.equal, "!=": np.not_equal}
+
+def evaluate(node, table, positions, trace=None):
+    # Boolean mask over positions. NaN never satisfies a comparison. Operands of "and" run
+    # cheapest first, each only on the tickers the previous ones left standing; "or" evaluates an
+    # operand only for the tickers not already accepted.
+    kind = node[0]
+    if kind == "and":
+        alive = positions
+        for child in sorted(node[1], key=_cost):
+            if not len(alive):
+                break
+            before = len(alive)
+            alive = alive[evaluate(child, table, alive, trace)]
+            if trace is not None:
+                trace.append((child, before, len(alive)))
+        return np.isin(positions, alive)
+    if kind == "or":
+        mask = np.zeros(len(positions), dtype=bool)
+        for child in sorted(node[1], key=_cost):
+            pending = ~mask
+            if not pending.any():
+                break
+            mask[pending] = evaluate(child, table, positions[pending], trace)
+        return mask
+    if kind == "not":
+        return ~evaluate(node[1], table, positions, trace)
+    with np.errstate(invalid='ignore'):
+        if kind == "truthy":
+            values = _operand(node[1], table, positions)
+            return ~np.isnan(values) & (values != 0)
+        if kind == "compare":
+            _, op, left, right = node
+            return COMPARE[op](_operand(left, table, positions), _operand(right, table, positions))
+        if kind == "between":
+            _, term, low, high = node
+            values = _operand(term, table, positions)
+            return (values >= _operand(low, table, positions)) & (values <= _operand(high, table, positions))
+    raise ValueError(f"Cannot evaluate '{kind}'")
+
+def describe(node):
+    # Expression text back from a parsed node, for traces
+    kind = node[0]
+    if kind in ("and", "or"):
+        return f" {kind} ".join(f"({describe(child)})" if child[0] in ("and", "or") else describe(child) for child in node[1])
+    if kind == "not":
+        return f"not {describe(node[1])}"
+    if kind == "number":
+        return f"{node[1]:g}"
+    if kind == "scalar":
+        return node[1]
+    if kind == "function":
+        return f"{node[1]}({node[2]}{f', {node[3]}y' if node[3] else ''})"
+    if kind == "truthy":
+        return describe(node[1])
+    if kind == "compare":
+        return f"{describe(node[2])} {node[1]} {describe(node[3])}"
+    return f"{describe(node[1])} between {describe(node[2])} and {describe(node[3])}"
+
+def operands(node):
+    # Every metric operand in the expression, in order of appearance
+    kind = node[0]
+    if kind in ("and", "or"):
+        return [found for child in node[1] for found in operands(child)]
+    if kind in ("not", "truthy"):
+        return operands(node[1])
+    if kind in ("scalar", "function"):
+        return [node]
+    if kind in ("compare", "between"):
+        return [found for child in node[1:] if isinstance(child, tuple) for found in operands(child)]
+    return []
+
+def compile_screen(text):
+    return _Parser(text).parse()
+
+def run_expression(text, table, trace=None):
+    # Tickers of the table that satisfy the expression, in table order
+    node = compile_screen(text)
+    positions = np.arange(len(table.tickers))
+    return [table.tickers[i] for i in positions[evaluate(node, table, positions, trace)]]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screen a universe with a declarative expression.",
+                                     epilog="Metrics: " + ", ".join(sorted(set(SCALAR_METRICS) | set(HISTORY_METRICS)))
+                                            + f". Functions over history: {', '.join(FUNCTIONS)}(metric[, Ny]).")
+    parser.add_argument("expression", type=str, nargs='?', default=DEFAULT_EXPRESSION, help=f"Screen expression (default: \"{DEFAULT_EXPRESSION}\").")
+    parser.add_argument("--dir", type=str, default="saham", help="The directory containing the ticker folders.")
+    parser.add_argument("--r", type=float, default=10.0, help="The discount rate percentage (e.g., 10 for 10%%).")
+    parser.add_argument("--g", type=float, default=2.5, help="The terminal growth rate percentage (e.g., 2.5 for 2.5%%).")
+    parser.add_argument("--output", type=str, default="expression_results.csv", help="Output CSV of the passing tickers and the values the expression used.")
+    parser.add_argument("--explain", action="store_true", help="Print how many tickers each condition kept.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.dir):
+        print(f"Error: Directory '{args.dir}' not found.", file=sys.stderr)
+        sys.exit(1)
+    try:
+        node = compile_screen(args.expression)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    tickers = sorted(d for d in os.listdir(args.dir) if os.path.isdir(os.path.join(args.dir, d)))
+    table = MetricsTable(tickers, args.dir, args.r / 100.0, args.g / 100.0)
+    trace = [] if args.explain else None
+    positions = np.arange(len(tickers))
+    # A lone condition is traced like the operand of an "and"
+    root = node if node[0] == "and" else ("and", [node])
+    passed = positions[evaluate(root, table, positions, trace)]
+
+    if trace:
+        for condition, before, after in trace:
+            print(f"{describe(condition):<50} {before:>7} -> {after}")
+    for ticker, error in sorted(table.errors.items()):
+        print(f"{ticker}: Fail ({error})", file=sys.stderr)
+
+    df = pd.DataFrame({"kode": [tickers[i] for i in passed]})
+    for operand in dict.fromkeys(operands(node)):
+        df[describe(operand)] = _operand(operand, table, passed)
+    df.to_csv(args.output, index=False)
+    print(f"{len(passed)} of {len(tickers)} tickers passed; saved to {args.output}")
+    print(f"Tickers loaded per metric group: {table.loaded_counts()}")
@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dcf_kernel import load_ticker_inputs, gordon_growth_kernel
+from analyze_financials import check_financial_health, empty_health_results
+from calculate_dcf_all import split_into_chunks
+from screen import roic_igr_summary, DEFAULT_THRESHOLDS, SCREEN_PROJECTION
+from statement_loader import load_ticker_statements, statement_signature
+
+# Per-ticker values the queries work on, held as one array each across the universe
+NUMERIC_FIELDS = ["last_fcf", "current_shares", "current_price", "der", "roic_min", "igr_min", "roic_igr_years"]
+FLAG_FIELDS = ["der_ok", "profit_ok", "fcf_ok"]
+TEXT_FIELDS = ["der_value", "net_income_status", "fcf_status", "error"]
+
+def load_ticker_record(ticker, base_dir):
+    # Everything the queries need about one ticker, from one load of its files; r and g are applied
+    # at query time, so nothing here depends on them
+    record = {field: np.nan for field in NUMERIC_FIELDS}
+    record.update({field: False for field in FLAG_FIELDS})
+    record.update({field: None for field in TEXT_FIELDS})
+    record["ticker"] = ticker
+    record["signature"] = statement_signature(ticker, base_dir)
+
+    try:
+        inputs = load_ticker_inputs(ticker, base_dir, with_prices=False, fields=SCREEN_PROJECTION, dcf_rules=True)
+        if inputs["last_year"] is None:
+            record["error"] = "No Free Cash Flow data"
+        else:
+            record["last_fcf"] = inputs["fcf"][inputs["last_year"]]
+        record["current_shares"] = inputs["current_shares"]
+        record["current_price"] = inputs["current_price"]
+    except Exception as e:
+        record["error"] = str(e)
+
+    try:
+        statements = load_ticker_statements(ticker, base_dir, SCREEN_PROJECTION)
+    except Exception as e:
+        record["error"] = record["error"] or f"Error reading financial files: {e}"
+        statements = {"balance_sheet": None, "financials": None, "cashflow": None}
+    if statements["balance_sheet"] is None or statements["financials"] is None or statements["cashflow"] is None:
+        health = empty_health_results(ticker)
+        health["error"] = "Missing one or more required financial files."
+    else:
+        health = check_financial_health(ticker, statements["balance_sheet"], statements["financials"], statements["cashflow"])
+    for field in FLAG_FIELDS + ["der_value", "net_income_status", "fcf_status"]:
+        record[field] = health[field]
+    try:
+        record["der"] = float(health["der_value"])
+    except ValueError:
+        pass
+    record["error"] = record["error"] or health["error"]
+
+    summary = roic_igr_summary(statements["financials"], statements["balance_sheet"], statements["cashflow"])
+    if summary:
+        record["roic_min"], record["igr_min"], record["roic_igr_years"] = summary
+    return record
+
+def _load_chunk(tickers, base_dir):
+    return [load_ticker_record(ticker, base_dir) for ticker in tickers]
+
+def _json_column(values):
+    # NaN as null, NumPy floats as plain numbers
+    return [None if value != value else value for value in np.asarray(values, dtype='float64').tolist()]
+
+class UniverseTable:
+    # The whole universe in memory as one array per field, indexed by ticker. Refreshing a ticker
+    # overwrites its slot in place; queries read the arrays under the same lock, so they always
+    # see whole tickers.
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self.tickers = []
+        self.index = {}
+        self.numeric = {field: np.empty(0) for field in NUMERIC_FIELDS}
+        self.flags = {field: np.empty(0, dtype=bool) for field in FLAG_FIELDS}
+        self.text = {field: [] for field in TEXT_FIELDS}
+        self.signatures = []
+        self.loaded = None
+        self.refreshed = 0
+        self._lock = threading.RLock()
+
+    def load(self, tickers, max_workers=None):
+        # Initial load, spread over worker processes like the batch scripts
+        if max_workers is None or max_workers <= 0:
+            max_workers = os.cpu_count() or 1
+        records = []
+        chunks = split_into_chunks(list(tickers), max_workers)
+        if max_workers == 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                records.extend(_load_chunk(chunk, self.base_dir))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                for chunk_records in executor.map(_load_chunk, chunks, [self.base_dir] * len(chunks)):
+                    records.extend(chunk_records)
+        with self._lock:
+            self._append(sorted(records, key=lambda record: record["ticker"]))
+            self.loaded = time.time()
+
+    def _append(self, records):
+        if not records:
+            return
+        start = len(self.tickers)
+        for offset, record in enumerate(records):
+            self.tickers.append(record["ticker"])
+            self.index[record["ticker"]] = start + offset
+            self.signatures.append(record["signature"])
+            for field in TEXT_FIELDS:
+                self.text[field].append(record[field])
+        for field in NUMERIC_FIELDS:
+            self.numeric[field] = np.concatenate([self.numeric[field], [record[field] for record in records]]).astype('float64')
+        for field in FLAG_FIELDS:
+            self.flags[field] = np.concatenate([self.flags[field], [bool(record[field]) for record in records]])
+
+    def _store(self, record):
+        i = self.index[record["ticker"]]
+        self.signatures[i] = record["signature"]
+        for field in NUMERIC_FIELDS:
+            self.numeric[field][i] = record[field]
+        for field in FLAG_FIELDS:
+            self.flags[field][i] = bool(record[field])
+        for field in TEXT_FIELDS:
+            self.text[field][i] = record[field]
+
+    def refresh(self, tickers):
+        # Re-reads the given tickers from disk; new tickers are added to the universe
+        records = [load_ticker_record(ticker, self.base_dir) for ticker in tickers]
+        with self._lock:
+            for record in records:
+                if record["ticker"] in self.index:
+                    self._store(record)
+            self._append([record for record in records if record["ticker"] not in self.index])
+            self.refreshed += len(records)
+        return [record["ticker"] for record in records]
+
+    def changed_tickers(self):
+        # Tickers whose files were rewritten (or that appeared in base_dir) since they were loaded
+        with self._lock:
+            known = dict(zip(self.tickers, self.signatures))
+        on_disk = [d for d in os.listdir(self.base_dir) if os.path.isdir(os.path.join(self.base_dir, d))]
+        return [ticker for ticker in on_disk if known.get(ticker) != statement_signature(ticker, self.base_dir)]
+
+    def _positions(self, tickers):
+        if tickers is None:
+            return np.arange(len(self.tickers))
+        missing = [ticker for ticker in tickers if ticker not in self.index]
+        if missing:
+            raise KeyError(", ".join(missing))
+        return np.array([self.index[ticker] for ticker in tickers], dtype=np.intp)
+
+    def value(self, discount_rate, terminal_growth_rate, tickers=None):
+        # Current GGM valuation at the given rates, for every ticker or the listed ones
+        with self._lock:
+            positions = self._positions(tickers)
+            _, value_per_share, margin_of_safety = gordon_growth_kernel(
+                self.numeric["last_fcf"][positions], self.numeric["current_shares"][positions],
+                self.numeric["current_price"][positions], discount_rate, terminal_growth_rate, dcf_rules=True)
+            return self._rows(positions, value_per_share, margin_of_safety)
+
+    def screen(self, thresholds, health=True, max_der=None, limit=None):
+        # Tickers inside the MoS band and meeting the ROIC/IGR minimums; health also requires
+        # der_ok (or DER <= max_der), profit_ok and fcf_ok. Deepest discount first.
+        t = dict(DEFAULT_THRESHOLDS, **thresholds)
+        with self._lock:
+            _, value_per_share, margin_of_safety = gordon_growth_kernel(
+                self.numeric["last_fcf"], self.numeric["current_shares"], self.numeric["current_price"],
+                t["discount_rate"], t["terminal_growth_rate"], dcf_rules=True)
+            with np.errstate(invalid='ignore'):
+                mask = (margin_of_safety >= t["min_mos"]) & (margin_of_safety <= t["max_mos"])
+                if t["min_roic"] is not None:
+                    mask &= self.numeric["roic_min"] >= t["min_roic"]
+                if t["min_igr"] is not None:
+                    mask &= self.numeric["igr_min"] >= t["min_igr"]
+                if max_der is not None:
+                    mask &= self.numeric["der"] <= max_der
+                if health:
+                    if max_der is None:
+                        mask &= self.flags["der_ok"]
+                    mask &= self.flags["profit_ok"] & self.flags["fcf_ok"]
+            positions = np.flatnonzero(mask)
+            positions = positions[np.argsort(-margin_of_safety[positions], kind='stable')]
+            if limit is not None:
+                positions = positions[:limit]
+            return self._rows(positions, value_per_share[positions], margin_of_safety[positions]), int(mask.sum())
+
+    def _rows(self, positions, value_per_share, margin_of_safety):
+        # JSON-ready rows for the given positions; value_per_share and margin_of_safety line up with
+        # positions. Columns are converted whole, as per-element NumPy access dominates otherwise.
+        columns = {"kode": [self.tickers[i] for i in positions],
+                   "intrinsic value per share": _json_column(value_per_share),
+                   "market price": _json_column(self.numeric["current_price"][positions]),
+                   "margin of safety": _json_column(margin_of_safety)}
+        for field in ("der", "roic_min", "igr_min", "roic_igr_years"):
+            columns[field] = _json_column(self.numeric[field][positions])
+        for field in FLAG_FIELDS:
+            columns[field] = self.flags[field][positions].tolist()
+        for field in TEXT_FIELDS:
+            columns[field] = [self.text[field][i] for i in positions]
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+def _rate(query, name, default):
+    # Rates are given in percent on the query string, as on the command line
+    return float(query[name][0]) / 100.0 if name in query else default
+
+def _number(query, name, default=None):
+    return float(query[name][0]) if name in query else default
+
+def _ticker_list(query):
+    if "tickers" not in query:
+        return None
+    return [ticker for value in query["tickers"] for ticker in value.split(',') if ticker]
+
+class ScreenerHandler(BaseHTTPRequestHandler):
+    # JSON over HTTP:
+    #   GET  /status
+    #   GET  /value?r=11&g=2.5[&tickers=A,B]
+    #   GET  /screen?r=11&g=2.5&min_mos=20&max_mos=60[&min_roic=10&min_igr=2.5&max_der=1&health=0&limit=50]
+    #   GET  /ticker/<TICKER>?r=11&g=2.5
+    #   POST /refresh[?tickers=A,B]   (no tickers: every ticker whose files changed on disk)
+    table = None
+    # Set from --quiet; request logging stays on for callers that serve with this handler directly
+    server_quiet = False
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        started = time.perf_counter()
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            status, body = self._route(method, url.path.rstrip('/'), query)
+        except KeyError as e:
+            status, body = 404, {"error": f"Unknown ticker(s): {e.args[0]}"}
+        except ValueError as e:
+            status, body = 400, {"error": str(e)}
+        body["seconds"] = time.perf_counter() - started
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _route(self, method, path, query):
+        table = self.table
+        r = _rate(query, "r", DEFAULT_THRESHOLDS["discount_rate"])
+        g = _rate(query, "g", DEFAULT_THRESHOLDS["terminal_growth_rate"])
+
+        if method == "GET" and path == "/status":
+            return 200, {"tickers": len(table.tickers), "base_dir": table.base_dir,
+                         "loaded": table.loaded, "refreshed": table.refreshed}
+        if method == "GET" and path == "/value":
+            return 200, {"r": r, "g": g, "rows": table.value(r, g, _ticker_list(query))}
+        if method == "GET" and path.startswith("/ticker/"):
+            return 200, {"r": r, "g": g, "row": table.value(r, g, [path[len("/ticker/"):]])[0]}
+        if method == "GET" and path == "/screen":
+            thresholds = {"discount_rate": r, "terminal_growth_rate": g,
+                          "min_mos": _number(query, "min_mos", DEFAULT_THRESHOLDS["min_mos"]),
+                          "max_mos": _number(query, "max_mos", DEFAULT_THRESHOLDS["max_mos"]),
+                          "min_roic": _number(query, "min_roic", DEFAULT_THRESHOLDS["min_roic"]),
+                          "min_igr": _number(query, "min_igr", DEFAULT_THRESHOLDS["min_igr"])}
+            health = query.get("health", ["1"])[0] not in ("0", "false", "no")
+            limit = int(query["limit"][0]) if "limit" in query else None
+            rows, matched = table.screen(thresholds, health, _number(query, "max_der"), limit)
+            return 200, {"r": r, "g": g, "matched": matched, "rows": rows}
+        if method == "POST" and path == "/refresh":
+            tickers = _ticker_list(query)
+            return 200, {"refreshed": table.refresh(tickers if tickers is not None else table.changed_tickers())}
+        return 404, {"error": f"No route for {method} {path}"}
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if self.server_quiet:
+            return
+        super().log_message(format, *args)
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def watch_for_changes(table, interval, stop):
+    # Picks up re-fetched tickers without anyone calling /refresh
+    while not stop.wait(interval):
+        changed = table.changed_tickers()
+        if changed:
+            table.refresh(changed)
+            print(f"Refreshed {len(changed)} ticker(s): {', '.join(changed[:10])}{' ...' if len(changed) > 10 else ''}", flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep a universe in memory and answer valuation and screen queries over HTTP.")
+    parser.add_argument("--dir", type=str, default="saham", help="The directory containing the ticker folders.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+    parser.add_argument("--socket", type=str, default=None, help="Listen on this Unix socket instead of a TCP port.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for the initial load (default: CPU count).")
+    parser.add_argument("--watch", type=float, default=None, help="Check for re-fetched tickers every this many seconds and refresh them.")
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.dir):
+        print(f"Error: Directory '{args.dir}' not found.", file=sys.stderr)
+        sys.exit(1)
+
+    tickers = [d for d in os.listdir(args.dir) if os.path.isdir(os.path.join(args.dir, d))]
+    started = time.perf_counter()
+    table = UniverseTable(args.dir)
+    table.load(tickers, args.workers)
+    print(f"Loaded {len(table.tickers)} tickers in {time.perf_counter() - started:.1f}s", flush=True)
+
+    ScreenerHandler.table = table
+    ScreenerHandler.server_quiet = args.quiet
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = ThreadingUnixHTTPServer(args.socket, ScreenerHandler)
+        print(f"Listening on {args.socket}", flush=True)
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), ScreenerHandler)
+        print(f"Listening on http://{args.host}:{args.port}", flush=True)
+
+    stop = threading.Event()
+    if args.watch:
+        threading.Thread(target=watch_for_changes, args=(table, args.watch, stop), daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
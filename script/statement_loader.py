@@ -0,0 +1,190 @@
+import csv
+import functools
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+# Statement name -> file suffix in the saham/<TICKER>/ layout
+STATEMENT_FILES = {
+    "balance_sheet": "balance_sheet",
+    "financials": "financials",
+    "cashflow": "cashflow",
+    "info": "company_info",
+}
+
+# Stage -> {statement: line items (fields for info)} it reads. Passing projection(stage, ...) to
+# load_ticker_statements() parses only these rows; an empty list still reads the statement's dates.
+STAGE_FIELDS = {
+    "dcf": {
+        "cashflow": ["Free Cash Flow"],
+        "balance_sheet": ["Ordinary Shares Number"],
+        "info": ["sharesOutstanding", "currentPrice"],
+    },
+    "health": {
+        "balance_sheet": ["Total Liabilities Net Minority Interest", "Stockholders Equity"],
+        "financials": ["Net Income"],
+        "cashflow": ["Free Cash Flow"],
+    },
+    "roic_igr": {
+        "financials": ["EBIT", "Tax Rate For Calcs"],
+        "balance_sheet": ["Invested Capital"],
+        "cashflow": [],
+    },
+    # screen_expression.py's per-year metrics
+    "history": {
+        "financials": ["Net Income", "Total Revenue", "EBIT", "Tax Rate For Calcs"],
+        "balance_sheet": ["Invested Capital"],
+        "cashflow": ["Free Cash Flow"],
+    },
+}
+
+DEFAULT_CACHE_SIZE = 256
+
+def statement_file(ticker, base_dir, statement):
+    return os.path.join(base_dir, ticker, f"{ticker}_{STATEMENT_FILES[statement]}.csv")
+
+@functools.lru_cache(maxsize=1024)
+def _column_dates(columns):
+    # (positions of the date columns in ascending date order, those dates); statements fetched
+    # together share their headers, so each distinct header is parsed once
+    dates = pd.to_datetime(pd.Index(columns), errors='coerce')
+    positions = np.flatnonzero(~dates.isna())
+    order = np.argsort(dates[positions].asi8, kind='stable')
+    return positions[order], dates[positions][order]
+
+def _dated_frame(values, index, positions, dates):
+    # attrs["source_positions"]: each column's position in the file, which the sort by date loses;
+    # CompactStatement needs it to pick the same column for a repeated fiscal year as parse_csv did
+    df = pd.DataFrame(values, index=index, columns=dates)
+    df.attrs["source_positions"] = positions
+    return df
+
+def normalize_statement(df):
+    # Line items x fiscal dates: date-parsed columns in ascending order, float values, and NaN for
+    # anything missing or unparseable (callers decide what NaN means for them)
+    positions, dates = _column_dates(tuple(df.columns))
+    df = df.iloc[:, positions]
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+        df = df.apply(pd.to_numeric, errors='coerce')
+    return _dated_frame(df.to_numpy(dtype='float64'), df.index, positions, dates)
+
+def projection(*stages):
+    # The union of the stages' fields, in the hashable form load_ticker_statements() takes
+    merged = {}
+    for stage in stages:
+        for statement, items in STAGE_FIELDS[stage].items():
+            merged.setdefault(statement, set()).update(items)
+    return tuple(sorted((statement, tuple(sorted(items))) for statement, items in merged.items()))
+
+# Every field any stage reads, e.g. for fetches that persist only the projection
+ALL_FIELDS = projection(*STAGE_FIELDS)
+
+def _projected_records(file_path, rows):
+    # (header, records labelled with one of rows) as split by the csv module; nothing else is parsed
+    wanted = set(rows)
+    with open(file_path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise pd.errors.EmptyDataError("No columns to parse from file")
+        return header, [record for record in reader if record and record[0] in wanted]
+
+def read_projected_csv(file_path, rows, dtype=None):
+    # pd.read_csv(file_path, index_col=0) restricted to the rows labelled with one of rows
+    header, records = _projected_records(file_path, rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    writer.writerows(records)
+    buffer.seek(0)
+    return pd.read_csv(buffer, index_col=0, dtype=dtype)
+
+def read_projected_statement(file_path, rows):
+    # normalize_statement(pd.read_csv(file_path, index_col=0)) restricted to the rows labelled with one
+    # of rows, without going through read_csv: only the date cells of those rows are converted, by the
+    # same to_numeric() parser, and the header's dates are parsed once per distinct header
+    header, records = _projected_records(file_path, rows)
+    # read_csv renames repeated column names, which then are not dates
+    seen = set()
+    columns = []
+    for name in header[1:]:
+        columns.append(None if name in seen else name)
+        seen.add(name)
+    positions, dates = _column_dates(tuple(columns))
+    cells = np.array([record[1 + p] if 1 + p < len(record) else '' for record in records for p in positions], dtype=object)
+    values = pd.to_numeric(cells, errors='coerce').astype('float64').reshape(len(records), len(positions))
+    return _dated_frame(values, pd.Index([record[0] for record in records]), positions, dates)
+
+def project_frame(df, rows):
+    # A fetched frame reduced to the rows labelled with one of rows, for persisting a projection
+    return df[df.index.isin(list(rows))]
+
+def statement_signature(ticker, base_dir):
+    # Modification times of the statement files, so a re-fetch invalidates the cached entry
+    signature = []
+    for statement in STATEMENT_FILES:
+        try:
+            signature.append(os.stat(statement_file(ticker, base_dir, statement)).st_mtime_ns)
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+def _read_statements(ticker, base_dir, signature, fields=None):
+    # Missing files (and statements outside the projection) come back as None; read errors are
+    # raised to the caller
+    wanted = dict(fields) if fields is not None else None
+    statements = {}
+    for statement, mtime in zip(STATEMENT_FILES, signature):
+        if mtime is None or (wanted is not None and statement not in wanted):
+            statements[statement] = None
+            continue
+        file_path = statement_file(ticker, base_dir, statement)
+        if wanted is None:
+            df = pd.read_csv(file_path, index_col=0)
+            statements[statement] = df if statement == "info" else normalize_statement(df)
+        elif statement == "info":
+            # Values stay strings, as in a full read where the text fields make the column object
+            statements[statement] = read_projected_csv(file_path, wanted[statement], dtype=str)
+        else:
+            statements[statement] = read_projected_statement(file_path, wanted[statement])
+    return statements
+
+_cached_read = functools.lru_cache(maxsize=DEFAULT_CACHE_SIZE)(_read_statements)
+
+def configure_cache(maxsize=DEFAULT_CACHE_SIZE):
+    # Rebuilds the shared cache with a new bound (drops whatever was cached)
+    global _cached_read
+    _cached_read = functools.lru_cache(maxsize=maxsize)(_read_statements)
+
+def clear_cache():
+    _cached_read.cache_clear()
+
+def cache_stats():
+    info = _cached_read.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+    }
+
+def load_ticker_statements(ticker, base_dir="saham", fields=None):
+    # {"balance_sheet", "financials", "cashflow": normalized frame or None, "info": raw 'Value' frame or None}
+    # parsed once per run and shared by every stage. With fields (see projection()) only those rows
+    # are parsed; stages sharing a run should pass the same projection to share the parse. The
+    # frames are shared: do not modify them in place.
+    return _cached_read(ticker, base_dir, statement_signature(ticker, base_dir), fields)
+
+def statement_row(df, line_item):
+    # One line item as a date-indexed Series without NaNs (empty if the statement or row is missing)
+    if df is None or line_item not in df.index:
+        return pd.Series(dtype='float64')
+    row = df.loc[line_item]
+    if isinstance(row, pd.DataFrame):
+        # A repeated line item keeps its last row, as parse_csv and CompactStatement do
+        row = row.iloc[-1]
+    return row.dropna()
@@ -0,0 +1,154 @@
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from async_fetcher import fetch_tickers
+from screen import screen_chunk, SCREEN_FIELDS
+
+# Marks the end of a queue's input
+END = None
+
+def _failed_row(ticker, error):
+    row = {field: None for field in SCREEN_FIELDS}
+    row.update({'kode': ticker, 'passed': False, 'error': error})
+    return row, {"ticker": ticker, "error": error}, {}
+
+def _take_batch(compute_queue, first, batch_size):
+    # The ticker just received plus whatever else is already waiting, up to batch_size;
+    # returns (batch, input_finished)
+    batch = [first]
+    while len(batch) < batch_size:
+        try:
+            ticker = compute_queue.get_nowait()
+        except queue.Empty:
+            break
+        if ticker is END:
+            return batch, True
+        batch.append(ticker)
+    return batch, False
+
+def compute_stage(compute_queue, result_queue, base_dir, thresholds, max_workers=None, batch_size=8, write_report=False, stop=None,
+                  cache_db=None):
+    # Screens tickers as they come off compute_queue, in small batches on worker processes, and puts
+    # (row, dcf_results, timings) on result_queue. At most two batches per worker are in flight, so a
+    # slow sink fills result_queue, this stage stops taking input and compute_queue fills up in turn.
+    # Setting stop (a threading.Event) makes it finish the batches in flight and take no more input.
+    if max_workers is None or max_workers <= 0:
+        max_workers = os.cpu_count() or 1
+    # With one worker a thread does the work, so the fetch threads keep this process busy meanwhile
+    executor = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else ThreadPoolExecutor(max_workers=1)
+    max_in_flight = max_workers * 2
+    in_flight = {}
+    input_finished = False
+
+    def forward(future):
+        batch = in_flight.pop(future)
+        try:
+            results = future.result()
+        except Exception as exc:
+            results = [_failed_row(ticker, f"Worker failed: {exc}") for ticker in batch]
+        for result in results:
+            result_queue.put(result)
+
+    try:
+        while not input_finished or in_flight:
+            if stop is not None and stop.is_set():
+                input_finished = True
+            for future in [future for future in in_flight if future.done()]:
+                forward(future)
+            if input_finished or len(in_flight) >= max_in_flight:
+                if in_flight:
+                    done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        forward(future)
+                continue
+            try:
+                # A short timeout keeps finished batches flowing to the sink while input is idle
+                ticker = compute_queue.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            if ticker is END:
+                input_finished = True
+                continue
+            batch, input_finished = _take_batch(compute_queue, ticker, batch_size)
+            in_flight[executor.submit(screen_chunk, batch, base_dir, thresholds, write_report, cache_db)] = batch
+    finally:
+        executor.shutdown(wait=True)
+        result_queue.put(END)
+
+def run_streaming_pipeline(to_fetch, current, base_dir, provider, thresholds=None, scheduler=None, store=None,
+                           max_workers=None, queue_size=64, batch_size=8, write_report=False, on_fetch_result=None,
+                           metrics=None, cache_db=None, fields=None):
+    # Fetch (async I/O) -> compute (worker processes) -> caller, joined by bounded queues.
+    # to_fetch maps ticker folder -> datasets to fetch (None for all); current lists folders whose data
+    # is already up to date and go straight to compute. Yields (row, dcf_results, timings) per ticker as
+    # soon as it is screened; tickers whose fetch failed are reported through on_fetch_result only.
+    # With cache_db, screen parts whose inputs did not change are reused (see dependency_cache.py);
+    # fields is the projection fetches persist (default: the full frames).
+    thresholds = thresholds or {}
+    compute_queue = queue.Queue(maxsize=queue_size)
+    result_queue = queue.Queue(maxsize=queue_size)
+    producer_errors = []
+    stop = threading.Event()
+
+    def recording_errors(target):
+        def run():
+            try:
+                target()
+            except Exception as e:
+                producer_errors.append(e)
+        return run
+
+    def feed_current():
+        for ticker in current:
+            compute_queue.put(ticker)
+
+    def fetch():
+        fetch_tickers(list(to_fetch), base_dir, provider, datasets_by_ticker=to_fetch, store=store,
+                      on_result=on_fetch_result, scheduler=scheduler, after_save=compute_queue.put,
+                      fields=fields, stop=stop)
+
+    def produce():
+        # Up-to-date tickers and fetches feed the compute queue side by side; END follows both
+        workers = [threading.Thread(target=recording_errors(feed_current), daemon=True)]
+        if to_fetch:
+            workers.append(threading.Thread(target=recording_errors(fetch), daemon=True))
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        compute_queue.put(END)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    consumer = threading.Thread(
+        target=compute_stage,
+        args=(compute_queue, result_queue, base_dir, thresholds, max_workers, batch_size, write_report, stop, cache_db),
+        daemon=True)
+    producer.start()
+    consumer.start()
+
+    max_depth = {"compute_queue": 0, "result_queue": 0}
+    try:
+        while True:
+            result = result_queue.get()
+            if result is END:
+                break
+            max_depth["compute_queue"] = max(max_depth["compute_queue"], compute_queue.qsize())
+            max_depth["result_queue"] = max(max_depth["result_queue"], result_queue.qsize() + 1)
+            yield result
+    finally:
+        # If the caller stopped early, stop requesting tickers and keep both queues moving until the
+        # stages wind down
+        stop.set()
+        while producer.is_alive() or consumer.is_alive():
+            for q in (compute_queue, result_queue):
+                try:
+                    q.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+        if metrics is not None:
+            metrics.extra["queues"] = {"size": queue_size, "max_depth": max_depth}
+
+    if producer_errors:
+        raise producer_errors[0]
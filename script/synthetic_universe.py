@@ -0,0 +1,200 @@
+import os
+import sys
+import argparse
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from calculate_dcf_all import split_into_chunks
+
+# Fiscal year ends seen in the IDX and US universes, Dec 31 being by far the most common
+FISCAL_YEAR_ENDS = [(12, 31), (3, 31), (6, 30), (9, 30)]
+FISCAL_YEAR_END_WEIGHTS = [0.7, 0.1, 0.1, 0.1]
+
+# Rows that go missing now and then in real yfinance statements
+DROPPABLE_ROWS = {
+    "balance_sheet": ["Ordinary Shares Number", "Invested Capital", "Total Liabilities Net Minority Interest"],
+    "financials": ["EBIT", "Tax Rate For Calcs", "Net Income"],
+    "cashflow": ["Free Cash Flow", "Capital Expenditure"],
+}
+
+SECTORS = ["Financial Services", "Consumer Defensive", "Industrials", "Basic Materials", "Energy",
+           "Technology", "Healthcare", "Real Estate", "Utilities", "Communication Services"]
+
+def synthetic_ticker(index, suffix=".JK"):
+    return f"SYN{index:05d}{suffix}"
+
+@functools.lru_cache(maxsize=8)
+def _trading_days(end_date, price_years):
+    # Business days ending at end_date, pre-formatted the way yfinance histories are saved;
+    # shared by every ticker, since building and formatting the calendar dominates otherwise
+    bars = pd.bdate_range(end=pd.Timestamp(end_date), periods=int(252 * price_years), tz="Asia/Jakarta")
+    return pd.Index(bars.strftime("%Y-%m-%d %H:%M:%S%z").str.replace(r"(\d{2})(\d{2})$", r"\1:\2", regex=True), name="Date")
+
+def _statement(rows, dates):
+    # Line items x fiscal dates, newest first as yfinance returns them
+    df = pd.DataFrame(rows, index=dates).T
+    return df[sorted(dates, reverse=True)]
+
+def _degrade(df, rng, statement, missing_row_rate, nan_rate):
+    # Drops whole rows and blanks single cells, the two kinds of gaps real statements have
+    for row in DROPPABLE_ROWS[statement]:
+        if row in df.index and rng.random() < missing_row_rate:
+            df = df.drop(index=row)
+    mask = rng.random(df.shape) < nan_rate
+    return df.mask(mask)
+
+def generate_ticker_frames(index, seed=0, end_date="2024-12-31", price_years=5,
+                           missing_row_rate=0.05, nan_rate=0.03, negative_equity_rate=0.05):
+    # Frames in the same shapes as a DataProvider returns them, reproducible from (seed, index)
+    rng = np.random.default_rng([seed, index])
+    end = pd.Timestamp(end_date)
+
+    month, day = FISCAL_YEAR_ENDS[rng.choice(len(FISCAL_YEAR_ENDS), p=FISCAL_YEAR_END_WEIGHTS)]
+    n_years = int(rng.integers(2, 6))
+    last_year = end.year if pd.Timestamp(end.year, month, day) <= end else end.year - 1
+    last_year -= int(rng.random() < 0.15)  # some tickers lag a year behind on filings
+    fiscal_dates = [pd.Timestamp(last_year - k, month, day) for k in range(n_years)][::-1]
+    dates = [d.strftime("%Y-%m-%d") for d in fiscal_dates]
+
+    # Fundamentals follow a noisy growth path from a log-normal starting size
+    revenue = rng.lognormal(np.log(5e12), 1.5) * np.cumprod(1 + rng.normal(0.06, 0.12, n_years))
+    margin = rng.normal(0.08, 0.08) + rng.normal(0, 0.03, n_years)
+    net_income = revenue * margin
+    tax_rate = np.clip(rng.normal(0.22, 0.04, n_years), 0, 0.5)
+    interest = revenue * rng.uniform(0, 0.03)
+    ebit = net_income / (1 - tax_rate) + interest
+    depreciation = revenue * rng.uniform(0.02, 0.08)
+    operating_cash_flow = net_income + depreciation + revenue * rng.normal(0, 0.03, n_years)
+    capex = -revenue * rng.uniform(0.02, 0.12, n_years)
+    free_cash_flow = operating_cash_flow + capex
+
+    shares = rng.lognormal(np.log(3e9), 1.0) * np.cumprod(1 + np.abs(rng.normal(0, 0.01, n_years)))
+    total_assets = revenue * rng.uniform(0.8, 3.0)
+    if rng.random() < negative_equity_rate:
+        equity = -total_assets * rng.uniform(0.02, 0.3, n_years)
+    else:
+        equity = total_assets * rng.uniform(0.2, 0.8, n_years)
+    liabilities = total_assets - equity
+    debt = liabilities * rng.uniform(0.2, 0.7)
+    invested_capital = equity + debt
+
+    frames = {}
+    frames["balance_sheet"] = _degrade(_statement({
+        "Ordinary Shares Number": shares.round(),
+        "Total Assets": total_assets,
+        "Total Liabilities Net Minority Interest": liabilities,
+        "Stockholders Equity": equity,
+        "Total Debt": debt,
+        "Invested Capital": invested_capital,
+    }, dates), rng, "balance_sheet", missing_row_rate, nan_rate)
+    frames["financials"] = _degrade(_statement({
+        "Total Revenue": revenue,
+        "EBIT": ebit,
+        "Interest Expense": interest * np.ones(n_years),
+        "Tax Rate For Calcs": tax_rate,
+        "Net Income": net_income,
+    }, dates), rng, "financials", missing_row_rate, nan_rate)
+    frames["cashflow"] = _degrade(_statement({
+        "Free Cash Flow": free_cash_flow,
+        "Operating Cash Flow": operating_cash_flow,
+        "Capital Expenditure": capex,
+        "Depreciation And Amortization": depreciation * np.ones(n_years),
+    }, dates), rng, "cashflow", missing_row_rate, nan_rate)
+
+    # Daily closes: a geometric random walk whose last value prices the company at a random
+    # multiple of its free cash flow, so margins of safety spread around zero
+    bars = _trading_days(end_date, price_years)
+    returns = rng.normal(0.0003, rng.uniform(0.01, 0.04), len(bars))
+    path = np.exp(np.cumsum(returns) - np.cumsum(returns)[-1])
+    fair_price = abs(free_cash_flow[-1]) * 12 / shares[-1]
+    current_price = max(fair_price * rng.lognormal(0, 0.6), 1.0)
+    closes = current_price * path
+    frames["prices"] = pd.DataFrame({
+        "Close": closes,
+        "Volume": rng.integers(0, 5_000_000, len(bars)),
+        "Dividends": 0.0,
+        "Stock Splits": 0.0,
+    }, index=bars)
+
+    frames["info"] = pd.DataFrame.from_dict({
+        "longName": f"Synthetic Company {index}",
+        "sector": SECTORS[index % len(SECTORS)],
+        "currency": "IDR",
+        "sharesOutstanding": float(round(shares[-1])),
+        "currentPrice": float(current_price),
+        "marketCap": float(current_price * shares[-1]),
+    }, orient='index', columns=['Value'])
+    return frames
+
+def write_ticker(index, base_dir, missing_file_rate=0.005, suffix=".JK", **options):
+    # Writes one ticker in the saham/<TICKER>/ layout; now and then a whole file is left out
+    ticker = synthetic_ticker(index, suffix)
+    frames = generate_ticker_frames(index, **options)
+    rng = np.random.default_rng([options.get("seed", 0), index, 1])
+    ticker_dir = os.path.join(base_dir, ticker)
+    os.makedirs(ticker_dir, exist_ok=True)
+    file_names = {"info": "company_info", "balance_sheet": "balance_sheet", "financials": "financials",
+                  "cashflow": "cashflow", "prices": "historical_prices"}
+    for name, df in frames.items():
+        if rng.random() < missing_file_rate:
+            continue
+        df.to_csv(os.path.join(ticker_dir, f"{ticker}_{file_names[name]}.csv"))
+    return ticker
+
+def _write_chunk(indices, base_dir, options):
+    return [write_ticker(index, base_dir, **options) for index in indices]
+
+def generate_universe(base_dir, n_tickers, max_workers=None, list_file=None, **options):
+    # Writes n_tickers synthetic tickers into base_dir and returns their folder names
+    os.makedirs(base_dir, exist_ok=True)
+    if max_workers is None or max_workers <= 0:
+        max_workers = os.cpu_count() or 1
+    indices = list(range(n_tickers))
+    chunks = split_into_chunks(indices, max_workers)
+
+    tickers = []
+    if max_workers == 1 or len(chunks) == 1:
+        for chunk in chunks:
+            tickers.extend(_write_chunk(chunk, base_dir, options))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for chunk_tickers in executor.map(_write_chunk, chunks, [base_dir] * len(chunks), [options] * len(chunks)):
+                tickers.extend(chunk_tickers)
+
+    if list_file:
+        # Same 'Kode' list process_all_stocks.py reads, without the .JK suffix it adds itself
+        suffix = options.get("suffix", ".JK")
+        codes = [ticker[:-len(suffix)] if suffix and ticker.endswith(suffix) else ticker for ticker in tickers]
+        pd.DataFrame({"Kode": codes, "Company Name": [f"Synthetic Company {i}" for i in indices]}).to_csv(list_file, index=False)
+    return tickers
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic universe in the saham/ layout for benchmarks and offline runs.")
+    parser.add_argument("n_tickers", type=int, help="Number of tickers to generate.")
+    parser.add_argument("--dir", type=str, default="saham_synthetic", help="The directory to write the ticker folders into.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed always gives the same universe.")
+    parser.add_argument("--end-date", type=str, default="2024-12-31", help="Last trading day of the price history.")
+    parser.add_argument("--price-years", type=int, default=5, help="Years of daily price history per ticker.")
+    parser.add_argument("--missing-row-rate", type=float, default=0.05, help="Chance that a droppable statement row is missing.")
+    parser.add_argument("--nan-rate", type=float, default=0.03, help="Chance that a single statement value is blank.")
+    parser.add_argument("--negative-equity-rate", type=float, default=0.05, help="Share of tickers with negative equity.")
+    parser.add_argument("--missing-file-rate", type=float, default=0.005, help="Chance that a ticker file is not written at all.")
+    parser.add_argument("--raw", action="store_true", help="Do not add the .JK suffix to the ticker folders.")
+    parser.add_argument("--list", type=str, default=None, help="Optional: also write a 'Kode' ticker list CSV for process_all_stocks.py.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    args = parser.parse_args()
+
+    if args.n_tickers <= 0:
+        print("Error: n_tickers must be positive.", file=sys.stderr)
+        sys.exit(1)
+
+    tickers = generate_universe(
+        args.dir, args.n_tickers, args.workers, args.list,
+        seed=args.seed, end_date=args.end_date, price_years=args.price_years,
+        missing_row_rate=args.missing_row_rate, nan_rate=args.nan_rate,
+        negative_equity_rate=args.negative_equity_rate, missing_file_rate=args.missing_file_rate,
+        suffix="" if args.raw else ".JK")
+    print(f"Generated {len(tickers)} synthetic tickers in {args.dir}")
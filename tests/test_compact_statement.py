@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from compact_statement import CompactStatement
+from statement_loader import normalize_statement, read_projected_statement, statement_row
+
+# yfinance order (newest first), with a repeated fiscal year and a repeated line item
+STATEMENT_CSV = (
+    ",2024-12-31,2023-12-31,2023-06-30\n"
+    "EBIT,30,999,998\n"
+    "Net Income,10,20,21\n"
+    "EBIT,31,997,996\n"
+)
+
+def write_statement(tmp_path):
+    path = tmp_path / "X_financials.csv"
+    path.write_text(STATEMENT_CSV)
+    return str(path)
+
+def parse_csv_reference(path):
+    # The dict-of-dicts the scripts used before CompactStatement: later cells overwrite earlier ones
+    data = {}
+    lines = open(path).read().splitlines()
+    headers = lines[0].split(',')
+    for line in lines[1:]:
+        cells = line.split(',')
+        for header, cell in zip(headers[1:], cells[1:]):
+            data.setdefault(int(header[:4]), {})[cells[0]] = float(cell)
+    return data
+
+def test_from_csv_matches_parse_csv(tmp_path):
+    path = write_statement(tmp_path)
+    compact = CompactStatement.from_csv(path)
+    reference = parse_csv_reference(path)
+    assert list(compact.years) == [2023, 2024]
+    for metric in ("EBIT", "Net Income"):
+        assert list(compact.row(metric)) == [reference[2023][metric], reference[2024][metric]]
+
+def test_repeated_year_keeps_last_file_column(tmp_path):
+    path = write_statement(tmp_path)
+    # 2023-06-30 comes after 2023-12-31 in the file, so it is the one kept
+    assert CompactStatement.from_csv(path).row("Net Income")[0] == 21
+
+def test_repeated_line_item_keeps_last_row(tmp_path):
+    path = write_statement(tmp_path)
+    assert list(CompactStatement.from_csv(path).row("EBIT")) == [996, 31]
+
+def test_from_frame_matches_from_csv(tmp_path):
+    path = write_statement(tmp_path)
+    from_csv = CompactStatement.from_csv(path)
+    frames = [normalize_statement(pd.read_csv(path, index_col=0)),
+              read_projected_statement(path, ["EBIT", "Net Income"])]
+    for frame in frames:
+        compact = CompactStatement.from_frame(frame)
+        assert list(compact.years) == list(from_csv.years)
+        for metric in ("EBIT", "Net Income"):
+            np.testing.assert_array_equal(compact.row(metric), from_csv.row(metric))
+
+def test_statement_row_keeps_last_row(tmp_path):
+    path = write_statement(tmp_path)
+    row = statement_row(normalize_statement(pd.read_csv(path, index_col=0)), "EBIT")
+    assert list(row) == [996, 997, 31]
@@ -0,0 +1,153 @@
+import asyncio
+import random
+import threading
+import time
+
+from data_providers import ThrottledError, TransientFetchError
+from fetch_scheduler import AdaptiveLimit, FetchScheduler, TokenBucket, backoff_delay
+
+class FakeProvider:
+    # Scripted outcomes per ticker: each call pops the next one ("ok", "throttle", "transient" or
+    # "boom"); tickers without a script always succeed
+    def __init__(self, scripts=None):
+        self.scripts = {ticker: list(outcomes) for ticker, outcomes in (scripts or {}).items()}
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def fetch(self, ticker):
+        self.calls.append(ticker)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0)
+            outcomes = self.scripts.get(ticker)
+            outcome = outcomes.pop(0) if outcomes else "ok"
+            if outcome == "throttle":
+                raise ThrottledError("slow down", retry_after=0)
+            if outcome == "transient":
+                raise TransientFetchError("connection reset")
+            if outcome == "boom":
+                raise ValueError("bad data")
+            return {"ticker": ticker}
+        finally:
+            self.in_flight -= 1
+
+def scheduler(**options):
+    random.seed(0)
+    return FetchScheduler(base_delay=0.001, max_delay=0.002, **options)
+
+def run(sched, tickers, provider, on_result=None):
+    return asyncio.run(sched.run(tickers, provider.fetch, on_result))
+
+def test_aimd_halves_on_throttle_and_grows_after_a_window_of_successes():
+    async def scenario():
+        limit = AdaptiveLimit(8, minimum=1, maximum=8, decrease_cooldown=0)
+        for _ in range(3):
+            await limit.acquire()
+            await limit.release("throttled")
+        assert limit.limit == 1
+        for expected in (2, 2, 3, 3, 3, 4):
+            await limit.acquire()
+            await limit.release("ok")
+            assert limit.limit == expected
+        # Errors neither shrink nor grow the limit
+        await limit.acquire()
+        await limit.release("error")
+        assert limit.limit == 4
+        # Never below the minimum, never above the maximum
+        grown = AdaptiveLimit(2, minimum=1, maximum=2, decrease_cooldown=0)
+        for _ in range(10):
+            await grown.acquire()
+            await grown.release("ok")
+        assert grown.limit == 2
+    asyncio.run(scenario())
+
+def test_throttles_in_flight_together_count_once_within_the_cooldown():
+    async def scenario():
+        limit = AdaptiveLimit(8, decrease_cooldown=60)
+        for _ in range(4):
+            await limit.acquire()
+        for _ in range(4):
+            await limit.release("throttled")
+        assert limit.limit == 4
+    asyncio.run(scenario())
+
+def test_concurrency_never_exceeds_the_limit():
+    provider = FakeProvider()
+    results = run(scheduler(max_concurrency=3), [f"T{i}" for i in range(20)], provider)
+    assert all(result["status"] == "Done" for result in results)
+    assert provider.peak <= 3
+
+def test_throttled_and_transient_failures_are_retried_in_later_rounds():
+    provider = FakeProvider({"A": ["throttle", "ok"], "B": ["transient", "transient", "ok"], "C": ["ok"]})
+    sched = scheduler(max_retries=3)
+    seen = []
+    results = run(sched, ["A", "B", "C"], provider, seen.append)
+    assert [(result["ticker"], result["status"], result["attempts"]) for result in results] == \
+        [("A", "Done", 2), ("B", "Done", 3), ("C", "Done", 1)]
+    # Each ticker is reported once, with its final result
+    assert sorted(result["ticker"] for result in seen) == ["A", "B", "C"]
+    assert sched.stats == {"attempts": 6, "throttled": 1, "transient_errors": 2, "retried": 3}
+
+def test_retries_stop_after_max_retries():
+    provider = FakeProvider({"A": ["transient"] * 10, "B": ["throttle"] * 10})
+    sched = scheduler(max_retries=2)
+    seen = []
+    results = run(sched, ["A", "B"], provider, seen.append)
+    assert [(result["status"], result["attempts"]) for result in results] == [("Fail", 3), ("Fail", 3)]
+    assert results[0]["error"] == "TransientFetchError: connection reset"
+    assert results[1]["error"].startswith("Throttled: ")
+    assert provider.calls.count("A") == provider.calls.count("B") == 3
+    assert len(seen) == 2
+
+def test_other_errors_are_not_retried():
+    provider = FakeProvider({"A": ["boom", "ok"]})
+    results = run(scheduler(max_retries=3), ["A"], provider)
+    assert (results[0]["status"], results[0]["attempts"], results[0]["error"]) == ("Fail", 1, "ValueError: bad data")
+    assert provider.calls == ["A"]
+
+def test_no_requests_are_issued_once_stop_is_set():
+    provider = FakeProvider()
+    stop = threading.Event()
+    seen = []
+
+    def on_result(result):
+        seen.append(result["ticker"])
+        stop.set()
+
+    tickers = ["A", "B", "C", "D"]
+    results = asyncio.run(scheduler(max_concurrency=1).run(tickers, provider.fetch, on_result, stop))
+    assert provider.calls == seen == ["A"]
+    assert [(result["ticker"], result["status"]) for result in results] == \
+        [("A", "Done"), ("B", "Stopped"), ("C", "Stopped"), ("D", "Stopped")]
+
+def test_failures_are_not_retried_once_stop_is_set():
+    provider = FakeProvider({"A": ["transient", "ok"]})
+    stop = threading.Event()
+
+    async def job(ticker):
+        try:
+            return await provider.fetch(ticker)
+        finally:
+            stop.set()
+
+    results = asyncio.run(scheduler(max_retries=3).run(["A"], job, None, stop))
+    assert provider.calls == ["A"]
+    assert (results[0]["status"], results[0]["attempts"]) == ("Fail", 1)
+
+def test_backoff_delay_is_bounded_full_jitter():
+    random.seed(1)
+    for attempt in range(10):
+        for _ in range(50):
+            assert 0 <= backoff_delay(attempt, 0.5, 4.0) <= min(4.0, 0.5 * 2 ** attempt)
+
+def test_token_bucket_spaces_acquisitions_after_the_burst():
+    async def scenario():
+        bucket = TokenBucket(rate=200, burst=2)
+        started = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - started
+    # Two tokens up front, then four more at 200 per second
+    assert asyncio.run(scenario()) >= 4 / 200 * 0.9
@@ -0,0 +1,46 @@
+import itertools
+import random
+
+from ranking import TopK, make_score, mos_score
+
+def rows(scores):
+    return [{'kode': kode, 'margin of safety': score} for kode, score in scores]
+
+def ranked(top):
+    return [(rank, score, row['kode']) for rank, score, row in top.result()]
+
+def test_equal_scores_rank_by_ticker_whatever_the_push_order():
+    data = rows([("D", 10.0), ("B", 10.0), ("A", 5.0), ("C", 10.0), ("E", 10.0)])
+    expected = [(1, 10.0, "B"), (2, 10.0, "C"), (3, 10.0, "D")]
+    for ordering in itertools.permutations(data):
+        assert ranked(TopK(3).extend(ordering)) == expected
+
+def test_tie_at_the_cut_keeps_the_earlier_ticker():
+    data = rows([("Z", 7.0), ("M", 9.0), ("A", 7.0)])
+    for ordering in itertools.permutations(data):
+        assert ranked(TopK(2).extend(ordering)) == [(1, 9.0, "M"), (2, 7.0, "A")]
+
+def test_k_larger_than_the_input_returns_every_row():
+    data = rows([("A", 1.0), ("B", 3.0), ("C", 2.0)])
+    top = TopK(10).extend(data)
+    assert ranked(top) == [(1, 3.0, "B"), (2, 2.0, "C"), (3, 1.0, "A")]
+    assert (top.seen, top.ranked) == (3, 3)
+
+def test_rows_without_a_score_are_counted_but_not_ranked():
+    data = rows([("A", None), ("B", ""), ("C", "4.5"), ("D", float('nan'))])
+    top = TopK(5).extend(data)
+    assert ranked(top) == [(1, 4.5, "C")]
+    assert (top.seen, top.ranked) == (4, 1)
+
+def test_matches_a_full_sort():
+    rng = random.Random(0)
+    for _ in range(50):
+        data = rows([(f"T{i:03d}", float(rng.randint(-5, 5))) for i in range(rng.randint(0, 40))])
+        k = rng.randint(0, 15)
+        expected = sorted(data, key=lambda row: (-row['margin of safety'], row['kode']))[:k]
+        assert [row for _, _, row in TopK(k, mos_score).extend(data).result()] == expected
+
+def test_composite_score_weights_mos_roic_and_igr():
+    score = make_score("composite", (0.5, 0.25, 0.25))
+    assert score({'margin of safety': 10, 'roic_min': 20, 'igr_min': 4}) == 11.0
+    assert score({'margin of safety': 10, 'roic_min': None, 'igr_min': 4}) is None
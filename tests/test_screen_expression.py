@@ -0,0 +1,126 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from screen import screen_chunk, DEFAULT_THRESHOLDS
+from screen_expression import (MetricsTable, DEFAULT_EXPRESSION, MAX_HISTORY_YEARS, compile_screen, evaluate,
+                               run_expression, _operand)
+from synthetic_universe import generate_universe
+
+TICKERS = ["A", "B", "C", "D", "E"]
+
+def make_table(scalars=None, history=None):
+    # A MetricsTable with every group already loaded from the given values, so nothing is read from disk
+    table = MetricsTable(TICKERS, "unused")
+    for name, values in (scalars or {}).items():
+        table.scalars[name][:] = values
+    for name, rows in (history or {}).items():
+        for i, row in enumerate(rows):
+            table.history[name][i, MAX_HISTORY_YEARS - len(row):] = row
+    for loaded in table.loaded.values():
+        loaded[:] = True
+    return table
+
+def selected(text, table):
+    return run_expression(text, table)
+
+def test_and_binds_tighter_than_or():
+    table = make_table({"der_ok": [1, 0, 0, 1, 0], "profit_ok": [0, 1, 1, 0, 0], "fcf_ok": [0, 1, 0, 1, 1]})
+    assert selected("der_ok or profit_ok and fcf_ok", table) == ["A", "B", "D"]
+    assert selected("(der_ok or profit_ok) and fcf_ok", table) == ["B", "D"]
+    assert selected("not der_ok and fcf_ok", table) == ["B", "E"]
+    assert selected("not (der_ok and fcf_ok)", table) == ["A", "B", "C", "E"]
+
+def test_between_is_inclusive():
+    table = make_table({"mos": [-0.1, 0, 50, 100, 100.1]})
+    assert selected("mos between 0 and 100", table) == ["B", "C", "D"]
+    assert selected("mos between 50 and 50", table) == ["C"]
+
+def test_history_windows():
+    table = make_table(history={"roic": [
+        [1, 20, 20, 20],          # low only outside a 3y window
+        [20, 20, 20, 1],          # low in the latest year
+        [20, np.nan, 20, 20],     # a year without a value inside the window
+        [np.nan, np.nan, np.nan, np.nan],
+        [5],                      # only one year of history
+    ]})
+    assert selected("min(roic) >= 10", table) == ["C"]
+    assert selected("min(roic, 3y) >= 10", table) == ["A", "C"]
+    assert selected("max(roic, 1y) >= 10", table) == ["A", "C"]
+    # A bare history metric is its latest value
+    assert selected("roic < 10", table) == ["B", "E"]
+    positions = np.arange(len(TICKERS))
+    means = _operand(("function", "mean", "roic", 2), table, positions)
+    np.testing.assert_array_equal(means, [20, 10.5, 20, np.nan, 5])
+
+def test_window_outside_kept_history_is_rejected():
+    with pytest.raises(ValueError):
+        compile_screen(f"min(roic, {MAX_HISTORY_YEARS + 1}y) > 0")
+    with pytest.raises(ValueError):
+        compile_screen("min(der) > 0")
+    with pytest.raises(ValueError):
+        compile_screen("nonsense > 0")
+
+def test_nan_never_satisfies_a_comparison():
+    table = make_table({"mos": [np.nan, 10, np.nan, -10, 0], "der": [np.nan] * 5})
+    for op in ("<", "<=", ">", ">=", "=="):
+        assert "A" not in selected(f"mos {op} 0", table)
+    assert selected("mos between -100 and 100", table) == ["B", "D", "E"]
+    assert selected("der", table) == []
+    # "!=" is the complement of "==" and "not" the complement of the whole condition
+    assert selected("mos != 0", table) == ["A", "B", "C", "D"]
+    assert selected("not mos >= 0", table) == ["A", "C", "D"]
+
+def full_evaluation(node, table, positions):
+    # Reference semantics: every operand evaluated for every ticker, left to right, no short circuit
+    kind = node[0]
+    if kind == "and":
+        return np.logical_and.reduce([full_evaluation(child, table, positions) for child in node[1]])
+    if kind == "or":
+        return np.logical_or.reduce([full_evaluation(child, table, positions) for child in node[1]])
+    if kind == "not":
+        return ~full_evaluation(node[1], table, positions)
+    return evaluate(node, table, positions)
+
+def test_operand_order_does_not_change_the_result():
+    rng = np.random.default_rng(0)
+    n = len(TICKERS)
+
+    def column():
+        values = rng.normal(0, 20, n)
+        values[rng.random(n) < 0.2] = np.nan
+        return values
+
+    conditions = ["mos > 0", "der_ok", "min(roic, 3y) >= 5", "last(igr) < 10", "price between -10 and 10", "not profit_ok"]
+    for _ in range(20):
+        table = make_table({"mos": column(), "price": column(), "der_ok": rng.random(n) < 0.5, "profit_ok": rng.random(n) < 0.5},
+                           {"roic": [column() for _ in range(n)], "igr": [column() for _ in range(n)]})
+        positions = np.arange(n)
+        for picked in itertools.combinations(conditions, 3):
+            masks = set()
+            for ordered in itertools.permutations(picked):
+                for joiner in (" and ", " or "):
+                    node = compile_screen(joiner.join(ordered))
+                    mask = evaluate(node, table, positions)
+                    np.testing.assert_array_equal(mask, full_evaluation(node, table, positions))
+                    masks.add((joiner, tuple(mask)))
+            # One mask per joiner, whatever the operand order
+            assert len(masks) == 2
+
+def test_default_expression_selects_what_screen_selects(tmp_path):
+    base_dir = str(tmp_path / "universe")
+    tickers = sorted(generate_universe(base_dir, 80, max_workers=1, seed=11, missing_file_rate=0.03))
+    rows = [row for row, _, _ in screen_chunk(tickers, base_dir, dict(DEFAULT_THRESHOLDS))]
+    assert run_expression("mos between 0 and 100", MetricsTable(tickers, base_dir)) == [row['kode'] for row in rows if row['mos_ok']]
+    assert run_expression(DEFAULT_EXPRESSION, MetricsTable(tickers, base_dir)) == [row['kode'] for row in rows if row['passed']]
+
+    # Lower ROIC / IGR minimums, so that some tickers pass every rule
+    loose = dict(DEFAULT_THRESHOLDS, min_roic=0.0, min_igr=-50.0)
+    rows = [row for row, _, _ in screen_chunk(tickers, base_dir, loose)]
+    expression = DEFAULT_EXPRESSION.replace("roic_min >= 10", "roic_min >= 0").replace("igr_min >= 2.5", "igr_min >= -50")
+    assert expression != DEFAULT_EXPRESSION
+    assert run_expression(expression, MetricsTable(tickers, base_dir)) == [row['kode'] for row in rows if row['passed']]
+    # Not vacuous: tickers on both sides, and some that calculate_dcf() fails
+    assert 0 < sum(bool(row['passed']) for row in rows) < sum(bool(row['mos_ok']) for row in rows)
+    assert any(row['error'] for row in rows)